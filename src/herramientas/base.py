@@ -9,6 +9,9 @@ class HerramientaBase(ABC):
     
     # Marcar que esta clase es una herramienta
     es_herramienta = True
+    # Las herramientas deterministas (resultado función pura de los parámetros)
+    # pueden servirse desde la caché de resultados del motor de ejecución
+    determinista = False
     
     def __init__(self, configuracion: Dict[str, Any]):
         self.config = configuracion
@@ -1,4 +1,4 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from loguru import logger
 
@@ -32,6 +32,11 @@ class MonitorRendimientoHerramientas:
         # Verificar alertas
         self._verificar_alertas(nombre_herramienta, metricas)
     
+    def registrar_lote(self, ejecuciones: List[Tuple[str, Dict]]):
+        """Registra varias ejecuciones de herramientas de una vez"""
+        for nombre_herramienta, resultado in ejecuciones:
+            self.registrar_ejecucion(nombre_herramienta, resultado)
+    
     def _verificar_alertas(self, nombre_herramienta: str, metricas: Dict):
         """Verifica si se deben generar alertas"""
         # Alertas de error
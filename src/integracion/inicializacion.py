@@ -9,9 +9,12 @@ from sistema.mao_factory import MAOFactory
 class InicializadorSAAM:
     """Sistema de inicialización y coordinación de todos los módulos SAAM"""
     
-    def __init__(self, configuracion: Dict[str, Any]):
+    def __init__(self, configuracion: Dict[str, Any], cliente_llm=None):
         self.config = configuracion
         self.modulos = {}
+        # Cliente LLM del MCP (expone generar() y model_name)
+        if cliente_llm is not None:
+            self.modulos['llm'] = cliente_llm
         self.estado = "detenido"
         
     async def inicializar_sistema(self) -> bool:
@@ -73,8 +76,15 @@ class InicializadorSAAM:
     async def _inicializar_mcp(self):
         """Inicializa el Módulo de Comprensión y Planificación"""
         logger.info("Inicializando Módulo de Planificación (MCP)")
+        if self.modulos.get('llm') is None:
+            raise ValueError("No hay cliente LLM registrado: el MCP no puede planificar sin él")
+        
+        # El MET prepara las herramientas que el MCP prevé mientras planifica
         self.modulos['mcp'] = MCPFactory.crear_mcp(
-            self.modulos['sm3'], self.config
+            cliente_llm=self.modulos['llm'],
+            sistema_memoria=self.modulos['sm3'],
+            configuracion=self.config,
+            precargador_herramientas=self.modulos['met'].precargar_herramienta
         )
     
     async def _verificar_integridad(self):
@@ -2,7 +2,7 @@ from typing import Dict, List, Any, Optional
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 from loguru import logger
-import json
+import orjson
 
 class BuscadorConocimiento:
     """
@@ -64,14 +64,14 @@ class BuscadorConocimiento:
                 continue
             
             try:
-                habilidad = json.loads(doc)
+                habilidad = orjson.loads(doc)
                 habilidades.append({
                     'habilidad': habilidad,
                     'metadata': metadata,
                     'similitud': similitud,
                     'id': resultados['ids'][0][i]
                 })
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 logger.warning(f"Error decodificando habilidad: {doc}")
                 continue
         
@@ -1,10 +1,39 @@
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Callable, AsyncIterator
+import asyncio
 import chromadb
 from chromadb.config import Settings
-import json
+from chromadb.utils import embedding_functions
+import numpy as np
+import orjson
 from datetime import datetime
 from loguru import logger
 
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_DISPONIBLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_DISPONIBLE = False
+    logger.debug("sentence-transformers no disponible, se usará la función de embedding por defecto de ChromaDB")
+
+def _a_documento(habilidad: Dict[str, Any]) -> str:
+    """Serializa una habilidad al documento JSON que almacena ChromaDB"""
+    return orjson.dumps(habilidad, option=orjson.OPT_NON_STR_KEYS).decode()
+
+class _ModeloEmbeddingChroma:
+    """
+    Interfaz ``encode`` (como la de sentence-transformers) sobre la función
+    de embedding por defecto de ChromaDB: all-MiniLM-L6-v2 en ONNX.
+    """
+    
+    def __init__(self):
+        self._funcion = embedding_functions.DefaultEmbeddingFunction()
+    
+    def encode(self, textos):
+        """Embedding de un texto (vector) o de una lista de textos (matriz)"""
+        if isinstance(textos, str):
+            return np.asarray(self._funcion([textos])[0], dtype=np.float32)
+        return np.asarray(self._funcion(list(textos)), dtype=np.float32)
+
 class BaseConocimiento:
     """
     Sistema de gestión de la base de conocimiento y habilidades de SAAM.
@@ -14,11 +43,28 @@ class BaseConocimiento:
     def __init__(self, configuracion: Dict[str, Any]):
         self.config = configuracion
         self.ruta_bd = configuracion.get('ruta_bd', './data/conocimiento')
+        # Serializa las lecturas-modificación-escritura sobre documentos de habilidades
+        self._lock_escritura = asyncio.Lock()
+        self._modelo_embedding = self._crear_modelo_embedding(
+            configuracion.get('modelo_embedding', 'all-MiniLM-L6-v2')
+        )
         self._inicializar_cliente()
         self._inicializar_colecciones()
         
         logger.info("Base de Conocimiento inicializada correctamente")
     
+    @staticmethod
+    def _crear_modelo_embedding(nombre: str):
+        """Modelo de sentence-transformers si está instalado; si no, el de ChromaDB"""
+        if SENTENCE_TRANSFORMERS_DISPONIBLE:
+            return SentenceTransformer(nombre)
+        return _ModeloEmbeddingChroma()
+    
+    @property
+    def modelo_embedding(self):
+        """Modelo de embedding de la base, reutilizable por otros módulos"""
+        return self._modelo_embedding
+    
     def _inicializar_cliente(self):
         """Inicializa el cliente de ChromaDB con configuración optimizada"""
         self.client = chromadb.PersistentClient(
@@ -74,7 +120,7 @@ class BaseConocimiento:
             habilidad_id = self._generar_id_habilidad(habilidad_validada)
             
             # Preparar documentos para almacenamiento
-            documento = json.dumps(habilidad_validada)
+            documento = _a_documento(habilidad_validada)
             embedding = self._generar_embedding_habilidad(habilidad_validada)
             
             # Guardar en ChromaDB
@@ -97,6 +143,138 @@ class BaseConocimiento:
             logger.error(f"Error guardando habilidad: {e}")
             raise
     
+    async def obtener_habilidades(self, habilidad_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Obtiene varias habilidades en una sola consulta.
+        
+        Args:
+            habilidad_ids: IDs de las habilidades a recuperar
+        
+        Returns:
+            Dict: Habilidades encontradas indexadas por ID
+        """
+        if not habilidad_ids:
+            return {}
+        resultado = self.coleccion_habilidades.get(ids=list(habilidad_ids), include=['documents'])
+        return {
+            habilidad_id: {**orjson.loads(documento), 'id': habilidad_id}
+            for habilidad_id, documento in zip(resultado['ids'], resultado['documents'])
+        }
+    
+    async def iter_lotes_habilidades(self, batch: int = 1000) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Recorre todas las habilidades por páginas sin cargarlas a la vez en memoria.
+        
+        Args:
+            batch: Número de habilidades por página
+        
+        Yields:
+            List[Dict]: Página de habilidades, cada una con su 'id'
+        """
+        offset = 0
+        while True:
+            resultado = self.coleccion_habilidades.get(limit=batch, offset=offset, include=['documents'])
+            if resultado['ids']:
+                yield [
+                    {**orjson.loads(documento), 'id': habilidad_id}
+                    for habilidad_id, documento in zip(resultado['ids'], resultado['documents'])
+                ]
+            if len(resultado['ids']) < batch:
+                break
+            offset += batch
+    
+    async def iter_habilidades(self, batch: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Recorre todas las habilidades una a una, leyéndolas por páginas.
+        
+        Args:
+            batch: Número de habilidades leídas por consulta
+        
+        Yields:
+            Dict: Habilidad con su 'id'
+        """
+        async for lote in self.iter_lotes_habilidades(batch):
+            for habilidad in lote:
+                yield habilidad
+    
+    async def eliminar_habilidades(self, habilidad_ids: List[str]) -> int:
+        """
+        Elimina varias habilidades en una sola operación.
+        
+        Args:
+            habilidad_ids: IDs de las habilidades a eliminar
+        
+        Returns:
+            int: Número de habilidades solicitadas para eliminación
+        """
+        if not habilidad_ids:
+            return 0
+        async with self._lock_escritura:
+            self.coleccion_habilidades.delete(ids=list(habilidad_ids))
+        logger.info(f"Habilidades eliminadas: {len(habilidad_ids)}")
+        return len(habilidad_ids)
+    
+    async def bulk_update_habilidades(self, actualizaciones: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Aplica actualizaciones parciales a varias habilidades en una sola escritura.
+        
+        Args:
+            actualizaciones: Campos a actualizar indexados por ID de habilidad
+        
+        Returns:
+            int: Número de habilidades actualizadas
+        """
+        return await self.actualizar_metricas_atomico(
+            list(actualizaciones), lambda habilidad_id, _: actualizaciones[habilidad_id]
+        )
+    
+    async def actualizar_metricas_atomico(
+        self,
+        habilidad_ids: List[str],
+        actualizador: Callable[[str, Dict[str, Any]], Optional[Dict[str, Any]]]
+    ) -> int:
+        """
+        Lee, actualiza y escribe varias habilidades como una única operación atómica.
+        
+        ChromaDB no admite actualizaciones calculadas en el servidor, así que
+        la lectura y la escritura se hacen bajo un lock: ninguna otra
+        actualización de esta instancia puede intercalarse y perder cambios.
+        
+        Args:
+            habilidad_ids: IDs de las habilidades a actualizar
+            actualizador: Función (id, habilidad actual) -> campos a actualizar,
+                o None para dejar la habilidad sin cambios
+        
+        Returns:
+            int: Número de habilidades actualizadas
+        """
+        if not habilidad_ids:
+            return 0
+        
+        async with self._lock_escritura:
+            # Se conservan los embeddings existentes: solo cambian campos no semánticos
+            resultado = self.coleccion_habilidades.get(
+                ids=list(habilidad_ids), include=['documents', 'embeddings']
+            )
+            ids, documentos, embeddings = [], [], []
+            for habilidad_id, documento, embedding in zip(
+                resultado['ids'], resultado['documents'], resultado['embeddings']
+            ):
+                habilidad = orjson.loads(documento)
+                cambios = actualizador(habilidad_id, habilidad)
+                if not cambios:
+                    continue
+                habilidad.update(cambios)
+                ids.append(habilidad_id)
+                documentos.append(_a_documento(habilidad))
+                embeddings.append(embedding)
+            
+            if ids:
+                self.coleccion_habilidades.update(ids=ids, documents=documentos, embeddings=embeddings)
+        
+        logger.debug(f"Habilidades actualizadas en lote: {len(ids)}")
+        return len(ids)
+    
     def _validar_habilidad(self, habilidad: Dict) -> Dict:
         """Valida la estructura de una habilidad antes de almacenarla"""
         campos_requeridos = ['nombre', 'tipo', 'procedimiento']
@@ -1,7 +1,9 @@
 from typing import Dict, List, Any, Optional, TypedDict
 from datetime import datetime
 from enum import Enum
-from pydantic import BaseModel, Field, validator
+from functools import cached_property
+import hashlib
+from pydantic import BaseModel, Field, computed_field, field_validator
 
 class EstadoEjecucion(str, Enum):
     """Estados posibles de una ejecución registrada en memoria episódica"""
@@ -50,27 +52,22 @@ class Episodio(BaseModel):
     timestamp_inicio: datetime = Field(..., description="Inicio de la ejecución")
     timestamp_fin: datetime = Field(..., description="Fin de la ejecución")
     version_sistema: str = Field(..., description="Versión de SAAM durante la ejecución")
-    checksum_integridad: str = Field(..., description="Hash de verificación de integridad")
     
     # Retroalimentación y evaluación
     feedback_usuario: Optional[Dict[str, Any]] = Field(None, description="Retroalimentación del usuario")
     evaluacion_automatica: Dict[str, float] = Field(default_factory=dict, description="Evaluación automática de calidad")
     
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
-    
-    @validator('id')
+    @field_validator('id')
+    @classmethod
     def validar_id_unico(cls, v):
         """Valida que el ID siga el formato correcto"""
         if not v.startswith('episodio_'):
             raise ValueError('ID debe comenzar con "episodio_"')
         return v
     
-    @validator('checksum_integridad')
-    def calcular_checksum(cls, v, values):
-        """Calcula el checksum de integridad del episodio"""
-        import hashlib
-        contenido = f"{values['objetivo']}{values['timestamp_inicio']}{values['timestamp_fin']}"
-        return hashlib.sha256(contenido.encode()).hexdigest()
\ No newline at end of file
+    @computed_field(description="Hash de verificación de integridad")
+    @cached_property
+    def checksum_integridad(self) -> str:
+        """Checksum de integridad, calculado al serializar y cacheado por instancia"""
+        contenido = f"{self.objetivo}{self.timestamp_inicio}{self.timestamp_fin}"
+        return hashlib.sha256(contenido.encode()).hexdigest()
@@ -1,94 +1,274 @@
 from typing import Dict, List, Any, Optional
+from collections import OrderedDict
+import copy
 from datetime import datetime, timedelta
+import asyncio
+import threading
 import sqlalchemy as sa
-from sqlalchemy import create_engine, Column, String, JSON, DateTime, Float
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from loguru import logger
+from memoria.episodica.modelo import Base, EpisodioDB
 
-Base = declarative_base()
+# Proyección de columnas etiquetadas con las claves de la API: las filas de
+# ``select`` se convierten en diccionarios sin pasar por la instrumentación del ORM
+_COLUMNAS_EPISODIO = (
+    EpisodioDB.id,
+    EpisodioDB.objetivo,
+    EpisodioDB.session_id,
+    EpisodioDB.plan_ejecutado,
+    EpisodioDB.resultados_tareas,
+    EpisodioDB.estado_global,
+    EpisodioDB.duracion_total.label('duracion_total_segundos'),
+    EpisodioDB.contexto_ejecucion,
+    EpisodioDB.metricas_rendimiento,
+    EpisodioDB.recursos_utilizados,
+    EpisodioDB.timestamp_inicio,
+    EpisodioDB.timestamp_fin,
+    EpisodioDB.version_sistema,
+    EpisodioDB.checksum_integridad,
+    EpisodioDB.feedback_usuario,
+    EpisodioDB.evaluacion_automatica,
+    EpisodioDB.timestamp_creacion,
+)
 
-class EpisodioDB(Base):
-    """Modelo de base de datos para episodios"""
-    __tablename__ = 'episodios'
-    
-    id = Column(String, primary_key=True)
-    timestamp_creacion = Column(DateTime, default=datetime.utcnow)
-    objetivo = Column(String, nullable=False)
-    session_id = Column(String, nullable=False)
-    plan_ejecutado = Column(JSON, nullable=False)
-    resultados_tareas = Column(JSON, nullable=False)
-    estado_global = Column(String, nullable=False)
-    duracion_total = Column(Float, nullable=False)
-    contexto_ejecucion = Column(JSON)
-    metricas_rendimiento = Column(JSON)
-    recursos_utilizados = Column(JSON)
-    timestamp_inicio = Column(DateTime, nullable=False)
-    timestamp_fin = Column(DateTime, nullable=False)
-    version_sistema = Column(String, nullable=False)
-    checksum_integridad = Column(String, nullable=False)
-    feedback_usuario = Column(JSON)
-    evaluacion_automatica = Column(JSON)
+_SENTENCIAS_FTS = (
+    """CREATE TRIGGER IF NOT EXISTS episodios_fts_ai AFTER INSERT ON episodios BEGIN
+        INSERT INTO episodios_fts(rowid, objetivo) VALUES (new.rowid, new.objetivo);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS episodios_fts_ad AFTER DELETE ON episodios BEGIN
+        INSERT INTO episodios_fts(episodios_fts, rowid, objetivo) VALUES ('delete', old.rowid, old.objetivo);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS episodios_fts_au AFTER UPDATE OF objetivo ON episodios BEGIN
+        INSERT INTO episodios_fts(episodios_fts, rowid, objetivo) VALUES ('delete', old.rowid, old.objetivo);
+        INSERT INTO episodios_fts(rowid, objetivo) VALUES (new.rowid, new.objetivo);
+    END""",
+)
 
 class GestorMemoriaEpisodica:
     """Gestor principal de la memoria episódica"""
     
-    def __init__(self, configuracion: Dict[str, Any]):
+    def __init__(self, configuracion: Dict[str, Any], validador=None, indexador=None):
         self.config = configuracion
+        self.validador = validador
+        self.indexador = indexador
         self.cadena_conexion = configuracion.get('cadena_conexion', 'sqlite:///./data/episodica.db')
         self.engine = create_engine(self.cadena_conexion)
         Base.metadata.create_all(self.engine)
         self.Session = sessionmaker(bind=self.engine)
+        # Caché LRU de episodios: son inmutables una vez guardados
+        self.cache_habilitado = configuracion.get('cache_habilitado', True)
+        self.tamaño_cache = configuracion.get('tamaño_cache', 4096)
+        self._cache_episodios: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+        self._lock_cache = threading.Lock()
+        # Escritura diferida (opcional): los episodios se validan, insertan e indexan por lotes
+        self.escritura_diferida = configuracion.get('escritura_diferida', False)
+        self.tamaño_lote = configuracion.get('tamaño_lote_escritura', 256)
+        self.espera_maxima_lote = configuracion.get('espera_maxima_lote', 0.1)
+        self._cola: Optional[asyncio.Queue] = None
+        self._tarea_escritura: Optional[asyncio.Task] = None
+        self._pendientes: Dict[str, Dict[str, Any]] = {}
+        self.fts_habilitado = False
+        if self.engine.dialect.name == 'sqlite' and configuracion.get('habilitar_fts', True):
+            self.fts_habilitado = self._crear_indice_fts()
         logger.info("Gestor de Memoria Episódica inicializado")
     
+    def _crear_indice_fts(self) -> bool:
+        """
+        Crea la tabla virtual FTS5 sobre los objetivos y sus triggers de sincronización.
+        
+        Returns:
+            bool: True si el índice de texto completo está disponible
+        """
+        try:
+            with self.engine.begin() as conn:
+                existente = conn.execute(sa.text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'episodios_fts'"
+                )).first()
+                if not existente:
+                    conn.execute(sa.text(
+                        "CREATE VIRTUAL TABLE episodios_fts USING fts5("
+                        "objetivo, content='episodios', content_rowid='rowid', "
+                        "tokenize='unicode61 remove_diacritics 2')"
+                    ))
+                for sentencia in _SENTENCIAS_FTS:
+                    conn.execute(sa.text(sentencia))
+                if not existente:
+                    # Poblar el índice con los episodios ya almacenados
+                    conn.execute(sa.text("INSERT INTO episodios_fts(episodios_fts) VALUES ('rebuild')"))
+            return True
+        except sa.exc.OperationalError as e:
+            logger.warning(f"FTS5 no disponible, se usará el índice en memoria: {e}")
+            return False
+    
+    async def buscar_ids_por_objetivo(self, tokens: List[str]) -> List[str]:
+        """
+        Busca episodios cuyo objetivo contenga alguno de los tokens usando FTS5.
+        
+        Args:
+            tokens: Tokens ya normalizados por el indexador
+        
+        Returns:
+            List[str]: IDs de los episodios coincidentes
+        """
+        if not tokens:
+            return []
+        await self.esperar_persistencia()
+        consulta = ' OR '.join(f'"{token}"' for token in tokens)
+        with self.engine.connect() as conn:
+            filas = conn.execute(sa.text(
+                "SELECT e.id FROM episodios_fts JOIN episodios e ON e.rowid = episodios_fts.rowid "
+                "WHERE episodios_fts MATCH :consulta"
+            ), {'consulta': consulta})
+            return [fila[0] for fila in filas]
+    
     async def guardar_episodio(self, episodio: Dict[str, Any]) -> str:
         """
         Guarda un episodio completo en la memoria episódica.
         
+        Con escritura diferida el episodio se encola y se persiste en el
+        siguiente lote; hasta entonces ``obtener_episodio`` lo sirve desde
+        memoria.
+        
         Args:
             episodio: Diccionario con los datos del episodio
         
         Returns:
             str: ID del episodio guardado
         """
+        # Validar estructura básica
+        if 'id' not in episodio:
+            episodio['id'] = self._generar_id_episodio()
+        if 'timestamp_creacion' not in episodio:
+            episodio['timestamp_creacion'] = datetime.utcnow()
+        
+        if not self.escritura_diferida:
+            await self._persistir_lote([episodio])
+            return episodio['id']
+        
+        if self._cola is None:
+            self._cola = asyncio.Queue()
+        if self._tarea_escritura is None or self._tarea_escritura.done():
+            # Un worker nuevo retoma la misma cola: lo ya encolado no se pierde
+            self._tarea_escritura = asyncio.create_task(self._procesar_cola())
+        
+        self._pendientes[episodio['id']] = episodio
+        await self._cola.put(episodio)
+        return episodio['id']
+    
+    async def _procesar_cola(self):
+        """Consume la cola de escritura agrupando episodios en lotes"""
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = [await self._cola.get()]
+            limite = loop.time() + self.espera_maxima_lote
+            while len(lote) < self.tamaño_lote:
+                restante = limite - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(await asyncio.wait_for(self._cola.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                await self._persistir_lote(lote)
+            except Exception as e:
+                logger.error(f"Error persistiendo lote de {len(lote)} episodios: {e}")
+            finally:
+                for episodio in lote:
+                    self._pendientes.pop(episodio['id'], None)
+                    self._cola.task_done()
+    
+    async def _persistir_lote(self, episodios: List[Dict[str, Any]]):
+        """Valida, inserta en una única transacción e indexa un lote de episodios"""
+        if self.validador and self.config.get('validacion_integridad', True):
+            resultados = await self.validador.validar_lote(episodios)
+            for episodio, resultado in zip(episodios, resultados):
+                if not resultado['integro']:
+                    logger.warning(f"Episodio {episodio['id']} con errores de integridad: {resultado['errores']}")
+        
+        guardados = await asyncio.to_thread(self._insertar_lote, episodios)
+        if not guardados:
+            raise RuntimeError(f"No se pudo guardar ninguno de los {len(episodios)} episodios")
+        
+        if self.indexador:
+            await self.indexador.indexar_lote(guardados)
+        
+        logger.info(f"Episodios guardados: {len(guardados)}")
+    
+    def _insertar_lote(self, episodios: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Inserta un lote de episodios con un único executemany.
+        
+        Si el lote falla se reintenta fila a fila, de modo que un episodio
+        inválido no arrastra a los demás.
+        
+        Returns:
+            List[Dict]: Episodios efectivamente guardados
+        """
         session = self.Session()
         try:
-            # Validar estructura básica
-            if 'id' not in episodio:
-                episodio['id'] = self._generar_id_episodio()
-            
-            # Crear objeto de base de datos
-            episodio_db = EpisodioDB(
-                id=episodio['id'],
-                objetivo=episodio.get('objetivo', ''),
-                session_id=episodio.get('session_id', ''),
-                plan_ejecutado=episodio.get('plan_ejecutado', {}),
-                resultados_tareas=episodio.get('resultados_tareas', []),
-                estado_global=episodio.get('estado_global', 'desconocido'),
-                duracion_total=episodio.get('duracion_total_segundos', 0),
-                contexto_ejecucion=episodio.get('contexto_ejecucion', {}),
-                metricas_rendimiento=episodio.get('metricas_rendimiento', {}),
-                recursos_utilizados=episodio.get('recursos_utilizados', {}),
-                timestamp_inicio=episodio.get('timestamp_inicio'),
-                timestamp_fin=episodio.get('timestamp_fin'),
-                version_sistema=episodio.get('version_sistema', ''),
-                checksum_integridad=episodio.get('checksum_integridad', ''),
-                feedback_usuario=episodio.get('feedback_usuario'),
-                evaluacion_automatica=episodio.get('evaluacion_automatica', {})
-            )
-            
-            session.add(episodio_db)
+            session.execute(sa.insert(EpisodioDB), [self._a_fila(episodio) for episodio in episodios])
             session.commit()
-            
-            logger.info(f"Episodio guardado: {episodio['id']}")
-            return episodio['id']
-            
+            guardados = episodios
         except Exception as e:
             session.rollback()
-            logger.error(f"Error guardando episodio: {e}")
-            raise
+            if len(episodios) == 1:
+                logger.error(f"Error guardando episodio {episodios[0]['id']}: {e}")
+                raise
+            logger.warning(f"Error guardando lote de {len(episodios)} episodios, se reintenta uno a uno: {e}")
+            guardados = []
+            for episodio in episodios:
+                try:
+                    session.execute(sa.insert(EpisodioDB), [self._a_fila(episodio)])
+                    session.commit()
+                    guardados.append(episodio)
+                except Exception as e_episodio:
+                    session.rollback()
+                    logger.error(f"Error guardando episodio {episodio['id']}: {e_episodio}")
         finally:
             session.close()
+        
+        for episodio in guardados:
+            self.invalidar_cache(episodio['id'])
+        return guardados
+    
+    def _a_fila(self, episodio: Dict[str, Any]) -> Dict[str, Any]:
+        """Convierte un episodio en los valores de columna de EpisodioDB"""
+        return {
+            'id': episodio['id'],
+            'timestamp_creacion': episodio['timestamp_creacion'],
+            'objetivo': episodio.get('objetivo', ''),
+            'session_id': episodio.get('session_id', ''),
+            'plan_ejecutado': episodio.get('plan_ejecutado', {}),
+            'resultados_tareas': episodio.get('resultados_tareas', []),
+            'estado_global': episodio.get('estado_global', 'desconocido'),
+            'duracion_total': episodio.get('duracion_total_segundos', 0),
+            'contexto_ejecucion': episodio.get('contexto_ejecucion', {}),
+            'metricas_rendimiento': episodio.get('metricas_rendimiento', {}),
+            'recursos_utilizados': episodio.get('recursos_utilizados', {}),
+            'timestamp_inicio': episodio.get('timestamp_inicio'),
+            'timestamp_fin': episodio.get('timestamp_fin'),
+            'version_sistema': episodio.get('version_sistema', ''),
+            'checksum_integridad': episodio.get('checksum_integridad', ''),
+            'feedback_usuario': episodio.get('feedback_usuario'),
+            'evaluacion_automatica': episodio.get('evaluacion_automatica', {})
+        }
+    
+    async def esperar_persistencia(self):
+        """Espera a que todos los episodios encolados estén persistidos"""
+        if self._cola is not None and self._pendientes:
+            if self._tarea_escritura is None or self._tarea_escritura.done():
+                self._tarea_escritura = asyncio.create_task(self._procesar_cola())
+            await self._cola.join()
+    
+    async def cerrar(self):
+        """Vacía la cola de escritura y detiene el worker de persistencia"""
+        await self.esperar_persistencia()
+        if self._tarea_escritura is not None:
+            self._tarea_escritura.cancel()
+            self._tarea_escritura = None
     
     def _generar_id_episodio(self) -> str:
         """Genera un ID único para el episodio"""
@@ -108,16 +288,55 @@ class GestorMemoriaEpisodica:
         Returns:
             Optional[Dict]: Episodio completo o None si no existe
         """
+        # Copias profundas: contexto, resultados y metadatos son JSON anidado
+        # que el llamante no debe poder modificar en la caché
+        pendiente = self._pendientes.get(episodio_id)
+        if pendiente is not None:
+            return copy.deepcopy(pendiente)
+        
+        if self.cache_habilitado:
+            with self._lock_cache:
+                episodio = self._cache_episodios.get(episodio_id)
+                if episodio is not None:
+                    self._cache_episodios.move_to_end(episodio_id)
+            # Las entradas se sustituyen, nunca se modifican: se copian fuera del lock
+            if episodio is not None:
+                return copy.deepcopy(episodio)
+        
         session = self.Session()
         try:
-            episodio_db = session.query(EpisodioDB).filter(EpisodioDB.id == episodio_id).first()
-            if not episodio_db:
+            fila = session.execute(
+                sa.select(*_COLUMNAS_EPISODIO).where(EpisodioDB.id == episodio_id)
+            ).mappings().first()
+            if not fila:
                 return None
             
-            return self._db_a_dict(episodio_db)
+            episodio = dict(fila)
             
         finally:
             session.close()
+        
+        if self.cache_habilitado:
+            with self._lock_cache:
+                self._cache_episodios[episodio_id] = episodio
+                self._cache_episodios.move_to_end(episodio_id)
+                if len(self._cache_episodios) > self.tamaño_cache:
+                    self._cache_episodios.popitem(last=False)
+        
+        return copy.deepcopy(episodio)
+    
+    def invalidar_cache(self, episodio_id: Optional[str] = None):
+        """
+        Elimina un episodio de la caché, o la vacía por completo.
+        
+        Args:
+            episodio_id: ID del episodio a invalidar; None vacía toda la caché
+        """
+        with self._lock_cache:
+            if episodio_id is None:
+                self._cache_episodios.clear()
+            else:
+                self._cache_episodios.pop(episodio_id, None)
     
     async def obtener_episodios(self, filtros: Optional[Dict] = None, limite: int = 100) -> List[Dict[str, Any]]:
         """
@@ -130,48 +349,29 @@ class GestorMemoriaEpisodica:
         Returns:
             List[Dict]: Lista de episodios que coinciden con los filtros
         """
+        # Los episodios aún en cola deben ser visibles para la consulta
+        await self.esperar_persistencia()
+        
         session = self.Session()
         try:
-            query = session.query(EpisodioDB)
+            consulta = sa.select(*_COLUMNAS_EPISODIO)
             
             # Aplicar filtros
             if filtros:
                 if 'estado' in filtros:
-                    query = query.filter(EpisodioDB.estado_global == filtros['estado'])
+                    consulta = consulta.where(EpisodioDB.estado_global == filtros['estado'])
                 if 'desde' in filtros:
-                    query = query.filter(EpisodioDB.timestamp_creacion >= filtros['desde'])
+                    consulta = consulta.where(EpisodioDB.timestamp_creacion >= filtros['desde'])
                 if 'hasta' in filtros:
-                    query = query.filter(EpisodioDB.timestamp_creacion <= filtros['hasta'])
+                    consulta = consulta.where(EpisodioDB.timestamp_creacion <= filtros['hasta'])
                 if 'objetivo_contiene' in filtros:
-                    query = query.filter(EpisodioDB.objetivo.contains(filtros['objetivo_contiene']))
+                    consulta = consulta.where(EpisodioDB.objetivo.contains(filtros['objetivo_contiene']))
                 if 'session_id' in filtros:
-                    query = query.filter(EpisodioDB.session_id == filtros['session_id'])
+                    consulta = consulta.where(EpisodioDB.session_id == filtros['session_id'])
             
-            episodios_db = query.order_by(EpisodioDB.timestamp_creacion.desc()).limit(limite).all()
+            consulta = consulta.order_by(EpisodioDB.timestamp_creacion.desc()).limit(limite)
             
-            return [self._db_a_dict(ep) for ep in episodios_db]
+            return [dict(fila) for fila in session.execute(consulta).mappings()]
             
         finally:
             session.close()
-    
-    def _db_a_dict(self, episodio_db: EpisodioDB) -> Dict[str, Any]:
-        """Convierte un objeto de base de datos a diccionario"""
-        return {
-            'id': episodio_db.id,
-            'objetivo': episodio_db.objetivo,
-            'session_id': episodio_db.session_id,
-            'plan_ejecutado': episodio_db.plan_ejecutado,
-            'resultados_tareas': episodio_db.resultados_tareas,
-            'estado_global': episodio_db.estado_global,
-            'duracion_total_segundos': episodio_db.duracion_total,
-            'contexto_ejecucion': episodio_db.contexto_ejecucion,
-            'metricas_rendimiento': episodio_db.metricas_rendimiento,
-            'recursos_utilizados': episodio_db.recursos_utilizados,
-            'timestamp_inicio': episodio_db.timestamp_inicio,
-            'timestamp_fin': episodio_db.timestamp_fin,
-            'version_sistema': episodio_db.version_sistema,
-            'checksum_integridad': episodio_db.checksum_integridad,
-            'feedback_usuario': episodio_db.feedback_usuario,
-            'evaluacion_automatica': episodio_db.evaluacion_automatica,
-            'timestamp_creacion': episodio_db.timestamp_creacion
-        }
\ No newline at end of file
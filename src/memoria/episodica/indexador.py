@@ -1,18 +1,34 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Set
 from datetime import datetime
+from bisect import bisect_right
+import re
 from loguru import logger
 
+_TOKEN_RE = re.compile(r'\b[a-záéíóúñ]{3,}\b')
+_STOPWORDS = frozenset({'con', 'para', 'por', 'de', 'la', 'el', 'en', 'y', 'a', 'los', 'las'})
+# Bandas de rendimiento en tramos de 0.2: índice = int(rendimiento * 5)
+_BANDAS_RENDIMIENTO = ("deficiente", "deficiente", "regular", "bueno", "excelente", "excelente")
+
 class IndexadorEpisodios:
     """Sistema de indexación para búsqueda eficiente en memoria episódica"""
     
     def __init__(self, gestor_episodica, configuracion: Dict[str, Any]):
         self.gestor = gestor_episodica
         self.config = configuracion
-        self.indices: Dict[str, Any] = {}
+        self.indices: Dict[str, Dict[str, Set[int]]] = {}
+        self._id_to_ord: Dict[str, int] = {}
+        self._ord_to_id: List[str] = []
         self._inicializar_indices()
     
     def _inicializar_indices(self):
-        """Inicializa los índices para búsqueda rápida"""
+        """
+        Inicializa los índices para búsqueda rápida.
+        
+        Cada índice invertido guarda conjuntos de ordinales enteros; el ID
+        real del episodio se resuelve a través de ``_ord_to_id``.
+        """
+        self._id_to_ord = {}
+        self._ord_to_id = []
         self.indices = {
             'por_estado': {},
             'por_objetivo': {},
@@ -29,65 +45,115 @@ class IndexadorEpisodios:
             episodio: Episodio a indexar
         """
         try:
-            # Índice por estado
-            estado = episodio.get('estado_global', 'desconocido')
-            if estado not in self.indices['por_estado']:
-                self.indices['por_estado'][estado] = []
-            self.indices['por_estado'][estado].append(episodio['id'])
+            ordinal = self._obtener_ordinal(episodio['id'])
             
             # Índice por objetivo (tokens)
             objetivo = episodio.get('objetivo', '')
             tokens = self._extraer_tokens(objetivo)
             for token in tokens:
-                if token not in self.indices['por_objetivo']:
-                    self.indices['por_objetivo'][token] = []
-                self.indices['por_objetivo'][token].append(episodio['id'])
+                self._agregar_a_indice('por_objetivo', token, ordinal)
             
-            # Índice por sesión
-            session_id = episodio.get('session_id')
-            if session_id:
-                if session_id not in self.indices['por_session']:
-                    self.indices['por_session'][session_id] = []
-                self.indices['por_session'][session_id].append(episodio['id'])
-            
-            # Índice por fecha
-            fecha = episodio.get('timestamp_creacion').date() if episodio.get('timestamp_creacion') else None
-            if fecha:
-                fecha_str = fecha.isoformat()
-                if fecha_str not in self.indices['por_fecha']:
-                    self.indices['por_fecha'][fecha_str] = []
-                self.indices['por_fecha'][fecha_str].append(episodio['id'])
-            
-            # Índice por rendimiento
-            rendimiento = episodio.get('metricas_rendimiento', {}).get('puntuacion_global', 0.5)
-            banda_rendimiento = self._categorizar_rendimiento(rendimiento)
-            if banda_rendimiento not in self.indices['por_rendimiento']:
-                self.indices['por_rendimiento'][banda_rendimiento] = []
-            self.indices['por_rendimiento'][banda_rendimiento].append(episodio['id'])
+            self._indexar_atributos(episodio, ordinal)
             
             logger.debug(f"Episodio indexado: {episodio['id']}")
             
         except Exception as e:
             logger.error(f"Error indexando episodio: {e}")
     
+    async def indexar_lote(self, episodios: List[Dict[str, Any]]):
+        """
+        Indexa un lote de episodios tokenizando todos los objetivos en una sola pasada.
+        
+        Args:
+            episodios: Episodios a indexar
+        """
+        try:
+            ordinales = [self._obtener_ordinal(episodio['id']) for episodio in episodios]
+            
+            # Concatenar los objetivos y atribuir cada token por su desplazamiento
+            objetivos = [(episodio.get('objetivo') or '').lower() for episodio in episodios]
+            inicios = []
+            posicion = 0
+            for objetivo in objetivos:
+                inicios.append(posicion)
+                posicion += len(objetivo) + 1
+            
+            for coincidencia in _TOKEN_RE.finditer('\n'.join(objetivos)):
+                token = coincidencia.group()
+                if token not in _STOPWORDS:
+                    ordinal = ordinales[bisect_right(inicios, coincidencia.start()) - 1]
+                    self._agregar_a_indice('por_objetivo', token, ordinal)
+            
+            for episodio, ordinal in zip(episodios, ordinales):
+                self._indexar_atributos(episodio, ordinal)
+            
+            logger.debug(f"Lote de {len(episodios)} episodios indexado")
+            
+        except Exception as e:
+            logger.error(f"Error indexando lote de episodios: {e}")
+    
+    async def reconstruir_indices(self, limite: int = 10**6):
+        """
+        Reconstruye los índices en memoria a partir de los episodios almacenados.
+        
+        Args:
+            limite: Número máximo de episodios a cargar
+        """
+        self._inicializar_indices()
+        episodios = await self.gestor.obtener_episodios(limite=limite)
+        await self.indexar_lote(episodios)
+        logger.info(f"Índices reconstruidos con {len(episodios)} episodios")
+    
+    def _indexar_atributos(self, episodio: Dict[str, Any], ordinal: int):
+        """Indexa estado, sesión, fecha y rendimiento de un episodio"""
+        # Índice por estado
+        estado = episodio.get('estado_global', 'desconocido')
+        self._agregar_a_indice('por_estado', estado, ordinal)
+        
+        # Índice por sesión
+        session_id = episodio.get('session_id')
+        if session_id:
+            self._agregar_a_indice('por_session', session_id, ordinal)
+        
+        # Índice por fecha
+        fecha = episodio.get('timestamp_creacion').date() if episodio.get('timestamp_creacion') else None
+        if fecha:
+            self._agregar_a_indice('por_fecha', fecha.isoformat(), ordinal)
+        
+        # Índice por rendimiento
+        rendimiento = (episodio.get('metricas_rendimiento') or {}).get('puntuacion_global', 0.5)
+        banda_rendimiento = self._categorizar_rendimiento(rendimiento)
+        self._agregar_a_indice('por_rendimiento', banda_rendimiento, ordinal)
+    
+    def _obtener_ordinal(self, episodio_id: str) -> int:
+        """Devuelve el ordinal de un episodio, asignándolo si es nuevo"""
+        ordinal = self._id_to_ord.get(episodio_id)
+        if ordinal is None:
+            ordinal = len(self._ord_to_id)
+            self._id_to_ord[episodio_id] = ordinal
+            self._ord_to_id.append(episodio_id)
+        return ordinal
+    
+    def _agregar_a_indice(self, indice: str, clave: str, ordinal: int):
+        """Añade un ordinal de episodio a la entrada de un índice"""
+        entradas = self.indices[indice].get(clave)
+        if entradas is None:
+            entradas = self.indices[indice][clave] = set()
+        entradas.add(ordinal)
+    
     def _extraer_tokens(self, texto: str) -> List[str]:
         """Extrae tokens significativos de un texto"""
-        import re
         # Eliminar stopwords y tokenizar
-        palabras = re.findall(r'\b[a-záéíóúñ]{3,}\b', texto.lower())
-        stopwords = {'con', 'para', 'por', 'de', 'la', 'el', 'en', 'y', 'a', 'los', 'las'}
-        return [p for p in palabras if p not in stopwords]
+        return [p for p in _TOKEN_RE.findall(texto.lower()) if p not in _STOPWORDS]
     
     def _categorizar_rendimiento(self, rendimiento: float) -> str:
         """Categoriza el rendimiento en bandas"""
-        if rendimiento >= 0.8:
-            return "excelente"
-        elif rendimiento >= 0.6:
-            return "bueno"
-        elif rendimiento >= 0.4:
-            return "regular"
-        else:
-            return "deficiente"
+        return _BANDAS_RENDIMIENTO[max(0, min(5, int(rendimiento * 5)))]
+    
+    def _obtener_bandas_relevantes(self, rendimiento_minimo: float) -> List[str]:
+        """Obtiene las bandas que pueden contener episodios con rendimiento >= mínimo"""
+        indice = max(0, min(5, int(rendimiento_minimo * 5)))
+        return list(dict.fromkeys(_BANDAS_RENDIMIENTO[indice:]))
     
     async def buscar_episodios(self, criterios: Dict[str, Any]) -> List[str]:
         """
@@ -100,46 +166,53 @@ class IndexadorEpisodios:
             List[str]: Lista de IDs de episodios que coinciden
         """
         try:
-            conjuntos_ids = []
+            conjuntos_ids: List[Set[int]] = []
+            vacio: Set[int] = set()
             
             # Búsqueda por estado
             if 'estado' in criterios:
-                estado_ids = self.indices['por_estado'].get(criterios['estado'], [])
-                conjuntos_ids.append(set(estado_ids))
+                conjuntos_ids.append(self.indices['por_estado'].get(criterios['estado'], vacio))
             
             # Búsqueda por objetivo
             if 'objetivo_contiene' in criterios:
                 tokens = self._extraer_tokens(criterios['objetivo_contiene'])
-                objetivo_ids = set()
-                for token in tokens:
-                    if token in self.indices['por_objetivo']:
-                        objetivo_ids.update(self.indices['por_objetivo'][token])
+                if getattr(self.gestor, 'fts_habilitado', False):
+                    # El índice FTS5 persiste entre reinicios y cubre episodios no indexados en memoria
+                    ids_fts = await self.gestor.buscar_ids_por_objetivo(tokens)
+                    objetivo_ids = {self._obtener_ordinal(episodio_id) for episodio_id in ids_fts}
+                else:
+                    por_objetivo = self.indices['por_objetivo']
+                    objetivo_ids = set()
+                    for token in tokens:
+                        if token in por_objetivo:
+                            objetivo_ids |= por_objetivo[token]
                 conjuntos_ids.append(objetivo_ids)
             
             # Búsqueda por sesión
             if 'session_id' in criterios:
-                session_ids = self.indices['por_session'].get(criterios['session_id'], [])
-                conjuntos_ids.append(set(session_ids))
+                conjuntos_ids.append(self.indices['por_session'].get(criterios['session_id'], vacio))
             
             # Búsqueda por fecha
             if 'fecha' in criterios:
                 fecha_str = criterios['fecha'].isoformat() if hasattr(criterios['fecha'], 'isoformat') else criterios['fecha']
-                fecha_ids = self.indices['por_fecha'].get(fecha_str, [])
-                conjuntos_ids.append(set(fecha_ids))
+                conjuntos_ids.append(self.indices['por_fecha'].get(fecha_str, vacio))
             
             # Búsqueda por rendimiento
             if 'rendimiento_minimo' in criterios:
                 bandas_relevantes = self._obtener_bandas_relevantes(criterios['rendimiento_minimo'])
+                por_rendimiento = self.indices['por_rendimiento']
                 rendimiento_ids = set()
                 for banda in bandas_relevantes:
-                    if banda in self.indices['por_rendimiento']:
-                        rendimiento_ids.update(self.indices['por_rendimiento'][banda])
+                    if banda in por_rendimiento:
+                        rendimiento_ids |= por_rendimiento[banda]
                 conjuntos_ids.append(rendimiento_ids)
             
-            # Intersección de todos los criterios
+            # Intersección de todos los criterios (empezando por el conjunto más pequeño)
             if conjuntos_ids:
-                ids_coincidentes = set.intersection(*conjuntos_ids)
-                return list(ids_coincidentes)
+                conjuntos_ids.sort(key=len)
+                ordinales = conjuntos_ids[0].intersection(*conjuntos_ids[1:])
+                ord_to_id = self._ord_to_id
+                return [ord_to_id[o] for o in ordinales]
             else:
                 return []
                 
@@ -1,4 +1,5 @@
 from typing import Dict, List, Any, Optional
+import asyncio
 import hashlib
 from loguru import logger
 
@@ -18,6 +19,22 @@ class ValidadorIntegridad:
         Returns:
             Dict: Resultado de la validación
         """
+        return self._validar(episodio)
+    
+    async def validar_lote(self, episodios: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Valida un lote de episodios en un hilo para no bloquear el event loop.
+        
+        Args:
+            episodios: Episodios a validar
+        
+        Returns:
+            List[Dict]: Resultados de validación en el mismo orden
+        """
+        return await asyncio.to_thread(lambda: [self._validar(episodio) for episodio in episodios])
+    
+    def _validar(self, episodio: Dict[str, Any]) -> Dict[str, Any]:
+        """Validación síncrona de un episodio (trabajo puramente de CPU)"""
         resultados = {
             'integro': True,
             'errores': [],
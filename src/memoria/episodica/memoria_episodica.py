@@ -0,0 +1,131 @@
+from typing import Dict, List, Any, Optional, Tuple
+from datetime import datetime
+import orjson
+from sqlalchemy import create_engine, func, case
+from sqlalchemy.orm import sessionmaker
+from loguru import logger
+from memoria.episodica.modelo import Base, EpisodioDB
+
+class MemoriaEpisodica:
+    """Gestiona el almacenamiento inmutable de episodios de ejecución"""
+    
+    def __init__(self, cadena_conexion: str = "sqlite:///./data/episodica.db"):
+        self.engine = create_engine(cadena_conexion)
+        Base.metadata.create_all(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+    
+    def guardar_episodio(self, episodio: Dict[str, Any]) -> str:
+        """Guarda un episodio completo en la memoria episódica"""
+        session = self.Session()
+        try:
+            # Generar ID único
+            # orjson serializa el episodio mucho más rápido que str() sobre el dict
+            huella = hash(orjson.dumps(episodio, option=orjson.OPT_NON_STR_KEYS, default=str))
+            episodio_id = f"episodio_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{huella % 10000:04d}"
+            
+            # Crear objeto de base de datos
+            episodio_db = EpisodioDB(
+                id=episodio_id,
+                objetivo=episodio.get('objetivo', ''),
+                plan_ejecutado=episodio.get('plan', {}),
+                resultados_tareas=episodio.get('resultados', {}),
+                feedback_usuario=episodio.get('feedback_usuario', {}),
+                metricas_rendimiento=episodio.get('metricas', {}),
+                duracion_total=episodio.get('duracion_total', 0),
+                estado_global=episodio.get('estado', 'desconocido')
+            )
+            
+            session.add(episodio_db)
+            session.commit()
+            
+            logger.info(f"Episodio guardado: {episodio_id}")
+            return episodio_id
+            
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Error guardando episodio: {e}")
+            raise
+        finally:
+            session.close()
+    
+    @staticmethod
+    def _aplicar_filtros(query, filtros: Optional[Dict]):
+        """Añade a la consulta los filtros admitidos sobre episodios"""
+        if filtros:
+            if 'estado' in filtros:
+                query = query.filter(EpisodioDB.estado_global == filtros['estado'])
+            if 'desde' in filtros:
+                query = query.filter(EpisodioDB.timestamp_creacion >= filtros['desde'])
+            if 'hasta' in filtros:
+                query = query.filter(EpisodioDB.timestamp_creacion <= filtros['hasta'])
+            if 'objetivo_contiene' in filtros:
+                query = query.filter(EpisodioDB.objetivo.contains(filtros['objetivo_contiene']))
+        return query
+    
+    def obtener_episodios(self, filtros: Optional[Dict] = None, 
+                         limite: int = 100) -> List[Dict[str, Any]]:
+        """Obtiene episodios con filtros opcionales"""
+        session = self.Session()
+        try:
+            query = self._aplicar_filtros(session.query(EpisodioDB), filtros)
+            
+            episodios = query.order_by(EpisodioDB.timestamp_creacion.desc()).limit(limite).all()
+            
+            return [{
+                'id': ep.id,
+                'timestamp': ep.timestamp_creacion,
+                'objetivo': ep.objetivo,
+                'plan': ep.plan_ejecutado,
+                'resultados': ep.resultados_tareas,
+                'feedback_usuario': ep.feedback_usuario,
+                'metricas': ep.metricas_rendimiento,
+                'duracion_total': ep.duracion_total,
+                'estado': ep.estado_global
+            } for ep in episodios]
+            
+        finally:
+            session.close()
+    
+    def contar_episodios(self, filtros: Optional[Dict] = None) -> Tuple[int, int]:
+        """
+        Cuenta los episodios y los exitosos con una única consulta agregada.
+        
+        Args:
+            filtros: Mismos filtros que ``obtener_episodios``
+        
+        Returns:
+            Tuple[int, int]: Total de episodios y episodios con estado 'exito'
+        """
+        session = self.Session()
+        try:
+            # COUNT sobre CASE en lugar de FILTER (WHERE ...) para no depender del dialecto
+            query = session.query(
+                func.count(EpisodioDB.id),
+                func.count(case((EpisodioDB.estado_global == 'exito', 1)))
+            )
+            total, exitosos = self._aplicar_filtros(query, filtros).one()
+            return int(total or 0), int(exitosos or 0)
+            
+        finally:
+            session.close()
+    
+    def obtener_episodios_por_tipo_tarea(self, tipo_tarea: str, 
+                                       limite: int = 50) -> List[Dict[str, Any]]:
+        """Obtiene episodios relacionados con un tipo específico de tarea"""
+        session = self.Session()
+        try:
+            # Buscar episodios cuyo objetivo contenga el tipo de tarea
+            episodios = session.query(EpisodioDB).filter(
+                EpisodioDB.objetivo.contains(tipo_tarea)
+            ).order_by(EpisodioDB.timestamp_creacion.desc()).limit(limite).all()
+            
+            return [{
+                'id': ep.id,
+                'timestamp': ep.timestamp_creacion,
+                'objetivo': ep.objetivo,
+                'estado': ep.estado_global,
+                'metricas': ep.metricas_rendimiento
+            } for ep in episodios]
+            
+        finally:
+            session.close()
\ No newline at end of file
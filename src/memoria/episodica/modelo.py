@@ -0,0 +1,58 @@
+from datetime import datetime
+import orjson
+import sqlalchemy as sa
+from sqlalchemy import Column, String, DateTime, Float
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.types import TypeDecorator
+
+Base = declarative_base()
+
+_OPCIONES_ORJSON = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC
+
+class FastJSON(TypeDecorator):
+    """
+    Columna JSON serializada con orjson y almacenada como binario.
+    
+    Evita el paso por el serializador json de la librería estándar en cada
+    inserción. Serializa directamente arrays y escalares NumPy y datetimes
+    sin zona (como UTC). La lectura acepta también valores TEXT heredados
+    del tipo JSON.
+    """
+    impl = sa.LargeBinary
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return orjson.dumps(value, option=_OPCIONES_ORJSON)
+    
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return orjson.loads(value)
+
+class EpisodioDB(Base):
+    """
+    Modelo de base de datos para episodios, compartido por
+    GestorMemoriaEpisodica y MemoriaEpisodica.
+    """
+    __tablename__ = 'episodios'
+    
+    id = Column(String, primary_key=True)
+    timestamp_creacion = Column(DateTime, default=datetime.utcnow)
+    objetivo = Column(String, nullable=False)
+    session_id = Column(String, nullable=False, default='')
+    plan_ejecutado = Column(FastJSON, nullable=False)
+    resultados_tareas = Column(FastJSON, nullable=False)
+    estado_global = Column(String, nullable=False)
+    duracion_total = Column(Float, nullable=False)
+    contexto_ejecucion = Column(FastJSON)
+    metricas_rendimiento = Column(FastJSON)
+    recursos_utilizados = Column(FastJSON)
+    # Nullable: MemoriaEpisodica no registra los timestamps de ejecución
+    timestamp_inicio = Column(DateTime)
+    timestamp_fin = Column(DateTime)
+    version_sistema = Column(String, nullable=False, default='')
+    checksum_integridad = Column(String, nullable=False, default='')
+    feedback_usuario = Column(FastJSON)
+    evaluacion_automatica = Column(FastJSON)
@@ -1,6 +1,26 @@
-from typing import Dict, List, Any, Optional, Deque
-from collections import deque
+from typing import Dict, List, Any, Optional
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime
+from itertools import islice
+import time
+
+@dataclass(slots=True)
+class EntradaBuffer:
+    """Entrada compacta del buffer de tareas"""
+    tarea_id: str
+    resultado: Dict[str, Any]
+    ts_ns: int
+    estado: str
+    
+    def a_dict(self) -> Dict[str, Any]:
+        """Representación en diccionario expuesta por la API del buffer"""
+        return {
+            'tarea_id': self.tarea_id,
+            'resultado': self.resultado,
+            'ts_ns': self.ts_ns,
+            'estado': self.estado
+        }
 
 class BufferTareas:
     """
@@ -15,8 +35,9 @@ class BufferTareas:
         Args:
             capacidad_maxima: Número máximo de tareas en buffer
         """
-        self._buffer: Deque[Dict[str, Any]] = deque(maxlen=capacidad_maxima)
-        self._indices: Dict[str, int] = {}  # Mapa de task_id a índice
+        self.capacidad_maxima = capacidad_maxima
+        # Orden de inserción + acceso O(1) por task_id en una única estructura
+        self._buffer: OrderedDict[str, EntradaBuffer] = OrderedDict()
     
     def agregar_tarea(self, tarea_id: str, resultado: Dict[str, Any]) -> None:
         """
@@ -26,15 +47,25 @@ class BufferTareas:
             tarea_id: Identificador de la tarea
             resultado: Resultado de la ejecución
         """
-        entrada = {
-            'tarea_id': tarea_id,
-            'resultado': resultado,
-            'timestamp': datetime.now(),
-            'estado': resultado.get('estado', 'completada')
-        }
+        self._buffer[tarea_id] = EntradaBuffer(
+            tarea_id, resultado, time.time_ns(), resultado.get('estado', 'completada')
+        )
+        self._buffer.move_to_end(tarea_id)
+        if len(self._buffer) > self.capacidad_maxima:
+            self._buffer.popitem(last=False)
+    
+    @staticmethod
+    def obtener_timestamp(entrada: Dict[str, Any]) -> datetime:
+        """
+        Construye bajo demanda el datetime de una entrada del buffer.
         
-        self._buffer.append(entrada)
-        self._indices[tarea_id] = len(self._buffer) - 1
+        Args:
+            entrada: Entrada devuelta por el buffer
+        
+        Returns:
+            datetime: Momento en que se agregó la tarea (hora local)
+        """
+        return datetime.fromtimestamp(entrada['ts_ns'] / 1e9)
     
     def obtener_tarea(self, tarea_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -46,11 +77,8 @@ class BufferTareas:
         Returns:
             Optional[Dict]: Resultado de la tarea o None
         """
-        if tarea_id in self._indices:
-            index = self._indices[tarea_id]
-            if index < len(self._buffer):
-                return self._buffer[index]
-        return None
+        entrada = self._buffer.get(tarea_id)
+        return entrada.a_dict() if entrada is not None else None
     
     def obtener_ultimas_tareas(self, cantidad: int = 10) -> List[Dict[str, Any]]:
         """
@@ -62,7 +90,9 @@ class BufferTareas:
         Returns:
             List: Lista de tareas más recientes
         """
-        return list(self._buffer)[-cantidad:]
+        ultimas = [entrada.a_dict() for entrada in islice(reversed(self._buffer.values()), cantidad)]
+        ultimas.reverse()
+        return ultimas
     
     def limpiar_completadas(self) -> int:
         """
@@ -71,18 +101,9 @@ class BufferTareas:
         Returns:
             int: Número de tareas eliminadas
         """
-        tareas_a_mantener = []
-        indices_actualizados = {}
-        eliminadas = 0
-        
-        for i, tarea in enumerate(self._buffer):
-            if tarea['estado'] != 'completada':
-                tareas_a_mantener.append(tarea)
-                indices_actualizados[tarea['tarea_id']] = len(tareas_a_mantener) - 1
-            else:
-                eliminadas += 1
-        
-        self._buffer = deque(tareas_a_mantener, maxlen=self._buffer.maxlen)
-        self._indices = indices_actualizados
+        completadas = [tarea_id for tarea_id, tarea in self._buffer.items()
+                       if tarea.estado == 'completada']
+        for tarea_id in completadas:
+            del self._buffer[tarea_id]
         
-        return eliminadas
\ No newline at end of file
+        return len(completadas)
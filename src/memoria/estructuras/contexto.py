@@ -1,4 +1,4 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Mapping, Iterator, Tuple
 from datetime import datetime
 from enum import Enum
 
@@ -9,6 +9,33 @@ class TipoContexto(Enum):
     RESULTADO = "resultado"
     CONVERSACION = "conversacion"
     METADATA = "metadata"
+    
+    def __new__(cls, valor: str):
+        # Cada miembro guarda su posición en la lista de buckets del almacén:
+        # evita el hash de Enum (implementado en Python) de un dict por tipo
+        miembro = object.__new__(cls)
+        miembro._value_ = valor
+        miembro.indice = len(cls.__members__)
+        return miembro
+
+class _VistaBucket(Mapping):
+    """Vista de solo lectura, sin copia, de los valores de un bucket de contexto"""
+    __slots__ = ('_bucket',)
+    
+    def __init__(self, bucket: Dict[str, Tuple[Any, datetime]]):
+        self._bucket = bucket
+    
+    def __getitem__(self, clave: str) -> Any:
+        return self._bucket[clave][0]
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._bucket)
+    
+    def __len__(self) -> int:
+        return len(self._bucket)
+    
+    def __repr__(self) -> str:
+        return f"_VistaBucket({dict(self)!r})"
 
 class AlmacenContexto:
     """
@@ -17,10 +44,10 @@ class AlmacenContexto:
     """
     
     def __init__(self):
-        self._contexto: Dict[TipoContexto, Dict[str, Any]] = {
-            tipo: {} for tipo in TipoContexto
-        }
-        self._timestamp_actualizacion: Dict[str, datetime] = {}
+        # Un bucket por tipo, indexado por TipoContexto.indice; cada valor va con su timestamp
+        self._buckets: List[Dict[str, Tuple[Any, datetime]]] = [{} for _ in TipoContexto]
+        # Timestamp de la actualización más reciente, mantenido de forma incremental
+        self._ts_max: Optional[datetime] = None
     
     def guardar_contexto(self, tipo: TipoContexto, clave: str, valor: Any) -> None:
         """
@@ -31,8 +58,10 @@ class AlmacenContexto:
             clave: Identificador único
             valor: Valor a almacenar
         """
-        self._contexto[tipo][clave] = valor
-        self._timestamp_actualizacion[f"{tipo.value}_{clave}"] = datetime.now()
+        ahora = datetime.now()
+        self._buckets[tipo.indice][clave] = (valor, ahora)
+        if self._ts_max is None or ahora > self._ts_max:
+            self._ts_max = ahora
     
     def obtener_contexto(self, tipo: TipoContexto, clave: str, default: Any = None) -> Any:
         """
@@ -46,9 +75,10 @@ class AlmacenContexto:
         Returns:
             Any: Valor almacenado o valor por defecto
         """
-        return self._contexto[tipo].get(clave, default)
+        registro = self._buckets[tipo.indice].get(clave)
+        return default if registro is None else registro[0]
     
-    def obtener_todo_tipo(self, tipo: TipoContexto) -> Dict[str, Any]:
+    def obtener_todo_tipo(self, tipo: TipoContexto) -> Mapping[str, Any]:
         """
         Obtiene todos los valores de un tipo de contexto.
         
@@ -56,9 +86,21 @@ class AlmacenContexto:
             tipo: Tipo de contexto
         
         Returns:
-            Dict: Todos los valores del tipo especificado
+            Mapping: Vista de solo lectura, sin copia, de los valores del tipo
+        """
+        return _VistaBucket(self._buckets[tipo.indice])
+    
+    def snapshot_tipo(self, tipo: TipoContexto) -> Dict[str, Any]:
+        """
+        Obtiene una copia modificable de los valores de un tipo de contexto.
+        
+        Args:
+            tipo: Tipo de contexto
+        
+        Returns:
+            Dict: Copia de los valores del tipo especificado
         """
-        return self._contexto[tipo].copy()
+        return {clave: valor for clave, (valor, _) in self._buckets[tipo.indice].items()}
     
     def eliminar_contexto(self, tipo: TipoContexto, clave: str) -> bool:
         """
@@ -71,13 +113,15 @@ class AlmacenContexto:
         Returns:
             bool: True si el valor existía y fue eliminado
         """
-        if clave in self._contexto[tipo]:
-            del self._contexto[tipo][clave]
-            timestamp_key = f"{tipo.value}_{clave}"
-            if timestamp_key in self._timestamp_actualizacion:
-                del self._timestamp_actualizacion[timestamp_key]
-            return True
-        return False
+        registro = self._buckets[tipo.indice].pop(clave, None)
+        if registro is None:
+            return False
+        if registro[1] == self._ts_max:
+            # Solo se recalcula cuando se elimina la actualización más reciente
+            self._ts_max = max(
+                (ts for bucket in self._buckets for _, ts in bucket.values()), default=None
+            )
+        return True
     
     def obtener_estadisticas(self) -> Dict[str, Any]:
         """
@@ -87,8 +131,7 @@ class AlmacenContexto:
             Dict: Métricas de utilización
         """
         return {
-            'total_por_tipo': {tipo.value: len(valores) for tipo, valores in self._contexto.items()},
-            'total_general': sum(len(valores) for valores in self._contexto.values()),
-            'timestamp_ultima_actualizacion': max(self._timestamp_actualizacion.values()) 
-                                            if self._timestamp_actualizacion else None
+            'total_por_tipo': {tipo.value: len(bucket) for tipo, bucket in zip(TipoContexto, self._buckets)},
+            'total_general': sum(len(bucket) for bucket in self._buckets),
+            'timestamp_ultima_actualizacion': self._ts_max
         }
\ No newline at end of file
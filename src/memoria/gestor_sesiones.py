@@ -1,5 +1,6 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 import uuid
+from collections import deque
 from datetime import datetime
 from loguru import logger
 import threading
@@ -16,12 +17,22 @@ class GestorSesiones:
     
     def __init__(self, configuracion: Dict[str, Any]):
         self.config = configuracion
-        self.sesiones_activas: Dict[str, MemoriaTrabajo] = {}
         self.timeout_sesion = configuracion.get('timeout_sesion', 7200)  # 2 horas por defecto
-        self._lock = threading.RLock()
+        self.max_entradas_por_sesion = configuracion.get('max_entradas_por_sesion', 10000)
+        # Particiones (lock, sesiones): sesiones distintas rara vez compiten por el mismo lock
+        self.num_particiones = configuracion.get('num_particiones', 16)
+        self._particiones: List[Tuple[threading.RLock, Dict[str, MemoriaTrabajo]]] = [
+            (threading.RLock(), {}) for _ in range(self.num_particiones)
+        ]
+        # Memorias de sesiones eliminadas, reiniciadas y listas para reutilizarse
+        self._pool: deque = deque(maxlen=configuracion.get('tamaño_pool_sesiones', 128))
         
         logger.info("Gestor de sesiones inicializado")
     
+    def _particion(self, session_id: str) -> Tuple[threading.RLock, Dict[str, MemoriaTrabajo]]:
+        """Devuelve la partición (lock, sesiones) responsable de un ID de sesión"""
+        return self._particiones[hash(session_id) % self.num_particiones]
+    
     def crear_sesion(self, session_id: Optional[str] = None) -> str:
         """
         Crea una nueva sesión con memoria de trabajo.
@@ -32,18 +43,34 @@ class GestorSesiones:
         Returns:
             str: ID de la sesión creada
         """
-        with self._lock:
-            session_id = session_id or f"session_{uuid.uuid4().hex[:16]}"
-            
-            if session_id in self.sesiones_activas:
+        session_id = session_id or f"session_{uuid.uuid4().hex[:16]}"
+        lock, sesiones = self._particion(session_id)
+        with lock:
+            if session_id in sesiones:
                 logger.warning(f"Sesión {session_id} ya existe, reinicializando")
                 self.eliminar_sesion(session_id)
             
-            self.sesiones_activas[session_id] = MemoriaTrabajo(self.timeout_sesion)
+            sesiones[session_id] = self._obtener_memoria()
             logger.info(f"Nueva sesión creada: {session_id}")
             
             return session_id
     
+    def _obtener_memoria(self) -> MemoriaTrabajo:
+        """
+        Reutiliza una memoria del pool o crea una nueva si está vacío.
+        
+        Las memorias del pool ya se reiniciaron al liberarse (vacías, con
+        ``ultimo_acceso`` actual y un ID de planificador nuevo); aquí solo se
+        renueva ``ultimo_acceso`` para que el tiempo en el pool no cuente
+        como inactividad de la nueva sesión.
+        """
+        try:
+            memoria = self._pool.popleft()
+        except IndexError:
+            return MemoriaTrabajo(self.timeout_sesion, self.max_entradas_por_sesion)
+        memoria.ultimo_acceso = time.monotonic()
+        return memoria
+    
     def obtener_sesion(self, session_id: str) -> Optional[MemoriaTrabajo]:
         """
         Obtiene la memoria de trabajo de una sesión específica.
@@ -51,11 +78,14 @@ class GestorSesiones:
         Args:
             session_id: ID de la sesión
         
+        La lectura no toma el lock de la partición: ``dict.get`` es atómico
+        bajo el GIL. Si la sesión se elimina concurrentemente puede devolverse
+        None, igual que si la lectura hubiera llegado justo después.
+        
         Returns:
             Optional[MemoriaTrabajo]: Instancia de memoria de trabajo o None
         """
-        with self._lock:
-            return self.sesiones_activas.get(session_id)
+        return self._particion(session_id)[1].get(session_id)
     
     def eliminar_sesion(self, session_id: str) -> bool:
         """
@@ -67,10 +97,12 @@ class GestorSesiones:
         Returns:
             bool: True si la sesión existía y fue eliminada
         """
-        with self._lock:
-            if session_id in self.sesiones_activas:
-                self.sesiones_activas[session_id].limpiar_todo()
-                del self.sesiones_activas[session_id]
+        lock, sesiones = self._particion(session_id)
+        with lock:
+            memoria = sesiones.pop(session_id, None)
+            if memoria is not None:
+                memoria.reiniciar()
+                self._pool.append(memoria)
                 logger.info(f"Sesión eliminada: {session_id}")
                 return True
             return False
@@ -82,26 +114,28 @@ class GestorSesiones:
         Returns:
             Dict: Métricas agregadas de todas las sesiones
         """
-        with self._lock:
-            stats = {
-                'total_sesiones': len(self.sesiones_activas),
-                'sesiones_activas': [],
-                'estadisticas_agregadas': {
-                    'total_entradas': 0,
-                    'tamano_total_estimado': 0
-                }
+        stats = {
+            'total_sesiones': 0,
+            'sesiones_activas': [],
+            'estadisticas_agregadas': {
+                'total_entradas': 0,
+                'tamano_total_estimado': 0
             }
-            
-            for session_id, memoria in self.sesiones_activas.items():
-                session_stats = memoria.obtener_estadisticas()
-                stats['sesiones_activas'].append({
-                    'session_id': session_id,
-                    'estadisticas': session_stats
-                })
-                stats['estadisticas_agregadas']['total_entradas'] += session_stats['total_entradas']
-                stats['estadisticas_agregadas']['tamano_total_estimado'] += session_stats['tamano_estimado']
-            
-            return stats
+        }
+        
+        for lock, sesiones in self._particiones:
+            with lock:
+                stats['total_sesiones'] += len(sesiones)
+                for session_id, memoria in sesiones.items():
+                    session_stats = memoria.obtener_estadisticas()
+                    stats['sesiones_activas'].append({
+                        'session_id': session_id,
+                        'estadisticas': session_stats
+                    })
+                    stats['estadisticas_agregadas']['total_entradas'] += session_stats['total_entradas']
+                    stats['estadisticas_agregadas']['tamano_total_estimado'] += session_stats['tamano_estimado']
+        
+        return stats
     
     def limpiar_sesiones_expiradas(self) -> int:
         """
@@ -110,18 +144,24 @@ class GestorSesiones:
         Returns:
             int: Número de sesiones eliminadas
         """
-        with self._lock:
-            sesiones_a_eliminar = []
-            ahora = time.time()
-            
-            for session_id, memoria in self.sesiones_activas.items():
-                # Verificar si la sesión ha estado inactiva por más del timeout
-                stats = memoria.obtener_estadisticas()
-                if ahora - stats['timestamp_ultima_limpieza'] > self.timeout_sesion:
-                    sesiones_a_eliminar.append(session_id)
-            
-            for session_id in sesiones_a_eliminar:
-                self.eliminar_sesion(session_id)
-            
-            logger.info(f"Eliminadas {len(sesiones_a_eliminar)} sesiones expiradas")
-            return len(sesiones_a_eliminar)
\ No newline at end of file
+        total_eliminadas = 0
+        ahora = time.monotonic()
+        
+        for lock, sesiones in self._particiones:
+            with lock:
+                sesiones_a_eliminar = []
+                
+                for session_id, memoria in sesiones.items():
+                    # Barrer las entradas expiradas de la sesión
+                    memoria._limpiar_expirados()
+                    
+                    # Verificar si la sesión ha estado inactiva por más del timeout
+                    if ahora - memoria.ultimo_acceso > self.timeout_sesion:
+                        sesiones_a_eliminar.append(session_id)
+                
+                for session_id in sesiones_a_eliminar:
+                    self.eliminar_sesion(session_id)
+                total_eliminadas += len(sesiones_a_eliminar)
+        
+        logger.info(f"Eliminadas {total_eliminadas} sesiones expiradas")
+        return total_eliminadas
\ No newline at end of file
@@ -0,0 +1,58 @@
+from typing import Tuple
+import numpy as np
+from loguru import logger
+
+try:
+    from numba import njit, prange
+    NUMBA_DISPONIBLE = True
+except ImportError:
+    NUMBA_DISPONIBLE = False
+    logger.debug("numba no disponible, se usarán los kernels de métricas en NumPy")
+
+def _consolidar_numpy(tasa_exito: np.ndarray, tiempo_promedio: np.ndarray,
+                      total_ejecuciones: np.ndarray) -> Tuple[float, float, int]:
+    """Sumas de tasa de éxito, tiempo promedio y ejecuciones (versión NumPy)"""
+    return float(tasa_exito.sum()), float(tiempo_promedio.sum()), int(total_ejecuciones.sum())
+
+def _plegar_ema_python(valor: float, observaciones: np.ndarray, alpha: float,
+                       solo_positivos: bool) -> float:
+    """Aplica secuencialmente la media móvil exponencial (versión Python)"""
+    for observacion in observaciones:
+        if solo_positivos:
+            if observacion <= 0:
+                continue
+            if valor == 0:
+                valor = observacion
+                continue
+        valor = alpha * observacion + (1 - alpha) * valor
+    return float(valor)
+
+if NUMBA_DISPONIBLE:
+    @njit(parallel=True, cache=True)
+    def consolidar(tasa_exito, tiempo_promedio, total_ejecuciones):
+        """Sumas de tasa de éxito, tiempo promedio y ejecuciones en paralelo"""
+        suma_tasa = 0.0
+        suma_tiempo = 0.0
+        suma_total = 0
+        for i in prange(tasa_exito.shape[0]):
+            suma_tasa += tasa_exito[i]
+            suma_tiempo += tiempo_promedio[i]
+            suma_total += total_ejecuciones[i]
+        return suma_tasa, suma_tiempo, suma_total
+    
+    @njit(cache=True)
+    def plegar_ema(valor, observaciones, alpha, solo_positivos):
+        """Aplica secuencialmente la media móvil exponencial a un lote de observaciones"""
+        for i in range(observaciones.shape[0]):
+            observacion = observaciones[i]
+            if solo_positivos:
+                if observacion <= 0:
+                    continue
+                if valor == 0:
+                    valor = observacion
+                    continue
+            valor = alpha * observacion + (1 - alpha) * valor
+        return valor
+else:
+    consolidar = _consolidar_numpy
+    plegar_ema = _plegar_ema_python
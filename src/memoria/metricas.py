@@ -1,6 +1,28 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
+import asyncio
 from datetime import datetime, timedelta
+import time
+import numpy as np
 from loguru import logger
+from memoria.kernels_metricas import consolidar, plegar_ema
+
+# Categorías asumidas para habilidades sin 'categorias' (tupla: no se asigna por iteración)
+_CATEGORIAS_DEFECTO = ('general',)
+
+def epoch_ultima_ejecucion(estadisticas: Dict) -> float:
+    """
+    Devuelve el instante de la última ejecución como epoch.
+    
+    Usa ``ultima_ejecucion_ts`` y solo parsea el ISO en registros anteriores
+    a ese campo. Devuelve 0 si la habilidad nunca se ejecutó.
+    """
+    ts = estadisticas.get('ultima_ejecucion_ts')
+    if ts is not None:
+        return ts
+    ultima_ejecucion = estadisticas.get('ultima_ejecucion')
+    if not ultima_ejecucion:
+        return 0.0
+    return datetime.fromisoformat(ultima_ejecucion.replace('Z', '+00:00')).timestamp()
 
 class GestorMetricas:
     """
@@ -11,84 +33,156 @@ class GestorMetricas:
         self.base = base_conocimiento
         self.config = configuracion
         
+        # Las ejecuciones se acumulan y se vuelcan en lote a la base de conocimiento
+        self.tamaño_lote = configuracion.get('tamaño_lote_metricas', 256)
+        self.espera_maxima_lote = configuracion.get('espera_maxima_lote_metricas', 0.05)
+        self._cola: Optional[asyncio.Queue] = None
+        self._tarea_volcado: Optional[asyncio.Task] = None
+        
     async def registrar_ejecucion(self, habilidad_id: str, resultado: Dict):
         """
         Registra los resultados de una ejecución de habilidad.
         
+        La actualización se encola y se aplica junto con las demás ejecuciones
+        del mismo lote; usar ``esperar_registros()`` para garantizar que está
+        persistida.
+        
         Args:
             habilidad_id: ID de la habilidad ejecutada
             resultado: Resultados de la ejecución
         """
-        try:
-            # Obtener métricas actuales
-            habilidad = await self.base.obtener_habilidad(habilidad_id)
-            if not habilidad:
-                logger.warning(f"Habilidad no encontrada: {habilidad_id}")
-                return
-            
-            metricas_actuales = habilidad.get('metricas_rendimiento', {})
-            estadisticas_actuales = habilidad.get('estadisticas_uso', {})
-            
-            # Actualizar métricas
-            nuevas_metricas = self._calcular_nuevas_metricas(metricas_actuales, resultado)
-            nuevas_estadisticas = self._actualizar_estadisticas(estadisticas_actuales, resultado)
-            
-            # Actualizar habilidad
-            await self.base.actualizar_habilidad(
-                habilidad_id,
-                {
-                    'metricas_rendimiento': nuevas_metricas,
-                    'estadisticas_uso': nuevas_estadisticas,
-                    'fecha_actualizacion': datetime.now().isoformat()
-                }
-            )
-            
-            logger.debug(f"Métricas actualizadas para habilidad {habilidad_id}")
+        if self._cola is None:
+            self._cola = asyncio.Queue()
+        self._asegurar_worker()
+        
+        await self._cola.put((habilidad_id, resultado))
+    
+    def _asegurar_worker(self):
+        """
+        Arranca el worker de volcado si no está en marcha.
+        
+        La cola se conserva al reiniciarlo: lo encolado antes de que el
+        worker terminara se procesa y ``esperar_registros()`` lo sigue viendo.
+        """
+        if self._tarea_volcado is None or self._tarea_volcado.done():
+            self._tarea_volcado = asyncio.create_task(self._procesar_cola())
+            self._tarea_volcado.add_done_callback(self._registrar_fin_worker)
+    
+    @staticmethod
+    def _registrar_fin_worker(tarea: asyncio.Task):
+        """Registra la excepción con la que terminó el worker; se reinicia con el siguiente registro"""
+        if not tarea.cancelled() and tarea.exception() is not None:
+            logger.error(f"Worker de métricas detenido por un error: {tarea.exception()}")
+    
+    async def _procesar_cola(self):
+        """Consume la cola de ejecuciones agrupándolas en lotes"""
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = [await self._cola.get()]
+            limite = loop.time() + self.espera_maxima_lote
+            while len(lote) < self.tamaño_lote:
+                restante = limite - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(await asyncio.wait_for(self._cola.get(), restante))
+                except asyncio.TimeoutError:
+                    break
             
-        except Exception as e:
-            logger.error(f"Error registrando ejecución: {e}")
+            try:
+                await self._aplicar_lote(lote)
+            except Exception as e:
+                logger.error(f"Error registrando lote de {len(lote)} ejecuciones: {e}")
+            finally:
+                for _ in lote:
+                    self._cola.task_done()
     
-    def _calcular_nuevas_metricas(self, metricas_actuales: Dict, resultado: Dict) -> Dict:
-        """Calcula nuevas métricas basado en el resultado de ejecución"""
-        nuevas_metricas = metricas_actuales.copy()
+    async def _aplicar_lote(self, lote: List[Tuple[str, Dict]]):
+        """Pliega todas las ejecuciones de cada habilidad y actualiza en una sola escritura"""
+        resultados_por_habilidad: Dict[str, List[Dict]] = {}
+        for habilidad_id, resultado in lote:
+            resultados_por_habilidad.setdefault(habilidad_id, []).append(resultado)
         
-        # Tasa de éxito (media móvil exponencial)
-        exito_actual = 1.0 if resultado.get('exito') else 0.0
-        tasa_exito_anterior = metricas_actuales.get('tasa_exito', 0.5)
+        fecha_actualizacion = datetime.now().isoformat()
+        
+        def plegar(habilidad_id: str, habilidad: Dict) -> Dict:
+            resultados = resultados_por_habilidad[habilidad_id]
+            metricas = self._calcular_nuevas_metricas(habilidad.get('metricas_rendimiento', {}), resultados)
+            estadisticas = self._actualizar_estadisticas(habilidad.get('estadisticas_uso', {}), resultados)
+            return {
+                'metricas_rendimiento': metricas,
+                'estadisticas_uso': estadisticas,
+                'fecha_actualizacion': fecha_actualizacion
+            }
+        
+        # Lectura y escritura en una sola operación atómica de la base de conocimiento
+        actualizadas = await self.base.actualizar_metricas_atomico(list(resultados_por_habilidad), plegar)
+        if actualizadas < len(resultados_por_habilidad):
+            logger.warning(f"{len(resultados_por_habilidad) - actualizadas} habilidades no encontradas al registrar métricas")
+        logger.debug(f"Métricas actualizadas para {actualizadas} habilidades ({len(lote)} ejecuciones)")
+    
+    async def esperar_registros(self):
+        """Espera a que todas las ejecuciones encoladas estén aplicadas"""
+        if self._cola is not None:
+            if not self._cola.empty():
+                self._asegurar_worker()
+            await self._cola.join()
+    
+    async def cerrar(self):
+        """Vacía la cola de ejecuciones y detiene el worker de volcado"""
+        await self.esperar_registros()
+        if self._tarea_volcado is not None:
+            self._tarea_volcado.cancel()
+            self._tarea_volcado = None
+    
+    def _calcular_nuevas_metricas(self, metricas_actuales: Dict, resultados: List[Dict]) -> Dict:
+        """
+        Calcula nuevas métricas plegando en orden los resultados de ejecución.
+        
+        Args:
+            metricas_actuales: Métricas de rendimiento almacenadas
+            resultados: Resultados de las ejecuciones del lote, en orden de llegada
+        
+        Returns:
+            Dict: Copia de las métricas con las medias móviles actualizadas
+        """
         alpha = self.config.get('alpha_metricas', 0.1)  # Factor de suavizado
         
-        nuevas_metricas['tasa_exito'] = (
-            alpha * exito_actual + (1 - alpha) * tasa_exito_anterior
-        )
-        
-        # Tiempo de ejecución (media móvil)
-        tiempo_ejecucion = resultado.get('duracion', 0)
-        if tiempo_ejecucion > 0:
-            tiempo_promedio_anterior = metricas_actuales.get('tiempo_promedio', 0)
-            if tiempo_promedio_anterior == 0:
-                nuevas_metricas['tiempo_promedio'] = tiempo_ejecucion
-            else:
-                nuevas_metricas['tiempo_promedio'] = (
-                    alpha * tiempo_ejecucion + (1 - alpha) * tiempo_promedio_anterior
-                )
-        
-        return nuevas_metricas
+        # Tasa de éxito (media móvil exponencial)
+        exitos = np.fromiter((1.0 if r.get('exito') else 0.0 for r in resultados),
+                             dtype=np.float64, count=len(resultados))
+        metricas = {
+            **metricas_actuales,
+            'tasa_exito': float(plegar_ema(float(metricas_actuales.get('tasa_exito', 0.5)), exitos, alpha, False))
+        }
+        
+        # Tiempo de ejecución (media móvil); las duraciones no positivas se ignoran
+        duraciones = np.fromiter((r.get('duracion', 0) for r in resultados),
+                                 dtype=np.float64, count=len(resultados))
+        if (duraciones > 0).any():
+            metricas['tiempo_promedio'] = float(plegar_ema(
+                float(metricas_actuales.get('tiempo_promedio', 0)), duraciones, alpha, True
+            ))
+        return metricas
     
-    def _actualizar_estadisticas(self, estadisticas_actuales: Dict, resultado: Dict) -> Dict:
-        """Actualiza las estadísticas de uso de la habilidad"""
-        nuevas_estadisticas = estadisticas_actuales.copy()
+    def _actualizar_estadisticas(self, estadisticas_actuales: Dict, resultados: List[Dict]) -> Dict:
+        """Actualiza las estadísticas de uso con todas las ejecuciones del lote (una sola copia)"""
+        # Última ejecución (ISO para mostrar, epoch para comparaciones)
+        ahora = time.time()
         
         # Contadores básicos
-        nuevas_estadisticas['total_ejecuciones'] = nuevas_estadisticas.get('total_ejecuciones', 0) + 1
-        if resultado.get('exito'):
-            nuevas_estadisticas['ejecuciones_exitosas'] = nuevas_estadisticas.get('ejecuciones_exitosas', 0) + 1
-        else:
-            nuevas_estadisticas['ejecuciones_fallidas'] = nuevas_estadisticas.get('ejecuciones_fallidas', 0) + 1
-        
-        # Última ejecución
-        nuevas_estadisticas['ultima_ejecucion'] = datetime.now().isoformat()
+        exitosas = sum(1 for resultado in resultados if resultado.get('exito'))
+        fallidas = len(resultados) - exitosas
         
-        return nuevas_estadisticas
+        estadisticas = dict(estadisticas_actuales)
+        estadisticas['total_ejecuciones'] = estadisticas_actuales.get('total_ejecuciones', 0) + len(resultados)
+        if exitosas:
+            estadisticas['ejecuciones_exitosas'] = estadisticas_actuales.get('ejecuciones_exitosas', 0) + exitosas
+        if fallidas:
+            estadisticas['ejecuciones_fallidas'] = estadisticas_actuales.get('ejecuciones_fallidas', 0) + fallidas
+        estadisticas['ultima_ejecucion'] = datetime.fromtimestamp(ahora).isoformat()
+        estadisticas['ultima_ejecucion_ts'] = ahora
+        return estadisticas
     
     async def obtener_metricas_consolidadas(self, dias: int = 30) -> Dict[str, Any]:
         """
@@ -100,11 +194,8 @@ class GestorMetricas:
         Returns:
             Dict: Métricas consolidadas
         """
-        # Obtener todas las habilidades
-        todas_habilidades = await self.base.obtener_todas_habilidades()
-        
         metricas_consolidadas = {
-            'total_habilidades': len(todas_habilidades),
+            'total_habilidades': 0,
             'habilidades_activas': 0,
             'tasa_exito_promedio': 0.0,
             'tiempo_ejecucion_promedio': 0.0,
@@ -112,42 +203,60 @@ class GestorMetricas:
             'por_categoria': {},
             'por_tipo': {}
         }
+        por_categoria = metricas_consolidadas['por_categoria']
+        por_tipo = metricas_consolidadas['por_tipo']
+        limite_activas = time.time() - dias * 86400
         
-        for habilidad in todas_habilidades:
-            metricas = habilidad.get('metricas_rendimiento', {})
-            stats = habilidad.get('estadisticas_uso', {})
-            
-            # Contar habilidades activas (usadas recientemente)
-            ultima_ejecucion = stats.get('ultima_ejecucion')
-            if ultima_ejecucion:
-                ultima_fecha = datetime.fromisoformat(ultima_ejecucion.replace('Z', '+00:00'))
-                if (datetime.now() - ultima_fecha) < timedelta(days=dias):
-                    metricas_consolidadas['habilidades_activas'] += 1
-            
-            # Acumular métricas
-            metricas_consolidadas['tasa_exito_promedio'] += metricas.get('tasa_exito', 0)
-            metricas_consolidadas['tiempo_ejecucion_promedio'] += metricas.get('tiempo_promedio', 0)
-            metricas_consolidadas['ejecuciones_totales'] += stats.get('total_ejecuciones', 0)
-            
-            # Por categoría
-            for categoria in habilidad.get('categorias', ['general']):
-                if categoria not in metricas_consolidadas['por_categoria']:
-                    metricas_consolidadas['por_categoria'][categoria] = {
-                        'count': 0, 'tasa_exito': 0.0, 'tiempo_promedio': 0.0
-                    }
-                metricas_consolidadas['por_categoria'][categoria]['count'] += 1
-                metricas_consolidadas['por_categoria'][categoria]['tasa_exito'] += metricas.get('tasa_exito', 0)
-                metricas_consolidadas['por_categoria'][categoria]['tiempo_promedio'] += metricas.get('tiempo_promedio', 0)
+        # Las habilidades se procesan por páginas: la memoria es O(página), no O(total)
+        async for lote in self.base.iter_lotes_habilidades(self.config.get('tamaño_lote_indexacion', 1000)):
+            # Agregados globales con el kernel numérico sobre arrays contiguos
+            total = len(lote)
+            tasas = np.fromiter(
+                (h.get('metricas_rendimiento', {}).get('tasa_exito', 0) for h in lote),
+                dtype=np.float64, count=total
+            )
+            tiempos = np.fromiter(
+                (h.get('metricas_rendimiento', {}).get('tiempo_promedio', 0) for h in lote),
+                dtype=np.float64, count=total
+            )
+            ejecuciones = np.fromiter(
+                (h.get('estadisticas_uso', {}).get('total_ejecuciones', 0) for h in lote),
+                dtype=np.int64, count=total
+            )
+            suma_tasa, suma_tiempo, suma_ejecuciones = consolidar(tasas, tiempos, ejecuciones)
+            metricas_consolidadas['total_habilidades'] += total
+            metricas_consolidadas['tasa_exito_promedio'] += float(suma_tasa)
+            metricas_consolidadas['tiempo_ejecucion_promedio'] += float(suma_tiempo)
+            metricas_consolidadas['ejecuciones_totales'] += int(suma_ejecuciones)
             
-            # Por tipo
-            tipo = habilidad.get('tipo', 'procedimiento')
-            if tipo not in metricas_consolidadas['por_tipo']:
-                metricas_consolidadas['por_tipo'][tipo] = {
-                    'count': 0, 'tasa_exito': 0.0, 'tiempo_promedio': 0.0
-                }
-            metricas_consolidadas['por_tipo'][tipo]['count'] += 1
-            metricas_consolidadas['por_tipo'][tipo]['tasa_exito'] += metricas.get('tasa_exito', 0)
-            metricas_consolidadas['por_tipo'][tipo]['tiempo_promedio'] += metricas.get('tiempo_promedio', 0)
+            activas = 0
+            for habilidad in lote:
+                metricas_get = habilidad.get('metricas_rendimiento', {}).get
+                tasa_exito = metricas_get('tasa_exito', 0)
+                tiempo_promedio = metricas_get('tiempo_promedio', 0)
+                
+                # Contar habilidades activas (usadas recientemente)
+                if epoch_ultima_ejecucion(habilidad.get('estadisticas_uso', {})) > limite_activas:
+                    activas += 1
+                
+                # Por categoría
+                for categoria in habilidad.get('categorias') or _CATEGORIAS_DEFECTO:
+                    acumulado = por_categoria.get(categoria)
+                    if acumulado is None:
+                        acumulado = por_categoria[categoria] = {'count': 0, 'tasa_exito': 0.0, 'tiempo_promedio': 0.0}
+                    acumulado['count'] += 1
+                    acumulado['tasa_exito'] += tasa_exito
+                    acumulado['tiempo_promedio'] += tiempo_promedio
+                
+                # Por tipo
+                tipo = habilidad.get('tipo', 'procedimiento')
+                acumulado = por_tipo.get(tipo)
+                if acumulado is None:
+                    acumulado = por_tipo[tipo] = {'count': 0, 'tasa_exito': 0.0, 'tiempo_promedio': 0.0}
+                acumulado['count'] += 1
+                acumulado['tasa_exito'] += tasa_exito
+                acumulado['tiempo_promedio'] += tiempo_promedio
+            metricas_consolidadas['habilidades_activas'] += activas
         
         # Calcular promedios
         if metricas_consolidadas['total_habilidades'] > 0:
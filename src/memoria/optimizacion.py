@@ -1,8 +1,18 @@
-from typing import Dict, Any, Optional
+from typing import Dict, List, Any, Optional
+from pathlib import Path
+import threading
 import zlib
-import json
+import orjson
 from loguru import logger
 
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+# Número mágico de las tramas zstd; los datos sin él se tratan como zlib
+_MAGIC_ZSTD = b'\x28\xb5\x2f\xfd'
+
 class OptimizadorMemoria:
     """
     Sistema de optimización para la memoria de trabajo.
@@ -17,6 +27,94 @@ class OptimizadorMemoria:
             'total_original': 0,
             'ratio_promedio': 0.0
         }
+        self.algoritmo = configuracion.get('compresion_algoritmo', 'zstd')
+        if self.algoritmo == 'zstd' and zstd is None:
+            logger.warning("zstandard no disponible, se usará zlib para la compresión")
+            self.algoritmo = 'zlib'
+        # Diccionarios zstd por dict_id: el 0 es "sin diccionario". Se conservan
+        # todos los usados para poder descomprimir los valores anteriores a un
+        # reentrenamiento; cada valor comprimido guarda el id con el que se creó
+        self._diccionarios: Dict[int, Optional['zstd.ZstdCompressionDict']] = {0: None}
+        self._dict_id = 0
+        # Los contextos zstd no admiten uso concurrente: uno por hilo y dict_id
+        self._contextos_hilo = threading.local()
+        if zstd is not None:
+            ruta_diccionario = configuracion.get('compresion_diccionario')
+            if ruta_diccionario and Path(ruta_diccionario).exists():
+                self._activar_diccionario(zstd.ZstdCompressionDict(Path(ruta_diccionario).read_bytes()))
+    
+    def _activar_diccionario(self, diccionario: 'zstd.ZstdCompressionDict'):
+        """Registra el diccionario y lo usa para las compresiones siguientes"""
+        dict_id = diccionario.dict_id()
+        self._diccionarios[dict_id] = diccionario
+        self._dict_id = dict_id
+    
+    def _contextos(self) -> Dict[str, Dict[int, Any]]:
+        """Compresores y descompresores zstd del hilo actual, por dict_id"""
+        contextos = getattr(self._contextos_hilo, 'contextos', None)
+        if contextos is None:
+            contextos = self._contextos_hilo.contextos = {'compresores': {}, 'descompresores': {}}
+        return contextos
+    
+    def _compresor(self) -> 'zstd.ZstdCompressor':
+        """Compresor del hilo actual para el diccionario activo"""
+        dict_id = self._dict_id
+        compresores = self._contextos()['compresores']
+        compresor = compresores.get(dict_id)
+        if compresor is None:
+            compresor = compresores[dict_id] = zstd.ZstdCompressor(
+                level=self.config.get('compresion_nivel', 3),
+                dict_data=self._diccionarios[dict_id]
+            )
+        return compresor
+    
+    def _descompresor(self, dict_id: int) -> 'zstd.ZstdDecompressor':
+        """Descompresor del hilo actual para el diccionario con el que se comprimió"""
+        descompresores = self._contextos()['descompresores']
+        descompresor = descompresores.get(dict_id)
+        if descompresor is None:
+            if dict_id not in self._diccionarios:
+                raise ValueError(f"Diccionario de compresión desconocido: {dict_id}")
+            descompresor = descompresores[dict_id] = zstd.ZstdDecompressor(
+                dict_data=self._diccionarios[dict_id]
+            )
+        return descompresor
+    
+    def entrenar_diccionario(self, muestras: List[Any], tamano: int = 16384,
+                             ruta: Optional[str] = None) -> bool:
+        """
+        Entrena un diccionario zstd con valores representativos de sesión.
+        
+        Los payloads pequeños y repetitivos (mismas claves, mismo esquema)
+        comprimen mucho mejor con un diccionario compartido.
+        
+        Args:
+            muestras: Valores de ejemplo a serializar
+            tamano: Tamaño máximo del diccionario en bytes
+            ruta: Fichero donde persistir el diccionario (opcional)
+        
+        Returns:
+            bool: True si el diccionario se entrenó y activó
+        """
+        if zstd is None:
+            logger.warning("zstandard no disponible, no se puede entrenar diccionario")
+            return False
+        
+        diccionario = zstd.train_dictionary(tamano, [self._serializar(m)[1] for m in muestras])
+        if ruta:
+            Path(ruta).parent.mkdir(parents=True, exist_ok=True)
+            Path(ruta).write_bytes(diccionario.as_bytes())
+        self._activar_diccionario(diccionario)
+        logger.info(f"Diccionario de compresión entrenado con {len(muestras)} muestras")
+        return True
+    
+    def _serializar(self, valor: Any):
+        """Devuelve (etiqueta de tipo, bytes) para un valor"""
+        if isinstance(valor, (bytes, bytearray)):
+            return 'b', bytes(valor)
+        if isinstance(valor, str):
+            return 's', valor.encode('utf-8')
+        return 'j', orjson.dumps(valor, option=orjson.OPT_NON_STR_KEYS)
     
     def comprimir_valor(self, valor: Any, umbral: int = 1024) -> Any:
         """
@@ -32,15 +130,20 @@ class OptimizadorMemoria:
         if not self.config.get('compresion_habilitada', True):
             return valor
         
-        # Serializar a JSON para comprimir
-        valor_json = json.dumps(valor)
-        tamano_original = len(valor_json.encode('utf-8'))
+        # bytes y str se comprimen directamente; el resto se serializa a JSON
+        tipo, datos = self._serializar(valor)
+        tamano_original = len(datos)
         
         if tamano_original < umbral:
             return valor
         
-        # Comprimir usando zlib
-        valor_comprimido = zlib.compress(valor_json.encode('utf-8'))
+        envoltorio = {'_comprimido': True, '_t': tipo}
+        if self.algoritmo == 'zstd':
+            envoltorio['_d'] = self._dict_id
+            valor_comprimido = self._compresor().compress(datos)
+        else:
+            # zlib al nivel más rápido
+            valor_comprimido = zlib.compress(datos, 1)
         tamano_comprimido = len(valor_comprimido)
         
         # Actualizar estadísticas
@@ -53,7 +156,8 @@ class OptimizadorMemoria:
         )
         
         logger.debug(f"Valor comprimido: {tamano_original} → {tamano_comprimido} bytes")
-        return {'_comprimido': True, 'datos': valor_comprimido}
+        envoltorio['datos'] = valor_comprimido
+        return envoltorio
     
     def descomprimir_valor(self, valor: Any) -> Any:
         """
@@ -64,15 +168,27 @@ class OptimizadorMemoria:
         
         Returns:
             Any: Valor descomprimido
+        
+        Raises:
+            ValueError: Si el valor no puede descomprimirse; nunca se devuelve
+                el envoltorio comprimido como si fuera el valor
         """
         if isinstance(valor, dict) and valor.get('_comprimido', False):
             try:
                 datos_comprimidos = valor['datos']
-                datos_json = zlib.decompress(datos_comprimidos).decode('utf-8')
-                return json.loads(datos_json)
+                if datos_comprimidos[:4] == _MAGIC_ZSTD:
+                    datos = self._descompresor(valor.get('_d', 0)).decompress(datos_comprimidos)
+                else:
+                    datos = zlib.decompress(datos_comprimidos)
+                tipo = valor.get('_t', 'j')
+                if tipo == 'b':
+                    return datos
+                if tipo == 's':
+                    return datos.decode('utf-8')
+                return orjson.loads(datos)
             except Exception as e:
                 logger.error(f"Error descomprimiendo valor: {e}")
-                return valor
+                raise ValueError(f"Valor comprimido ilegible: {e}") from e
         
         return valor
     
@@ -2,6 +2,8 @@ from typing import Dict, List, Any, Optional
 import asyncio
 from loguru import logger
 from datetime import datetime
+import time
+from memoria.metricas import epoch_ultima_ejecucion
 
 class OptimizadorBaseConocimiento:
     """
@@ -12,23 +14,57 @@ class OptimizadorBaseConocimiento:
         self.base = base_conocimiento
         self.config = configuracion
         self._tarea_optimizacion = None
+        self._detener: Optional[asyncio.Event] = None
+        self._disparar: Optional[asyncio.Event] = None
         
     async def iniciar_optimizacion_automatica(self):
         """Inicia la optimización automática en segundo plano"""
         intervalo = self.config.get('intervalo_optimizacion', 86400)
+        self._detener = asyncio.Event()
+        self._disparar = asyncio.Event()
+        self._disparar.set()  # Primera optimización inmediata
         
         async def tarea_optimizacion():
-            while True:
-                try:
-                    await self.ejecutar_optimizacion()
-                    await asyncio.sleep(intervalo)
-                except Exception as e:
-                    logger.error(f"Error en optimización automática: {e}")
-                    await asyncio.sleep(3600)  # Reintentar en 1 hora
+            espera = intervalo
+            try:
+                while True:
+                    # Despierta al vencer el intervalo, a petición o al detenerse
+                    try:
+                        await asyncio.wait_for(self._disparar.wait(), timeout=espera)
+                    except asyncio.TimeoutError:
+                        pass
+                    if self._detener.is_set():
+                        break
+                    self._disparar.clear()
+                    
+                    try:
+                        await self.ejecutar_optimizacion()
+                        espera = intervalo
+                    except Exception as e:
+                        logger.error(f"Error en optimización automática: {e}")
+                        espera = 3600  # Reintentar en 1 hora
+            except asyncio.CancelledError:
+                logger.info("Optimización automática cancelada")
+                raise
         
         self._tarea_optimizacion = asyncio.create_task(tarea_optimizacion())
         logger.info("Optimización automática iniciada")
     
+    def solicitar_optimizacion(self):
+        """Adelanta la próxima optimización automática sin esperar al intervalo"""
+        if self._disparar is not None:
+            self._disparar.set()
+    
+    async def detener_optimizacion_automatica(self):
+        """Detiene la optimización automática esperando a que termine la pasada en curso"""
+        if self._tarea_optimizacion is None:
+            return
+        self._detener.set()
+        self._disparar.set()
+        await self._tarea_optimizacion
+        self._tarea_optimizacion = None
+        logger.info("Optimización automática detenida")
+    
     async def ejecutar_optimizacion(self):
         """Ejecuta el proceso completo de optimización"""
         logger.info("Iniciando optimización de base de conocimiento")
@@ -53,22 +89,17 @@ class OptimizadorBaseConocimiento:
     
     async def _limpiar_habilidades_obsoletas(self) -> int:
         """Elimina habilidades obsoletas o poco utilizadas"""
-        # Obtener todas las habilidades
-        habilidades = await self.base.obtener_todas_habilidades()
-        eliminadas = 0
+        # Eliminar habilidades no usadas en los últimos 90 días
+        limite = time.time() - 90 * 86400
+        obsoletas = []
         
-        for habilidad in habilidades:
-            stats = habilidad.get('estadisticas_uso', {})
-            ultima_ejecucion = stats.get('ultima_ejecucion')
-            
-            # Eliminar habilidades no usadas en los últimos 90 días
-            if ultima_ejecucion:
-                ultima_fecha = datetime.fromisoformat(ultima_ejecucion.replace('Z', '+00:00'))
-                if (datetime.now() - ultima_fecha).days > 90:
-                    await self.base.eliminar_habilidad(habilidad['id'])
-                    eliminadas += 1
+        # Recorrido por páginas; se elimina al final para no desplazar la paginación
+        async for habilidad in self.base.iter_habilidades(self.config.get('tamaño_lote_indexacion', 1000)):
+            ultima_ejecucion = epoch_ultima_ejecucion(habilidad.get('estadisticas_uso', {}))
+            if ultima_ejecucion and ultima_ejecucion < limite:
+                obsoletas.append(habilidad['id'])
         
-        return eliminadas
+        return await self.base.eliminar_habilidades(obsoletas)
     
     async def _reindexar_embeddings(self):
         """Re-indexa todos los embeddings para mejorar la búsqueda"""
@@ -1,55 +1,142 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple, Mapping
+import heapq
+import itertools
+import sys
 import time
 from datetime import datetime, timedelta
 import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
 from loguru import logger
 
+class _PlanificadorLimpieza:
+    """
+    Planificador único del proceso para la limpieza de memorias de trabajo.
+    
+    Un solo hilo atiende un heap de expiraciones por clave y barre
+    periódicamente todas las memorias registradas, en lugar de un hilo
+    por instancia y un ``threading.Timer`` por clave.
+    """
+    
+    def __init__(self, intervalo_barrido: float = 300):
+        self.intervalo_barrido = intervalo_barrido
+        self._heap: List[Tuple[float, int, str, float]] = []
+        self._memorias: 'weakref.WeakValueDictionary[int, MemoriaTrabajo]' = weakref.WeakValueDictionary()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._evento = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+    
+    def registrar(self, memoria: 'MemoriaTrabajo') -> int:
+        """Registra una memoria para el barrido periódico y devuelve su ID"""
+        with self._lock:
+            memoria_id = next(self._ids)
+            self._memorias[memoria_id] = memoria
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._ejecutar, daemon=True)
+                self._hilo.start()
+                logger.debug("Hilo de limpieza automática iniciado")
+            return memoria_id
+    
+    def desregistrar(self, memoria_id: int) -> None:
+        """Retira una memoria: sus expiraciones pendientes se descartan al vencer"""
+        with self._lock:
+            self._memorias.pop(memoria_id, None)
+    
+    def programar(self, expira: float, memoria_id: int, clave: str, timestamp_creacion: float):
+        """Programa la expiración de una clave concreta"""
+        with self._lock:
+            heapq.heappush(self._heap, (expira, memoria_id, clave, timestamp_creacion))
+            if self._heap[0][0] == expira:
+                # Nueva expiración más próxima: despertar al hilo para recalcular la espera
+                self._evento.set()
+    
+    def _ejecutar(self):
+        """Bucle del hilo de limpieza"""
+        siguiente_barrido = time.monotonic() + self.intervalo_barrido
+        while True:
+            with self._lock:
+                proxima = min(self._heap[0][0], siguiente_barrido) if self._heap else siguiente_barrido
+            self._evento.wait(timeout=max(0.0, proxima - time.monotonic()))
+            self._evento.clear()
+            
+            ahora = time.monotonic()
+            vencidas = []
+            with self._lock:
+                while self._heap and self._heap[0][0] <= ahora:
+                    vencidas.append(heapq.heappop(self._heap))
+            
+            for _, memoria_id, clave, timestamp_creacion in vencidas:
+                memoria = self._memorias.get(memoria_id)
+                if memoria is not None:
+                    memoria._expirar_clave(clave, timestamp_creacion)
+            
+            if ahora >= siguiente_barrido:
+                for memoria in list(self._memorias.values()):
+                    memoria._limpiar_expirados()
+                siguiente_barrido = ahora + self.intervalo_barrido
+
+_planificador = _PlanificadorLimpieza()
+
+@dataclass(slots=True)
+class _Entrada:
+    """Valor almacenado junto con sus marcas de tiempo"""
+    valor: Any
+    ts_acceso: float
+    ts_creacion: float
+    tamano: int
+
 class MemoriaTrabajo:
     """
     Sistema de memoria de trabajo volátil para gestión de estado de sesión.
     Almacena información temporal necesaria para la ejecución del objetivo actual.
     """
     
-    def __init__(self, timeout: int = 3600):
+    def __init__(self, timeout: int = 3600, max_entradas: int = 10000):
         """
         Inicializa una nueva instancia de memoria de trabajo.
         
         Args:
             timeout: Tiempo de vida máximo en segundos para entradas (por defecto 1 hora)
+            max_entradas: Número máximo de claves; al superarlo se desaloja la menos usada
         """
-        self._almacen: Dict[str, Any] = {}
-        self._timestamp_acceso: Dict[str, float] = {}
-        self._timestamp_creacion: Dict[str, float] = {}
+        # Orden LRU: la entrada menos usada recientemente queda al principio
+        self._entradas: 'OrderedDict[str, _Entrada]' = OrderedDict()
+        self.max_entradas = max_entradas
+        # Suma de los tamaños de las entradas, mantenida en cada escritura/borrado
+        self._tamano_estimado = 0
         self.timeout = timeout
+        # Reloj monotónico: inmune a saltos del reloj del sistema (NTP)
+        self.ultimo_acceso = time.monotonic()
         self._lock = threading.RLock()
-        self._iniciar_limpieza_automatica()
+        self._id_planificador = _planificador.registrar(self)
         
         logger.info(f"Memoria de trabajo inicializada con timeout {timeout} segundos")
     
-    def _iniciar_limpieza_automatica(self):
-        """Inicia el hilo de limpieza automática de entradas expiradas"""
-        def limpiador():
-            while True:
-                time.sleep(300)  # Ejecutar limpieza cada 5 minutos
-                self._limpiar_expirados()
-        
-        thread = threading.Thread(target=limpiador, daemon=True)
-        thread.start()
-        logger.debug("Hilo de limpieza automática iniciado")
+    def __len__(self) -> int:
+        """Número de entradas almacenadas, sin construir vistas ni copias"""
+        return len(self._entradas)
+    
+    def _expirar_clave(self, clave: str, timestamp_creacion: float):
+        """Elimina una clave con expiración propia si no se ha vuelto a guardar"""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada.ts_creacion == timestamp_creacion:
+                self.eliminar(clave)
     
     def _limpiar_expirados(self):
         """Elimina entradas que han excedido su tiempo de vida"""
         with self._lock:
-            ahora = time.time()
+            ahora = time.monotonic()
             claves_a_eliminar = [
-                clave for clave, timestamp in self._timestamp_acceso.items()
-                if ahora - timestamp > self.timeout
+                clave for clave, entrada in self._entradas.items()
+                if ahora - entrada.ts_acceso > self.timeout
             ]
             
             for clave in claves_a_eliminar:
-                del self._almacen[clave]
-                del self._timestamp_acceso[clave]
-                del self._timestamp_creacion[clave]
+                self._tamano_estimado -= self._entradas.pop(clave).tamano
             
             if claves_a_eliminar:
                 logger.debug(f"Limpiadas {len(claves_a_eliminar)} entradas expiradas")
@@ -64,14 +151,29 @@ class MemoriaTrabajo:
             expiration: Tiempo de expiración específico en segundos (opcional)
         """
         with self._lock:
-            timestamp_actual = time.time()
-            self._almacen[clave] = valor
-            self._timestamp_acceso[clave] = timestamp_actual
-            self._timestamp_creacion[clave] = timestamp_actual
+            timestamp_actual = time.monotonic()
+            self.ultimo_acceso = timestamp_actual
+            tamano = sys.getsizeof(valor)
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self._entradas[clave] = _Entrada(valor, timestamp_actual, timestamp_actual, tamano)
+                while len(self._entradas) > self.max_entradas:
+                    clave_desalojada, desalojada = self._entradas.popitem(last=False)
+                    self._tamano_estimado -= desalojada.tamano
+                    logger.debug(f"Desalojada de memoria de trabajo por límite de entradas: {clave_desalojada}")
+            else:
+                self._entradas.move_to_end(clave)
+                self._tamano_estimado -= entrada.tamano
+                entrada.valor = valor
+                entrada.ts_acceso = entrada.ts_creacion = timestamp_actual
+                entrada.tamano = tamano
+            self._tamano_estimado += tamano
             
             if expiration:
                 # Programar expiración específica para esta clave
-                threading.Timer(expiration, lambda: self.eliminar(clave)).start()
+                _planificador.programar(
+                    timestamp_actual + expiration, self._id_planificador, clave, timestamp_actual
+                )
             
             logger.debug(f"Guardado en memoria de trabajo: {clave}")
     
@@ -87,11 +189,13 @@ class MemoriaTrabajo:
             Any: Valor almacenado o valor por defecto
         """
         with self._lock:
-            if clave in self._almacen:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
                 # Actualizar timestamp de acceso
-                self._timestamp_acceso[clave] = time.time()
+                entrada.ts_acceso = self.ultimo_acceso = time.monotonic()
+                self._entradas.move_to_end(clave)
                 logger.debug(f"Acceso a memoria de trabajo: {clave}")
-                return self._almacen[clave]
+                return entrada.valor
             return default
     
     def eliminar(self, clave: str) -> bool:
@@ -105,23 +209,34 @@ class MemoriaTrabajo:
             bool: True si la clave existía y fue eliminada
         """
         with self._lock:
-            if clave in self._almacen:
-                del self._almacen[clave]
-                del self._timestamp_acceso[clave]
-                del self._timestamp_creacion[clave]
+            entrada = self._entradas.pop(clave, None)
+            if entrada is not None:
+                self._tamano_estimado -= entrada.tamano
                 logger.debug(f"Eliminado de memoria de trabajo: {clave}")
                 return True
             return False
     
-    def obtener_todo_contexto(self) -> Dict[str, Any]:
+    def obtener_todo_contexto(self) -> Mapping[str, Any]:
         """
         Obtiene todo el contenido actual de la memoria de trabajo.
         
+        La instantánea se toma bajo el lock, así que puede recorrerse
+        mientras se lee o escribe en la memoria (``obtener`` reordena el LRU).
+        
+        Returns:
+            Mapping: Vista de solo lectura de una copia del estado actual
+        """
+        return MappingProxyType(self.snapshot())
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Obtiene una copia consistente del contenido de la memoria de trabajo.
+        
         Returns:
             Dict: Copia del estado actual de la memoria
         """
         with self._lock:
-            return self._almacen.copy()
+            return {clave: entrada.valor for clave, entrada in self._entradas.items()}
     
     def obtener_estadisticas(self) -> Dict[str, Any]:
         """
@@ -131,13 +246,16 @@ class MemoriaTrabajo:
             Dict: Métricas de utilización de la memoria
         """
         with self._lock:
-            ahora = time.time()
+            ahora = time.monotonic()
+            entradas_activas = sum(
+                1 for entrada in self._entradas.values()
+                if ahora - entrada.ts_acceso <= self.timeout
+            )
             return {
-                'total_entradas': len(self._almacen),
-                'entradas_activas': sum(1 for ts in self._timestamp_acceso.values() 
-                                      if ahora - ts <= self.timeout),
-                'tamano_estimado': sum(len(str(v)) for v in self._almacen.values()),
-                'timestamp_ultima_limpieza': ahora
+                'total_entradas': len(self._entradas),
+                'entradas_activas': entradas_activas,
+                'tamano_estimado': self._tamano_estimado,
+                'timestamp_ultima_limpieza': time.time()
             }
     
     def limpiar_todo(self) -> None:
@@ -145,7 +263,20 @@ class MemoriaTrabajo:
         Limpia completamente la memoria de trabajo.
         """
         with self._lock:
-            self._almacen.clear()
-            self._timestamp_acceso.clear()
-            self._timestamp_creacion.clear()
-            logger.info("Memoria de trabajo limpiada completamente")
\ No newline at end of file
+            self._entradas.clear()
+            self._tamano_estimado = 0
+            self.ultimo_acceso = time.monotonic()
+            logger.info("Memoria de trabajo limpiada completamente")
+    
+    def reiniciar(self) -> None:
+        """
+        Prepara la memoria para reutilizarla en otra sesión.
+        
+        Además de vaciarla, cambia su ID en el planificador: las expiraciones
+        programadas por la sesión anterior quedan huérfanas y no pueden
+        borrar claves que la nueva sesión guarde con el mismo nombre.
+        """
+        with self._lock:
+            self.limpiar_todo()
+            _planificador.desregistrar(self._id_planificador)
+            self._id_planificador = _planificador.registrar(self)
\ No newline at end of file
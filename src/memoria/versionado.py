@@ -1,5 +1,8 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
+from collections import OrderedDict
 from datetime import datetime
+import asyncio
+import time
 from loguru import logger
 
 class GestorVersionado:
@@ -12,6 +15,13 @@ class GestorVersionado:
         self.base = base_conocimiento
         self.config = configuracion
         
+        # Caché LRU con TTL de historiales: (instante de carga monotónico, historial)
+        self.tamaño_cache_historial = configuracion.get('tamaño_cache_historial', 1024)
+        self.ttl_cache_historial = configuracion.get('ttl_cache_historial', 60)
+        self._cache_historial: 'OrderedDict[str, Tuple[float, List[Dict]]]' = OrderedDict()
+        # Un lock por habilidad en carga: evita consultas duplicadas en fallos de caché simultáneos
+        self._cargas_historial: Dict[str, asyncio.Lock] = {}
+        
     async def crear_version(self, habilidad: Dict, cambios: Dict) -> str:
         """
         Crea una nueva versión de una habilidad.
@@ -30,6 +40,7 @@ class GestorVersionado:
         
         # Guardar nueva versión
         nueva_id = await self.base.guardar_habilidad(nueva_version)
+        self.invalidar_historial(habilidad.get('id'))
         
         # Mantener referencia a versión anterior
         await self._registrar_relacion_version(
@@ -55,28 +66,91 @@ class GestorVersionado:
         nueva_habilidad['version'] = nueva_version
         return nueva_habilidad
     
+    def invalidar_historial(self, habilidad_id: Optional[str] = None):
+        """
+        Descarta historiales cacheados.
+        
+        Args:
+            habilidad_id: Habilidad a invalidar; None vacía toda la caché
+        """
+        if habilidad_id is None:
+            self._cache_historial.clear()
+        else:
+            self._cache_historial.pop(habilidad_id, None)
+    
+    def _historial_cacheado(self, habilidad_id: str) -> Optional[List[Dict]]:
+        """Devuelve el historial cacheado si existe y no ha caducado"""
+        entrada = self._cache_historial.get(habilidad_id)
+        if entrada is None:
+            return None
+        if time.monotonic() - entrada[0] > self.ttl_cache_historial:
+            del self._cache_historial[habilidad_id]
+            return None
+        self._cache_historial.move_to_end(habilidad_id)
+        return entrada[1]
+    
     async def obtener_historial_versions(self, habilidad_id: str) -> List[Dict]:
         """
         Obtiene el historial de versiones de una habilidad.
         
+        Los historiales se cachean durante ``ttl_cache_historial`` segundos;
+        la lista devuelta es compartida y no debe modificarse.
+        
         Args:
             habilidad_id: ID de la habilidad
         
         Returns:
             List[Dict]: Historial de versiones ordenado cronológicamente
         """
+        historial = self._historial_cacheado(habilidad_id)
+        if historial is not None:
+            return historial
+        
+        lock = self._cargas_historial.setdefault(habilidad_id, asyncio.Lock())
+        try:
+            async with lock:
+                # Otra corrutina puede haberlo cargado mientras se esperaba el lock
+                historial = self._historial_cacheado(habilidad_id)
+                if historial is None:
+                    historial = await self._cargar_historial(habilidad_id)
+                    self._cache_historial[habilidad_id] = (time.monotonic(), historial)
+                    while len(self._cache_historial) > self.tamaño_cache_historial:
+                        self._cache_historial.popitem(last=False)
+        finally:
+            if not lock.locked():
+                self._cargas_historial.pop(habilidad_id, None)
+        return historial
+    
+    async def _cargar_historial(self, habilidad_id: str) -> List[Dict]:
+        """Carga el historial de versiones desde la base de conocimiento"""
         # Buscar relaciones de versionado
         relaciones = await self.base.obtener_relaciones(
             habilidad_id, 
             tipo_relacion='version_anterior'
         )
         
-        historial = []
+        # Recorrer la cadena en memoria y pedir todas las versiones en una sola consulta
+        anterior_de = {
+            rel['destino']: rel['origen']
+            for rel in relaciones if rel['tipo'] == 'version_anterior'
+        }
+        ids_cadena = []
+        visitados = set()
         current_id = habilidad_id
-        
         while current_id:
-            # Obtener habilidad actual
-            habilidad = await self.base.obtener_habilidad(current_id)
+            # Un grafo de relaciones mal formado podría tener ciclos
+            if current_id in visitados:
+                logger.warning(f"Ciclo en la cadena de versiones de {habilidad_id} en {current_id}")
+                break
+            visitados.add(current_id)
+            ids_cadena.append(current_id)
+            current_id = anterior_de.get(current_id)
+        
+        habilidades = await self.base.obtener_habilidades(ids_cadena)
+        
+        historial = []
+        for current_id in ids_cadena:
+            habilidad = habilidades.get(current_id)
             if habilidad:
                 historial.append({
                     'id': current_id,
@@ -84,11 +158,5 @@ class GestorVersionado:
                     'fecha_actualizacion': habilidad.get('fecha_actualizacion', ''),
                     'cambios': habilidad.get('cambios_descripcion', '')
                 })
-            
-            # Buscar versión anterior
-            current_id = next((
-                rel['origen'] for rel in relaciones 
-                if rel['destino'] == current_id and rel['tipo'] == 'version_anterior'
-            ), None)
         
         return historial[::-1]  # Devolver en orden cronológico
\ No newline at end of file
@@ -1,14 +1,68 @@
-from typing import Dict, List, Any, Optional, Type
+from typing import Dict, List, Any, Optional, Type, Tuple, Mapping
 import re
+from types import MappingProxyType
 from datetime import datetime
 from loguru import logger
 
+# Clasificación por nombre de clase de excepción; se comprueba toda la MRO,
+# así que cualquier subclase (p. ej. ConnectionRefusedError) también coincide
+_CLASIFICACION_POR_TIPO: Dict[str, Dict[str, Any]] = {
+    'TimeoutError': {
+        'tipo': 'timeout',
+        'categoria': 'rendimiento',
+        'recuperable': True,
+        'accion_recomendada': 'reintentar_con_backoff',
+        'confianza': 0.9
+    },
+    'ConnectionError': {
+        'tipo': 'conexion',
+        'categoria': 'infraestructura',
+        'recuperable': True,
+        'accion_recomendada': 'reintentar_inmediato',
+        'confianza': 0.8
+    },
+    'NetworkError': {
+        'tipo': 'conexion',
+        'categoria': 'infraestructura',
+        'recuperable': True,
+        'accion_recomendada': 'reintentar_inmediato',
+        'confianza': 0.8
+    }
+}
+
+# Estrategias de reintento por acción recomendada (inmutables: se comparten entre llamadas)
+_ESTRATEGIAS_REINTENTO: Mapping[str, Mapping[str, Any]] = MappingProxyType({
+    'reintentar_inmediato': MappingProxyType({
+        'delay': 1,
+        'max_reintentos': 3,
+        'backoff': 'ninguno'
+    }),
+    'reintentar_con_backoff': MappingProxyType({
+        'delay': 2,
+        'max_reintentos': 5,
+        'backoff': 'lineal',
+        'factor': 2
+    }),
+    'reintentar_con_backoff_exponencial': MappingProxyType({
+        'delay': 1,
+        'max_reintentos': 7,
+        'backoff': 'exponencial',
+        'base': 2
+    })
+})
+_ESTRATEGIA_REINTENTO_DEFECTO: Mapping[str, Any] = MappingProxyType({
+    'delay': 5,
+    'max_reintentos': 3,
+    'backoff': 'lineal'
+})
+
 class GestorErrores:
     """Sistema avanzado de gestión y clasificación de errores"""
     
     def __init__(self, configuracion: Dict[str, Any]):
         self.config = configuracion
         self.patrones_error = self._cargar_patrones_error()
+        self._patron_union, self._infos_patrones = self._compilar_patrones(self.patrones_error)
         self.estadisticas_errores = {}
         
     def clasificar_error(self, error: Exception) -> Dict[str, Any]:
@@ -21,8 +75,7 @@ class GestorErrores:
         Returns:
             Dict: Clasificación del error con metadata
         """
-        mensaje_error = str(error).lower()
-        tipo_error = type(error).__name__
+        mensaje_error = str(error)
         
         clasificacion = {
             'tipo': 'desconocido',
@@ -32,36 +85,48 @@ class GestorErrores:
             'confianza': 0.0
         }
         
-        # Clasificación por tipo de excepción
-        if tipo_error in ['TimeoutError', 'asyncio.TimeoutError']:
-            clasificacion.update({
-                'tipo': 'timeout',
-                'categoria': 'rendimiento',
-                'recuperable': True,
-                'accion_recomendada': 'reintentar_con_backoff',
-                'confianza': 0.9
-            })
-        elif tipo_error in ['ConnectionError', 'NetworkError']:
-            clasificacion.update({
-                'tipo': 'conexion',
-                'categoria': 'infraestructura',
-                'recuperable': True,
-                'accion_recomendada': 'reintentar_inmediato',
-                'confianza': 0.8
-            })
-        
-        # Clasificación por patrones en mensaje de error
-        for patron, info in self.patrones_error.items():
-            if re.search(patron, mensaje_error):
-                clasificacion.update(info)
-                clasificacion['confianza'] = max(clasificacion['confianza'], info.get('confianza', 0.0))
+        # Clasificación por tipo de excepción (incluidas sus clases base)
+        for clase in type(error).__mro__:
+            info_tipo = _CLASIFICACION_POR_TIPO.get(clase.__name__)
+            if info_tipo is not None:
+                clasificacion.update(info_tipo)
                 break
         
+        # Clasificación por patrones en mensaje de error (una sola búsqueda compilada)
+        coincidencia = self._patron_union.match(mensaje_error)
+        if coincidencia:
+            info = self._infos_patrones[int(coincidencia.lastgroup[1:])]
+            clasificacion.update(info)
+            clasificacion['confianza'] = max(clasificacion['confianza'], info.get('confianza', 0.0))
+        
         # Actualizar estadísticas
         self._actualizar_estadisticas(clasificacion)
         
         return clasificacion
     
+    def _actualizar_estadisticas(self, clasificacion: Dict[str, Any]):
+        """Acumula el número de errores clasificados por tipo"""
+        tipo = clasificacion['tipo']
+        self.estadisticas_errores[tipo] = self.estadisticas_errores.get(tipo, 0) + 1
+    
+    @staticmethod
+    def _compilar_patrones(patrones: Dict[str, Dict]) -> Tuple['re.Pattern', List[Dict]]:
+        """
+        Une todos los patrones en una única expresión compilada.
+        
+        Cada patrón va en un lookahead anclado al inicio con su propio grupo
+        (g0, g1, ...): el motor los prueba en orden, así que gana el primer
+        patrón que aparece en el mensaje, igual que al recorrerlos uno a uno.
+        
+        Returns:
+            Tuple: Expresión unida y la información de cada patrón por índice
+        """
+        alternativas = '|'.join(
+            f'(?=.*?(?P<g{i}>{patron}))' for i, patron in enumerate(patrones)
+        )
+        patron_union = re.compile(f'(?:{alternativas})', re.IGNORECASE | re.DOTALL)
+        return patron_union, list(patrones.values())
+    
     def _cargar_patrones_error(self) -> Dict[str, Dict]:
         """Carga los patrones de clasificación de errores"""
         return {
@@ -102,7 +167,7 @@ class GestorErrores:
             }
         }
     
-    def obtener_estrategia_reintento(self, clasificacion: Dict) -> Dict[str, Any]:
+    def obtener_estrategia_reintento(self, clasificacion: Dict) -> Mapping[str, Any]:
         """
         Obtiene la estrategia de reintento para un error clasificado.
         
@@ -110,29 +175,8 @@ class GestorErrores:
             clasificacion: Clasificación del error
         
         Returns:
-            Dict: Estrategia de reintento
+            Mapping: Estrategia de reintento (solo lectura; copiar con dict() para modificarla)
         """
-        estrategias = {
-            'reintentar_inmediato': {
-                'delay': 1,
-                'max_reintentos': 3,
-                'backoff': 'ninguno'
-            },
-            'reintentar_con_backoff': {
-                'delay': 2,
-                'max_reintentos': 5,
-                'backoff': 'lineal',
-                'factor': 2
-            },
-            'reintentar_con_backoff_exponencial': {
-                'delay': 1,
-                'max_reintentos': 7,
-                'backoff': 'exponencial',
-                'base': 2
-            }
-        }
-        
-        return estrategias.get(
-            clasificacion['accion_recomendada'],
-            {'delay': 5, 'max_reintentos': 3, 'backoff': 'lineal'}
+        return _ESTRATEGIAS_REINTENTO.get(
+            clasificacion['accion_recomendada'], _ESTRATEGIA_REINTENTO_DEFECTO
         )
\ No newline at end of file
@@ -1,9 +1,20 @@
 from typing import Dict, List, Any, Optional, Callable
 import asyncio
 import math
-from datetime import datetime
+import random
+from dataclasses import dataclass
 from loguru import logger
 
+# Sucesión de Fibonacci precalculada para el backoff (F(0)..F(64))
+_FIBONACCI: List[int] = [0, 1]
+for _ in range(63):
+    _FIBONACCI.append(_FIBONACCI[-1] + _FIBONACCI[-2])
+
+@dataclass(slots=True)
+class EstadoBackoff:
+    """Estado del backoff de una invocación (reentrante: uno por llamada)"""
+    delay_anterior: float = 0.0
+
 class MecanismoReintentos:
     """Sistema inteligente de reintentos con backoff adaptativo"""
     
@@ -26,6 +37,7 @@ class MecanismoReintentos:
             Any: Resultado de la ejecución
         """
         estrategia = estrategia or self._estrategia_default()
+        estado = EstadoBackoff(estrategia['delay'])
         reintento_actual = 0
         
         while reintento_actual < estrategia['max_reintentos']:
@@ -36,61 +48,74 @@ class MecanismoReintentos:
                 
                 # Manejar resultado fallido
                 reintento_actual = await self._manejar_fallo(
-                    reintento_actual, estrategia, resultado.get('error')
+                    reintento_actual, estrategia, resultado.get('error'), estado
                 )
                 
             except Exception as e:
                 reintento_actual = await self._manejar_excepcion(
-                    reintento_actual, estrategia, e
+                    reintento_actual, estrategia, e, estado
                 )
         
         raise Exception(f"Fallo después de {reintento_actual} reintentos")
     
     async def _manejar_fallo(self, reintento_actual: int, estrategia: Dict, 
-                           error: Any) -> int:
+                           error: Any, estado: Optional[EstadoBackoff] = None) -> int:
         """Maneja un fallo en la ejecución"""
         reintento_actual += 1
         if reintento_actual >= estrategia['max_reintentos']:
             return reintento_actual
         
-        delay = self._calcular_delay(reintento_actual, estrategia)
-        logger.warning(f"Reintento {reintento_actual} después de {delay}s - Error: {error}")
+        delay = self.calcular_delay(reintento_actual, estrategia, estado)
+        # Formato diferido: loguru solo interpola si algún sink acepta WARNING
+        logger.warning("Reintento {} después de {}s - Error: {}", reintento_actual, delay, error)
         
         await asyncio.sleep(delay)
         return reintento_actual
     
     async def _manejar_excepcion(self, reintento_actual: int, estrategia: Dict, 
-                               error: Exception) -> int:
+                               error: Exception, estado: Optional[EstadoBackoff] = None) -> int:
         """Maneja una excepción durante la ejecución"""
         reintento_actual += 1
         if reintento_actual >= estrategia['max_reintentos']:
             raise error
         
-        delay = self._calcular_delay(reintento_actual, estrategia)
-        logger.warning(f"Reintento {reintento_actual} después de {delay}s - Excepción: {error}")
+        delay = self.calcular_delay(reintento_actual, estrategia, estado)
+        logger.warning("Reintento {} después de {}s - Excepción: {}", reintento_actual, delay, error)
         
         await asyncio.sleep(delay)
         return reintento_actual
     
-    def _calcular_delay(self, reintento_actual: int, estrategia: Dict) -> float:
-        """Calcula el delay para el próximo reintento"""
+    def calcular_delay(self, reintento_actual: int, estrategia: Dict,
+                        estado: Optional[EstadoBackoff] = None) -> float:
+        """
+        Calcula el delay para el próximo reintento.
+        
+        El backoff exponencial usa jitter decorrelado: cada espera es aleatoria
+        entre el delay base y el triple de la anterior, para que los clientes
+        que fallan a la vez no reintenten sincronizados. Todas las esperas
+        crecientes se limitan a ``cap`` (por defecto ``delay_maximo``, 60s).
+        """
+        delay = estrategia['delay']
+        cap = estrategia.get('cap', self.config.get('delay_maximo', 60))
+        
         if estrategia['backoff'] == 'ninguno':
-            return estrategia['delay']
+            return delay
         elif estrategia['backoff'] == 'lineal':
-            return estrategia['delay'] * reintento_actual
+            return min(cap, delay * reintento_actual)
         elif estrategia['backoff'] == 'exponencial':
-            return estrategia['delay'] * (estrategia.get('base', 2) ** reintento_actual)
+            if estado is None:
+                estado = EstadoBackoff(delay)
+            estado.delay_anterior = min(cap, random.uniform(delay, max(delay, estado.delay_anterior) * 3))
+            return estado.delay_anterior
         elif estrategia['backoff'] == 'fibonacci':
-            return estrategia['delay'] * self._fibonacci(reintento_actual)
+            return min(cap, delay * self._fibonacci(reintento_actual))
         else:
-            return estrategia['delay']
+            return delay
     
-    def _fibonacci(self, n: int) -> int:
-        """Calcula el número Fibonacci para backoff"""
-        a, b = 0, 1
-        for _ in range(n):
-            a, b = b, a + b
-        return a
+    @staticmethod
+    def _fibonacci(n: int) -> int:
+        """Obtiene el número Fibonacci para backoff de la tabla precalculada"""
+        return _FIBONACCI[min(n, len(_FIBONACCI) - 1)]
     
     def _estrategia_default(self) -> Dict:
         """Retorna la estrategia de reintentos por defecto"""
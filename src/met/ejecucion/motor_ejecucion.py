@@ -1,8 +1,16 @@
 from typing import Dict, List, Any, Optional, Callable
 import asyncio
-from datetime import datetime
+import copy
+import functools
+import hashlib
+import time
+from collections import OrderedDict
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from loguru import logger
+from met.ejecucion.gestion_errores import GestorErrores
+from met.ejecucion.mecanismo_reintentos import MecanismoReintentos, EstadoBackoff
 
 class EstadoEjecucion(Enum):
     """Estados del ciclo de vida de una tarea"""
@@ -15,15 +23,29 @@ class EstadoEjecucion(Enum):
 class MotorEjecucion:
     """Motor principal de ejecución de tareas del MET"""
     
-    def __init__(self, registro_herramientas, configuracion: Dict[str, Any]):
+    def __init__(self, registro_herramientas, configuracion: Dict[str, Any],
+                 gestor_errores: Optional[GestorErrores] = None,
+                 mecanismo_reintentos: Optional[MecanismoReintentos] = None):
         self.registro = registro_herramientas
         self.config = configuracion
+        self.gestor_errores = gestor_errores or GestorErrores(configuracion)
+        self.mecanismo_reintentos = mecanismo_reintentos or MecanismoReintentos(configuracion)
         self.tareas_activas: Dict[str, Dict] = {}
         self.estadisticas = {
             'tareas_completadas': 0,
             'tareas_fallidas': 0,
             'tiempo_total_ejecucion': 0.0
         }
+        # Pool propio para herramientas síncronas: no compite con el executor por defecto
+        self._executor_io = ThreadPoolExecutor(
+            max_workers=configuracion.get('max_workers_io', 32),
+            thread_name_prefix='met-io'
+        )
+        
+        # Caché LRU con TTL de resultados de herramientas deterministas
+        self.tamaño_cache_resultados = configuracion.get('tamaño_cache_resultados', 4096)
+        self.ttl_cache_resultados = configuracion.get('ttl_cache_resultados', 300)
+        self._cache_resultados: 'OrderedDict[tuple, tuple]' = OrderedDict()
         
         logger.info("Motor de Ejecución inicializado correctamente")
     
@@ -49,6 +71,15 @@ class MotorEjecucion:
             tarea_validada = await self._validar_tarea(tarea)
             herramienta = self._seleccionar_herramienta(tarea_validada)
             
+            # Herramientas deterministas: reutilizar un resultado previo idéntico
+            clave_cache = self._clave_cache_resultado(herramienta, tarea_validada, contexto)
+            if clave_cache is not None:
+                resultado_cacheado = self._obtener_resultado_cacheado(clave_cache)
+                if resultado_cacheado is not None:
+                    self._registrar_exito_tarea(tarea_id, resultado_cacheado)
+                    logger.debug(f"Tarea {tarea_id} servida desde caché de resultados")
+                    return resultado_cacheado
+            
             # 2. Ejecutar con estrategia de reintentos
             resultado = await self._ejecutar_con_reintentos(
                 herramienta, tarea_validada, contexto
@@ -57,6 +88,8 @@ class MotorEjecucion:
             # 3. Procesar resultado
             resultado_procesado = self._procesar_resultado(resultado, tarea_validada)
             self._registrar_exito_tarea(tarea_id, resultado_procesado)
+            if clave_cache is not None:
+                self._guardar_resultado_cacheado(clave_cache, resultado_procesado)
             
             logger.success(f"Tarea {tarea_id} completada exitosamente")
             return resultado_procesado
@@ -69,11 +102,69 @@ class MotorEjecucion:
             logger.error(f"Tarea {tarea_id} falló: {str(e)}")
             return resultado_error
     
+    @staticmethod
+    def _clave_cache_resultado(herramienta: Callable, tarea: Dict, contexto: Optional[Dict]) -> Optional[tuple]:
+        """
+        Calcula la clave de caché de una tarea si su herramienta es determinista.
+        
+        La herramienta recibe el contexto junto a los parámetros, así que el
+        contexto forma parte de la clave salvo que la herramienta declare
+        ``depende_contexto = False``.
+        
+        Returns:
+            Optional[tuple]: (nombre de herramienta, digest de los parámetros y
+                del contexto) o None
+        """
+        # Métodos ligados: los marcadores están en la instancia de la herramienta
+        propietario = getattr(herramienta, '__self__', herramienta)
+        if not getattr(propietario, 'determinista', False):
+            return None
+        entrada = {'parametros': tarea.get('parametros', {})}
+        if getattr(propietario, 'depende_contexto', True):
+            entrada['contexto'] = contexto
+        try:
+            serializado = orjson.dumps(entrada, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            return None  # Parámetros o contexto no serializables: no se cachea
+        nombre = getattr(propietario, 'nombre', None) or getattr(herramienta, '__qualname__', repr(herramienta))
+        return nombre, hashlib.blake2b(serializado, digest_size=16).digest()
+    
+    def _obtener_resultado_cacheado(self, clave: tuple) -> Optional[Dict[str, Any]]:
+        """Devuelve una copia profunda del resultado cacheado si existe y no ha caducado"""
+        entrada = self._cache_resultados.get(clave)
+        if entrada is None:
+            return None
+        if time.monotonic() - entrada[0] > self.ttl_cache_resultados:
+            del self._cache_resultados[clave]
+            return None
+        self._cache_resultados.move_to_end(clave)
+        return copy.deepcopy(entrada[1])
+    
+    def _guardar_resultado_cacheado(self, clave: tuple, resultado: Dict[str, Any]):
+        """Guarda una copia profunda del resultado de una herramienta determinista"""
+        self._cache_resultados[clave] = (time.monotonic(), copy.deepcopy(resultado))
+        self._cache_resultados.move_to_end(clave)
+        while len(self._cache_resultados) > self.tamaño_cache_resultados:
+            self._cache_resultados.popitem(last=False)
+    
     async def _ejecutar_con_reintentos(self, herramienta: Callable, tarea: Dict, 
                                      contexto: Dict) -> Dict[str, Any]:
         """
         Ejecuta una tarea con estrategia de reintentos inteligente.
         
+        Resultados fallidos y excepciones siguen el mismo camino: cada fallo
+        se clasifica una vez y la estrategia de reintento (delay y backoff)
+        se fija con la clasificación del primer fallo.
+        
+        Solo se reintentan los errores que GestorErrores clasifica como
+        recuperables (timeouts, conexión, límites de tasa...). Un error sin
+        clasificar, como ValueError o KeyError, indica parámetros o lógica
+        incorrectos: falla en el primer intento sin reintentos.
+        
+        El número de reintentos es el de la tarea, si lo indica; si no, el
+        ``max_reintentos`` de la configuración y, en último término, el de
+        la estrategia.
+        
         Args:
             herramienta: Función de la herramienta a ejecutar
             tarea: Tarea validada
@@ -82,75 +173,100 @@ class MotorEjecucion:
         Returns:
             Dict: Resultado de la ejecución
         """
-        max_reintentos = tarea.get('max_reintentos', self.config.get('max_reintentos', 3))
+        # Constantes durante todos los intentos: se resuelven una sola vez
+        timeout = tarea.get('timeout', self.config.get('timeout_default', 30))
+        argumentos = {**tarea['parametros'], 'contexto': contexto}
+        es_corrutina = asyncio.iscoroutinefunction(herramienta)
+        estrategia = None
+        estado_backoff = None
+        max_reintentos = 0
         reintento_actual = 0
         
-        while reintento_actual <= max_reintentos:
-            try:
-                resultado = await self._ejecutar_simple(herramienta, tarea, contexto)
-                if resultado['exito']:
-                    return resultado
-                
-                # Si falló pero es recuperable, reintentar
-                if self._es_error_recuperable(resultado['error']):
-                    reintento_actual += 1
-                    await self._manejar_reintento(reintento_actual, resultado['error'])
-                else:
-                    break
-                    
-            except Exception as e:
-                reintento_actual += 1
-                if reintento_actual > max_reintentos or not self._es_error_recuperable(e):
-                    raise
-                await self._manejar_reintento(reintento_actual, e)
-        
-        raise Exception(f"Fallo después de {reintento_actual} intentos")
+        while True:
+            resultado = await self._ejecutar_simple(
+                herramienta, argumentos, timeout, es_corrutina
+            )
+            if resultado['exito']:
+                return resultado
+            
+            clasificacion = self.gestor_errores.clasificar_error(resultado['excepcion'])
+            if not clasificacion['recuperable']:
+                # Errores no clasificados (p. ej. ValueError): sin reintentos
+                break
+            
+            if estrategia is None:
+                estrategia = self.gestor_errores.obtener_estrategia_reintento(clasificacion)
+                estado_backoff = EstadoBackoff(estrategia['delay'])
+                max_reintentos = tarea.get(
+                    'max_reintentos', self.config.get('max_reintentos', estrategia['max_reintentos'])
+                )
+            if reintento_actual >= max_reintentos:
+                break
+            
+            reintento_actual += 1
+            delay = self.mecanismo_reintentos.calcular_delay(reintento_actual, estrategia, estado_backoff)
+            logger.warning(
+                "Reintento {}/{} en {:.2f}s ({}): {}",
+                reintento_actual, max_reintentos, delay,
+                clasificacion['tipo'], resultado['error']
+            )
+            await asyncio.sleep(delay)
+        
+        raise Exception(f"Fallo después de {reintento_actual} reintentos: {resultado['error']}")
     
-    async def _ejecutar_simple(self, herramienta: Callable, tarea: Dict, 
-                             contexto: Dict) -> Dict[str, Any]:
+    async def _ejecutar_simple(self, herramienta: Callable, argumentos: Dict,
+                             timeout: float, es_corrutina: bool) -> Dict[str, Any]:
         """
         Ejecución simple de una tarea con control de timeout.
         
         Args:
             herramienta: Función de la herramienta
-            tarea: Tarea a ejecutar
-            contexto: Contexto de ejecución
+            argumentos: Parámetros de la tarea más el contexto de ejecución
+            timeout: Tiempo máximo de ejecución en segundos
+            es_corrutina: Si la herramienta es una función asíncrona
         
         Returns:
-            Dict: Resultado de la ejecución
+            Dict: Resultado de la ejecución; en los fallos, 'excepcion' conserva
+                la excepción original para su clasificación
         """
-        timeout = tarea.get('timeout', self.config.get('timeout_default', 30))
-        
         try:
-            if asyncio.iscoroutinefunction(herramienta):
+            if es_corrutina:
                 # Ejecución asíncrona
                 resultado = await asyncio.wait_for(
-                    herramienta(**tarea['parametros'], contexto=contexto),
+                    herramienta(**argumentos),
                     timeout=timeout
                 )
             else:
                 # Ejecución síncrona en thread pool
-                loop = asyncio.get_event_loop()
+                loop = asyncio.get_running_loop()
                 resultado = await loop.run_in_executor(
-                    None,  # Usar executor por defecto
-                    lambda: herramienta(**tarea['parametros'], contexto=contexto)
+                    self._executor_io,
+                    functools.partial(herramienta, **argumentos)
                 )
             
             return {
                 'exito': True,
                 'resultado': resultado,
-                'error': None
+                'error': None,
+                'excepcion': None
             }
             
-        except asyncio.TimeoutError:
+        except asyncio.TimeoutError as e:
             return {
                 'exito': False,
                 'resultado': None,
-                'error': f"Timeout después de {timeout} segundos"
+                'error': f"Timeout después de {timeout} segundos",
+                'excepcion': e
             }
         except Exception as e:
             return {
                 'exito': False,
                 'resultado': None,
-                'error': str(e)
-            }
\ No newline at end of file
+                'error': str(e),
+                'excepcion': e
+            }
+    
+    async def cerrar(self):
+        """Libera el pool de hilos de las herramientas síncronas"""
+        self._executor_io.shutdown(wait=False)
+        logger.info("Motor de Ejecución cerrado")
\ No newline at end of file
@@ -1,13 +1,88 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterable
+import asyncio
 from datetime import datetime
+import numpy as np
 from loguru import logger
 
+# Grupos de métricas de MetadatosEjecucion que se acumulan en columnas
+_GRUPOS_METRICAS = ('rendimiento', 'eficiencia', 'calidad')
+
+class _BufferMetricas:
+    """
+    Métricas de ejecución en columnas NumPy (una por métrica, una fila por ejecución).
+    
+    Las agregaciones (medias, percentiles) se hacen con reducciones de NumPy
+    sobre columnas contiguas en lugar de recorrer diccionarios. Las métricas
+    ausentes en una ejecución quedan como NaN.
+    
+    La capacidad es fija: las columnas forman un anillo y, una vez lleno,
+    cada ejecución nueva sobrescribe la más antigua.
+    """
+    
+    def __init__(self, capacidad: int = 1024):
+        self._capacidad = capacidad
+        self._columnas: Dict[str, np.ndarray] = {}
+        self._siguiente = 0
+        self.filas = 0
+    
+    def agregar(self, valores: Dict[str, float]):
+        """Añade una fila con las métricas de una ejecución"""
+        posicion = self._siguiente
+        for nombre, columna in self._columnas.items():
+            # La fila sobrescrita no debe conservar valores de otra ejecución
+            columna[posicion] = valores.get(nombre, np.nan)
+        for nombre in valores.keys() - self._columnas.keys():
+            columna = self._columnas[nombre] = np.full(self._capacidad, np.nan, dtype=np.float32)
+            columna[posicion] = valores[nombre]
+        
+        self._siguiente = (posicion + 1) % self._capacidad
+        self.filas = min(self.filas + 1, self._capacidad)
+    
+    def columnas(self) -> Dict[str, np.ndarray]:
+        """Columnas con las filas ocupadas, de la más antigua a la más reciente"""
+        if self.filas < self._capacidad:
+            return {nombre: columna[:self.filas] for nombre, columna in self._columnas.items()}
+        return {nombre: np.roll(columna, -self._siguiente) for nombre, columna in self._columnas.items()}
+    
+    def resumen(self, percentiles: Iterable[float] = (50, 95, 99)) -> Dict[str, Dict[str, float]]:
+        """Media y percentiles de cada métrica, ignorando ejecuciones sin valor"""
+        percentiles = tuple(percentiles)
+        resumen = {}
+        for nombre, valores in self.columnas().items():
+            validos = valores[~np.isnan(valores)]
+            if validos.size == 0:
+                continue
+            estadisticas = {'media': float(validos.mean()), 'muestras': int(validos.size)}
+            for percentil, valor in zip(percentiles, np.percentile(validos, percentiles)):
+                estadisticas[f'p{percentil:g}'] = float(valor)
+            resumen[nombre] = estadisticas
+        return resumen
+    
+    def vaciar(self):
+        """Descarta las filas acumuladas conservando las columnas reservadas"""
+        for columna in self._columnas.values():
+            columna.fill(np.nan)
+        self._siguiente = 0
+        self.filas = 0
+
 class AdaptadorMemoriaMetadatos:
     """Adaptador para almacenamiento de metadatos en el Sistema de Memoria de Triple Capa"""
     
     def __init__(self, sistema_memoria, configuracion: Dict[str, Any]):
         self.memoria = sistema_memoria
         self.config = configuracion
+        # Volcado opcional a disco (.npz) cada N ejecuciones
+        self.ruta_volcado_metricas = configuracion.get('ruta_volcado_metricas')
+        self.volcado_metricas_cada = configuracion.get('volcado_metricas_cada', 10000)
+        self._volcados_metricas = 0
+        # Anillo acotado: con volcado a disco cabe un periodo completo de volcado
+        capacidad = configuracion.get('capacidad_buffer_metricas', 1024)
+        if self.ruta_volcado_metricas:
+            capacidad = max(capacidad, self.volcado_metricas_cada)
+        self._buffer_metricas = _BufferMetricas(capacidad)
+        # Resumen de percentiles publicado en memoria de trabajo cada N ejecuciones
+        self.resumen_metricas_cada = configuracion.get('resumen_metricas_cada', 100)
+        self._ejecuciones_acumuladas = 0
     
     async def guardar_metadatos(self, metadatos: Dict) -> str:
         """
@@ -20,15 +95,25 @@ class AdaptadorMemoriaMetadatos:
             str: ID del registro creado
         """
         try:
+            self._acumular_metricas(metadatos)
+            
+            # Mismo timestamp en las tres capas: permite cruzar los registros de un guardado
+            timestamp = datetime.now().isoformat()
+            
             # 1. Almacenar en Memoria Episódica (capa 3)
-            episodio_id = await self._guardar_en_memoria_episodica(metadatos)
+            episodio_id = await self._guardar_en_memoria_episodica(metadatos, timestamp)
             
+            # 2 y 3 son independientes entre sí: se lanzan a la vez
+            escrituras = [
+                # 3. Mantener en Memoria de Trabajo (capa 1) temporalmente
+                self._mantener_en_memoria_trabajo(metadatos, episodio_id, timestamp)
+            ]
             # 2. Almacenar en Base de Conocimiento (capa 2) si es exitoso
             if metadatos.get('exito') and metadatos.get('estado') == 'exito':
-                await self._extraer_a_base_conocimiento(metadatos)
-            
-            # 3. Mantener en Memoria de Trabajo (capa 1) temporalmente
-            await self._mantener_en_memoria_trabajo(metadatos, episodio_id)
+                escrituras.append(self._extraer_a_base_conocimiento(metadatos, timestamp))
+            if self.resumen_metricas_cada and self._ejecuciones_acumuladas % self.resumen_metricas_cada == 0:
+                escrituras.append(self._publicar_resumen_metricas(timestamp))
+            await asyncio.gather(*escrituras)
             
             return episodio_id
             
@@ -36,11 +121,51 @@ class AdaptadorMemoriaMetadatos:
             logger.error(f"Error almacenando metadatos: {e}")
             raise
     
-    async def _guardar_en_memoria_episodica(self, metadatos: Dict) -> str:
+    def _acumular_metricas(self, metadatos: Dict):
+        """Añade las métricas de la ejecución al buffer columnar"""
+        fila = {
+            f"{grupo}.{nombre}": valor
+            for grupo in _GRUPOS_METRICAS
+            for nombre, valor in metadatos.get(f'metricas_{grupo}', {}).items()
+        }
+        self._buffer_metricas.agregar(fila)
+        self._ejecuciones_acumuladas += 1
+        
+        if self.ruta_volcado_metricas and self._buffer_metricas.filas >= self.volcado_metricas_cada:
+            self.volcar_metricas()
+    
+    def volcar_metricas(self):
+        """Guarda las columnas acumuladas en un nuevo fichero .npz y vacía el buffer"""
+        ruta = f"{self.ruta_volcado_metricas}.{self._volcados_metricas:06d}.npz"
+        np.savez(ruta, **self._buffer_metricas.columnas())
+        logger.debug(f"Volcadas {self._buffer_metricas.filas} filas de métricas a {ruta}")
+        self._volcados_metricas += 1
+        self._buffer_metricas.vaciar()
+    
+    def obtener_resumen_metricas(self, percentiles: Iterable[float] = (50, 95, 99)) -> Dict[str, Dict[str, float]]:
+        """
+        Resume las métricas de las ejecuciones acumuladas.
+        
+        Args:
+            percentiles: Percentiles a calcular por métrica
+        
+        Returns:
+            Dict: Media, número de muestras y percentiles por métrica ('grupo.nombre')
+        """
+        return self._buffer_metricas.resumen(percentiles)
+    
+    async def _publicar_resumen_metricas(self, timestamp: str):
+        """Deja en memoria de trabajo el resumen de las métricas recientes"""
+        await self.memoria.guardar_contexto('resumen_metricas_ejecucion', {
+            'timestamp': timestamp,
+            'metricas': self.obtener_resumen_metricas()
+        }, expiration=3600)
+    
+    async def _guardar_en_memoria_episodica(self, metadatos: Dict, timestamp: str) -> str:
         """Almacena metadatos en la memoria episódica"""
         episodio = {
             'tipo': 'ejecucion_tarea',
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': timestamp,
             'objetivo': f"Ejecución de tarea {metadatos.get('tarea_id')}",
             'plan_ejecutado': {
                 'tarea_id': metadatos.get('tarea_id'),
@@ -63,7 +188,7 @@ class AdaptadorMemoriaMetadatos:
         
         return await self.memoria.guardar_episodio(episodio)
     
-    async def _extraer_a_base_conocimiento(self, metadatos: Dict):
+    async def _extraer_a_base_conocimiento(self, metadatos: Dict, timestamp: str):
         """Extrae conocimiento a la base de conocimiento"""
         conocimiento = {
             'tipo': 'patron_ejecucion',
@@ -72,19 +197,19 @@ class AdaptadorMemoriaMetadatos:
             'herramienta': metadatos.get('herramienta_utilizada'),
             'parametros_optimos': metadatos.get('parametros_ejecucion', {}),
             'metricas_rendimiento': metadatos.get('metricas_rendimiento', {}),
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': timestamp,
             'numero_ejecuciones': 1,
             'tasa_exito': 1.0
         }
         
         await self.memoria.guardar_habilidad(conocimiento)
     
-    async def _mantener_en_memoria_trabajo(self, metadatos: Dict, episodio_id: str):
+    async def _mantener_en_memoria_trabajo(self, metadatos: Dict, episodio_id: str, timestamp: str):
         """Mantiene referencia en memoria de trabajo"""
         clave = f"metadatos_{metadatos.get('tarea_id')}"
         valor = {
             'episodio_id': episodio_id,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': timestamp,
             'estado': metadatos.get('estado'),
             'resumen': self._generar_resumen(metadatos)
         }
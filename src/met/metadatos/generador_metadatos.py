@@ -1,8 +1,26 @@
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
+import re
 import time
 from enum import Enum
 from loguru import logger
+from met.metadatos.marca_tiempo import ahora_iso
+
+try:
+    # Parser ISO 8601 en C; acepta 'Z' sin reescribir la cadena
+    from ciso8601 import parse_datetime as _parsear_iso
+except ImportError:
+    # Desde Python 3.11 fromisoformat también acepta el sufijo 'Z'
+    _parsear_iso = datetime.fromisoformat
+
+# Marcadores de error: una sola pasada sin .lower(); cada lookahead opcional
+# captura su marcador de forma independiente en cualquier posición
+_MARCADORES_ERROR = re.compile(
+    r'(?:(?=.*?(?P<timeout>timeout)))?'
+    r'(?:(?=.*?(?P<cancel>cancel)))?'
+    r'(?:(?=.*?(?P<connection>connection)))?',
+    re.IGNORECASE | re.DOTALL
+)
 
 class EstadoEjecucion(Enum):
     """Estados posibles de una ejecución de tarea"""
@@ -35,24 +53,26 @@ class GeneradorMetadatos:
         Returns:
             Dict: Metadatos estructurados de la ejecución
         """
+        tarea_id = tarea.get('id')
         try:
             # 1. Calcular métricas básicas de ejecución
             metricas_basicas = self._calcular_metricas_basicas(resultado)
             
             # 2. Evaluar resultado y determinar estado
-            estado = self._determinar_estado_ejecucion(resultado, metricas_basicas)
+            marcadores = _MARCADORES_ERROR.match(resultado.get('error') or '')
+            estado = self._determinar_estado_ejecucion(resultado, metricas_basicas, marcadores)
             
             # 3. Generar metadatos completos
             metadatos = {
                 **metricas_basicas,
                 'estado': estado.value,
-                'tarea_id': tarea.get('id'),
+                'tarea_id': tarea_id,
                 'tipo_tarea': tarea.get('tipo'),
                 'herramienta_utilizada': resultado.get('herramienta'),
                 'parametros_ejecucion': tarea.get('parametros', {}),
-                'timestamp_ejecucion': datetime.now().isoformat(),
+                'timestamp_ejecucion': ahora_iso(),
                 'contexto_ejecucion': contexto_ejecucion,
-                'diagnostico': self._generar_diagnostico(resultado, estado)
+                'diagnostico': self._generar_diagnostico(resultado, estado, marcadores)
             }
             
             # 4. Enriquecer con métricas avanzadas
@@ -61,7 +81,7 @@ class GeneradorMetadatos:
             # 5. Registrar en el sistema de memoria
             await self._registrar_metadatos(metadatos)
             
-            logger.debug(f"Metadatos generados para tarea {tarea.get('id')}")
+            logger.debug("Metadatos generados para tarea {}", tarea_id)
             return metadatos
             
         except Exception as e:
@@ -74,12 +94,16 @@ class GeneradorMetadatos:
         tiempo_fin = resultado.get('timestamp_fin')
         
         if tiempo_inicio and tiempo_fin:
-            if isinstance(tiempo_inicio, str):
-                tiempo_inicio = datetime.fromisoformat(tiempo_inicio.replace('Z', '+00:00'))
-            if isinstance(tiempo_fin, str):
-                tiempo_fin = datetime.fromisoformat(tiempo_fin.replace('Z', '+00:00'))
-            
-            duracion = (tiempo_fin - tiempo_inicio).total_seconds()
+            if isinstance(tiempo_inicio, (int, float)) and isinstance(tiempo_fin, (int, float)):
+                # Marcas epoch: la duración es una resta, sin objetos datetime
+                duracion = tiempo_fin - tiempo_inicio
+            else:
+                if isinstance(tiempo_inicio, str):
+                    tiempo_inicio = _parsear_iso(tiempo_inicio)
+                if isinstance(tiempo_fin, str):
+                    tiempo_fin = _parsear_iso(tiempo_fin)
+                
+                duracion = (tiempo_fin - tiempo_inicio).total_seconds()
         else:
             duracion = resultado.get('duracion', 0)
         
@@ -90,15 +114,17 @@ class GeneradorMetadatos:
             'exito': resultado.get('exito', False)
         }
     
-    def _determinar_estado_ejecucion(self, resultado: Dict, metricas: Dict) -> EstadoEjecucion:
+    def _determinar_estado_ejecucion(self, resultado: Dict, metricas: Dict,
+                                     marcadores: Optional[re.Match] = None) -> EstadoEjecucion:
         """Determina el estado final de la ejecución"""
         if resultado.get('exito', False):
             return EstadoEjecucion.EXITO
         
-        error = resultado.get('error', '')
-        if 'timeout' in error.lower():
+        if marcadores is None:
+            marcadores = _MARCADORES_ERROR.match(resultado.get('error') or '')
+        if marcadores['timeout']:
             return EstadoEjecucion.TIMEOUT
-        elif 'cancel' in error.lower():
+        elif marcadores['cancel']:
             return EstadoEjecucion.CANCELADO
         
         # Evaluar si el fallo fue parcial o completo
@@ -107,9 +133,12 @@ class GeneradorMetadatos:
         
         return EstadoEjecucion.FALLO
     
-    def _generar_diagnostico(self, resultado: Dict, estado: EstadoEjecucion) -> Dict[str, Any]:
+    def _generar_diagnostico(self, resultado: Dict, estado: EstadoEjecucion,
+                             marcadores: Optional[re.Match] = None) -> Dict[str, Any]:
         """Genera diagnóstico detallado del resultado de ejecución"""
         error = resultado.get('error', '')
+        if marcadores is None:
+            marcadores = _MARCADORES_ERROR.match(error or '')
         
         diagnostico = {
             'estado': estado.value,
@@ -120,12 +149,12 @@ class GeneradorMetadatos:
         }
         
         # Agregar información específica por tipo de error
-        if 'timeout' in error.lower():
+        if marcadores['timeout']:
             diagnostico['detalles'] = {
                 'tipo': 'timeout',
                 'umbral_sugerido': resultado.get('timeout_original', 0) * 1.5
             }
-        elif 'connection' in error.lower():
+        elif marcadores['connection']:
             diagnostico['detalles'] = {
                 'tipo': 'conexion',
                 'reintentos_realizados': resultado.get('reintentos', 0)
@@ -0,0 +1,24 @@
+from typing import Tuple
+import time
+from datetime import datetime
+
+# Último segundo formateado: (segundo epoch, cadena ISO)
+_cache_iso: Tuple[int, str] = (-1, '')
+
+def ahora_iso() -> str:
+    """
+    Devuelve la hora local actual en ISO 8601 con resolución de segundos.
+    
+    La cadena se formatea una vez por segundo y se reutiliza para el resto
+    de registros de ese segundo.
+    
+    Returns:
+        str: Marca de tiempo ISO 8601
+    """
+    global _cache_iso
+    segundo = int(time.time())
+    cache = _cache_iso
+    if cache[0] != segundo:
+        cache = (segundo, datetime.fromtimestamp(segundo).isoformat())
+        _cache_iso = cache
+    return cache[1]
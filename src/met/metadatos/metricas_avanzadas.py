@@ -1,7 +1,22 @@
 from typing import Dict, List, Any, Optional
-import psutil
-from datetime import datetime
 from loguru import logger
+from met.metadatos.marca_tiempo import ahora_iso
+from met.monitorizacion.muestreo_sistema import muestrear_sistema
+
+# Claves planas de las métricas de rendimiento y eficiencia que produce el
+# calculador; los consumidores las leen directamente sin recorrer los metadatos
+CLAVES_RENDIMIENTO = (
+    'rendimiento_duracion_absoluta',
+    'rendimiento_duracion_relativa',
+    'rendimiento_throughput',
+    'rendimiento_estabilidad'
+)
+CLAVES_EFICIENCIA = (
+    'eficiencia_recursos_cpu',
+    'eficiencia_recursos_memoria',
+    'eficiencia_costo',
+    'eficiencia_energetica'
+)
 
 class CalculadorMetricasAvanzadas:
     """Sistema de cálculo de métricas avanzadas de ejecución"""
@@ -21,21 +36,17 @@ class CalculadorMetricasAvanzadas:
         Returns:
             Dict: Métricas avanzadas
         """
-        metricas = {}
-        
-        # Métricas de rendimiento
-        metricas.update(self._calcular_metricas_rendimiento(metadatos_basicos))
-        
-        # Métricas de eficiencia
-        metricas.update(self._calcular_metricas_eficiencia(metadatos_basicos, contexto_ejecucion))
-        
-        # Métricas de calidad
-        metricas.update(self._calcular_metricas_calidad(metadatos_basicos))
-        
-        # Métricas del sistema
-        metricas.update(self._capturar_metricas_sistema())
-        
-        return metricas
+        # Un único dict final en vez de cuatro update() sobre uno vacío
+        return {
+            # Métricas de rendimiento
+            **self._calcular_metricas_rendimiento(metadatos_basicos),
+            # Métricas de eficiencia
+            **self._calcular_metricas_eficiencia(metadatos_basicos, contexto_ejecucion),
+            # Métricas de calidad
+            **self._calcular_metricas_calidad(metadatos_basicos),
+            # Métricas del sistema
+            **self._capturar_metricas_sistema()
+        }
     
     def _calcular_metricas_rendimiento(self, metadatos: Dict) -> Dict[str, Any]:
         """Calcula métricas de rendimiento de la ejecución"""
@@ -74,10 +85,11 @@ class CalculadorMetricasAvanzadas:
     
     def _capturar_metricas_sistema(self) -> Dict[str, Any]:
         """Captura métricas del sistema durante la ejecución"""
+        muestra = muestrear_sistema(self.config.get('ttl_muestra_sistema', 1.0))
         return {
-            'sistema_cpu_porcentaje': psutil.cpu_percent(),
-            'sistema_memoria_porcentaje': psutil.virtual_memory().percent,
-            'sistema_disco_porcentaje': psutil.disk_usage('/').percent,
+            'sistema_cpu_porcentaje': muestra.cpu_porcentaje,
+            'sistema_memoria_porcentaje': muestra.memoria_porcentaje,
+            'sistema_disco_porcentaje': muestra.disco_porcentaje,
             'sistema_red_actividad': self._medir_actividad_red(),
-            'sistema_timestamp_captura': datetime.now().isoformat()
+            'sistema_timestamp_captura': ahora_iso()
         }
\ No newline at end of file
@@ -1,7 +1,12 @@
 from typing import Dict, List, Any, Optional
+import asyncio
 from datetime import datetime
-import json
+import uuid
 from loguru import logger
+from met.metadatos.marca_tiempo import ahora_iso
+from met.metadatos.metricas_avanzadas import CLAVES_RENDIMIENTO, CLAVES_EFICIENCIA
+
+_CLAVES_METRICAS_CONOCIMIENTO = CLAVES_RENDIMIENTO + CLAVES_EFICIENCIA
 
 class RegistradorMetadatos:
     """Sistema de registro y almacenamiento de metadatos de ejecución"""
@@ -11,6 +16,11 @@ class RegistradorMetadatos:
         self.config = configuracion
         self.buffer_metadatos = []
         self.tamano_buffer = configuracion.get('tamano_buffer', 100)
+        # Cada cuántos registros se emite un resumen a nivel INFO; 0 desactiva el resumen
+        self.intervalo_log = configuracion.get('intervalo_log_registros', 100)
+        if not isinstance(self.intervalo_log, int) or self.intervalo_log < 0:
+            raise ValueError(f"intervalo_log_registros debe ser un entero >= 0: {self.intervalo_log!r}")
+        self.total_registrados = 0
         
     async def registrar_metadatos(self, metadatos: Dict, almacenamiento_inmediato: bool = False) -> str:
         """
@@ -39,7 +49,10 @@ class RegistradorMetadatos:
                 if len(self.buffer_metadatos) >= self.tamano_buffer:
                     await self._procesar_buffer()
             
-            logger.info(f"Metadatos registrados: {registro_id}")
+            self.total_registrados += 1
+            logger.debug("Metadatos registrados: {}", registro_id)
+            if self.intervalo_log and self.total_registrados % self.intervalo_log == 0:
+                logger.info("Metadatos registrados: {} en total", self.total_registrados)
             return registro_id
             
         except Exception as e:
@@ -62,33 +75,51 @@ class RegistradorMetadatos:
         if not self.buffer_metadatos:
             return
         
-        try:
-            # Almacenar todos los metadatos del buffer
-            for metadatos in self.buffer_metadatos:
-                await self._almacenar_directo(metadatos)
-            
-            # Limpiar buffer
-            self.buffer_metadatos.clear()
-            
-            logger.info(f"Buffer de metadatos procesado: {len(self.buffer_metadatos)} registros")
-            
-        except Exception as e:
-            logger.error(f"Error procesando buffer: {e}")
+        # Se toma el lote y se deja un buffer vacío para los registros que
+        # lleguen mientras se escribe
+        lote = self.buffer_metadatos
+        self.buffer_metadatos = []
+        
+        # Almacenar todos los metadatos del lote de forma concurrente
+        resultados = await asyncio.gather(
+            *(self._almacenar_directo(metadatos) for metadatos in lote),
+            return_exceptions=True
+        )
+        
+        # Los registros fallidos vuelven al buffer para el siguiente volcado
+        fallidos = [
+            metadatos for metadatos, resultado in zip(lote, resultados)
+            if isinstance(resultado, Exception)
+        ]
+        if fallidos:
+            self.buffer_metadatos[:0] = fallidos
+            logger.error(f"Error procesando buffer: {len(fallidos)} de {len(lote)} registros fallidos")
+        
+        logger.info(f"Buffer de metadatos procesado: {len(lote) - len(fallidos)} registros")
     
     def _enriquecer_metadatos(self, metadatos: Dict) -> Dict[str, Any]:
         """Enriquece los metadatos con información adicional"""
-        timestamp = datetime.now()
-        
         metadatos_enriquecidos = {
             **metadatos,
             'version_metadatos': '1.0',
-            'timestamp_registro': timestamp.isoformat(),
+            'timestamp_registro': ahora_iso(),
             'hash_ejecucion': self._generar_hash_ejecucion(metadatos),
             'contexto_global': self._capturar_contexto_global()
         }
         
         return metadatos_enriquecidos
     
+    @staticmethod
+    def _generar_hash_ejecucion(metadatos: Dict) -> str:
+        """
+        Genera el identificador único de la ejecución.
+        
+        Es solo una etiqueta de unicidad, así que no se hashea el contenido:
+        el contenido incluye marcas de tiempo de resolución de segundo, y dos
+        ejecuciones idénticas en el mismo segundo compartirían hash.
+        """
+        return uuid.uuid4().hex
+    
     async def _extraer_conocimiento(self, metadatos: Dict):
         """Extrae conocimiento de metadatos de ejecuciones exitosas"""
         if metadatos.get('estado') != 'exito':
@@ -101,8 +132,7 @@ class RegistradorMetadatos:
             'parametros_optimos': metadatos.get('parametros_ejecucion', {}),
             'duracion_promedio': metadatos.get('duracion_segundos', 0),
             'metricas_rendimiento': {
-                k: v for k, v in metadatos.items() 
-                if k.startswith('rendimiento_') or k.startswith('eficiencia_')
+                k: metadatos[k] for k in _CLAVES_METRICAS_CONOCIMIENTO if k in metadatos
             },
             'numero_muestras': 1
         }
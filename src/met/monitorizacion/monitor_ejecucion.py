@@ -1,8 +1,9 @@
 from typing import Dict, List, Any, Optional
 import time
-from datetime import datetime
-import psutil
+from collections import deque
 from loguru import logger
+from met.metadatos.marca_tiempo import ahora_iso
+from met.monitorizacion.muestreo_sistema import muestrear_sistema
 
 class MonitorEjecucion:
     """Sistema de monitorización en tiempo real de la ejecución de tareas"""
@@ -15,36 +16,40 @@ class MonitorEjecucion:
             'uso_memoria': 0.0,
             'latencia_promedio': 0.0
         }
-        self.historial_metricas = []
+        # deque acotado: las muestras antiguas se descartan en O(1)
+        self.historial_metricas = deque(maxlen=self.config.get('max_historial', 1000))
         
     async def iniciar_monitorizacion(self):
         """Inicia la monitorización continua en segundo plano"""
         import asyncio
         
+        # Planificación sobre el reloj monotónico: sin deriva por el tiempo
+        # de cada muestra ni por cambios del reloj del sistema
+        proxima = time.monotonic()
         while True:
             try:
                 await self._actualizar_metricas()
-                await asyncio.sleep(self.config.get('intervalo_monitoreo', 5))
+                proxima += self.config.get('intervalo_monitoreo', 5)
+                await asyncio.sleep(max(0.0, proxima - time.monotonic()))
             except Exception as e:
                 logger.error(f"Error en monitorización: {e}")
                 await asyncio.sleep(30)
+                proxima = time.monotonic()
     
     async def _actualizar_metricas(self):
         """Actualiza las métricas del sistema"""
-        self.metricas_tiempo_real.update({
-            'timestamp': datetime.now(),
+        muestra = muestrear_sistema(self.config.get('ttl_muestra_sistema', 1.0))
+        # Cada muestra es un dict nuevo: se comparte con el historial sin copiarlo
+        self.metricas_tiempo_real = {
+            'timestamp': ahora_iso(),
             'tareas_activas': self._contar_tareas_activas(),
-            'uso_cpu': psutil.cpu_percent(),
-            'uso_memoria': psutil.virtual_memory().percent,
+            'uso_cpu': muestra.cpu_porcentaje,
+            'uso_memoria': muestra.memoria_porcentaje,
             'latencia_promedio': self._calcular_latencia_promedio()
-        })
+        }
         
         # Guardar en historial
-        self.historial_metricas.append(self.metricas_tiempo_real.copy())
-        
-        # Limitar tamaño del historial
-        if len(self.historial_metricas) > self.config.get('max_historial', 1000):
-            self.historial_metricas = self.historial_metricas[-1000:]
+        self.historial_metricas.append(self.metricas_tiempo_real)
     
     def _contar_tareas_activas(self) -> int:
         """Cuenta las tareas activas en el sistema"""
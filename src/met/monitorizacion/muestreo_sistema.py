@@ -0,0 +1,94 @@
+from typing import NamedTuple, Optional, Tuple
+import os
+import re
+import sys
+import time
+import psutil
+
+class MuestraSistema(NamedTuple):
+    """Lectura de los recursos globales del sistema"""
+    cpu_porcentaje: float
+    memoria_porcentaje: float
+    disco_porcentaje: float
+
+_RE_MEMINFO = re.compile(rb'MemTotal:\s+(\d+).*?MemAvailable:\s+(\d+)', re.DOTALL)
+
+class LectorProc:
+    """
+    Lector de CPU y memoria sobre /proc con descriptores abiertos una vez.
+    
+    Cada muestra son dos ``os.pread`` (/proc/stat y /proc/meminfo) en lugar
+    de abrir, leer y cerrar los ficheros en cada llamada de psutil. Calcula
+    los porcentajes igual que psutil: CPU ocupada entre dos lecturas y
+    memoria usada como (total - disponible) / total.
+    """
+    
+    def __init__(self):
+        self._fd_stat = os.open('/proc/stat', os.O_RDONLY)
+        self._fd_meminfo = os.open('/proc/meminfo', os.O_RDONLY)
+        self._ultimo_total, self._ultimo_ocupado = self._tiempos_cpu()
+    
+    def _tiempos_cpu(self) -> Tuple[int, int]:
+        """Jiffies totales y ocupados de la línea agregada 'cpu'"""
+        campos = os.pread(self._fd_stat, 4096, 0).split(b'\n', 1)[0].split()[1:]
+        valores = [int(campo) for campo in campos[:8]]
+        total = sum(valores)
+        # idle + iowait no cuentan como tiempo ocupado
+        return total, total - valores[3] - valores[4]
+    
+    def leer(self) -> Tuple[float, float]:
+        """Porcentajes de CPU (desde la lectura anterior) y de memoria"""
+        total, ocupado = self._tiempos_cpu()
+        delta_total = total - self._ultimo_total
+        cpu = 100.0 * (ocupado - self._ultimo_ocupado) / delta_total if delta_total > 0 else 0.0
+        self._ultimo_total, self._ultimo_ocupado = total, ocupado
+        
+        encontrado = _RE_MEMINFO.search(os.pread(self._fd_meminfo, 4096, 0))
+        mem_total, mem_disponible = int(encontrado.group(1)), int(encontrado.group(2))
+        memoria = 100.0 * (mem_total - mem_disponible) / mem_total
+        return round(cpu, 1), round(memoria, 1)
+
+def _crear_lector() -> Optional[LectorProc]:
+    """LectorProc en Linux; None si /proc no está disponible o no es legible"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        lector = LectorProc()
+        lector.leer()
+        return lector
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+_lector = _crear_lector()
+if _lector is None:
+    # Línea base de cpu_percent(interval=None): la primera lectura siempre es 0.0
+    psutil.cpu_percent(interval=None)
+
+_ultima_muestra: MuestraSistema = MuestraSistema(0.0, 0.0, 0.0)
+_instante_muestra: float = float('-inf')
+
+def muestrear_sistema(ttl: float = 1.0) -> MuestraSistema:
+    """
+    Devuelve CPU, memoria y disco del sistema, reutilizando la última
+    lectura si tiene menos de ``ttl`` segundos.
+    
+    Cada lectura de psutil abre y parsea ficheros de /proc; varios llamantes
+    en la misma ventana comparten una sola ronda de lecturas. En Linux CPU y
+    memoria se leen con LectorProc.
+    
+    Args:
+        ttl: Antigüedad máxima en segundos de la muestra reutilizada
+    
+    Returns:
+        MuestraSistema: Porcentajes de CPU, memoria y disco
+    """
+    global _ultima_muestra, _instante_muestra
+    ahora = time.monotonic()
+    if ahora - _instante_muestra >= ttl:
+        if _lector is not None:
+            cpu, memoria = _lector.leer()
+        else:
+            cpu, memoria = psutil.cpu_percent(interval=None), psutil.virtual_memory().percent
+        _ultima_muestra = MuestraSistema(cpu, memoria, psutil.disk_usage('/').percent)
+        _instante_muestra = ahora
+    return _ultima_muestra
@@ -1,15 +1,65 @@
 from typing import Dict, List
 import asyncio
+import numpy as np
+import orjson
 import logging
 from datetime import datetime, timedelta
 
+class HistoricoMetricas:
+    """
+    Histórico circular de métricas numéricas en formato SoA.
+    
+    Cada métrica ocupa una columna de una matriz preasignada
+    (capacidad x métricas); las muestras se escriben como filas sobre un
+    índice circular, sin crear listas ni objetos por valor. Las métricas
+    ausentes en una muestra quedan como NaN.
+    """
+    
+    def __init__(self, capacidad: int):
+        self.capacidad = capacidad
+        self.columnas: Dict[str, int] = {}
+        self._muestras = np.empty((capacidad, 0))
+        self._escritas = 0
+    
+    def __len__(self) -> int:
+        return min(self._escritas, self.capacidad)
+    
+    def agregar(self, muestra: Dict):
+        """Escribe los valores numéricos de una muestra en la siguiente fila"""
+        numericas = [
+            (key, value) for key, value in muestra.items()
+            if isinstance(value, (int, float))
+        ]
+        nuevas = [key for key, _ in numericas if key not in self.columnas]
+        if nuevas:
+            # Métricas nuevas: se añaden columnas a NaN para el pasado
+            for key in nuevas:
+                self.columnas[key] = len(self.columnas)
+            self._muestras = np.hstack([
+                self._muestras, np.full((self.capacidad, len(nuevas)), np.nan)
+            ])
+        
+        fila = self._muestras[self._escritas % self.capacidad]
+        fila.fill(np.nan)
+        for key, value in numericas:
+            fila[self.columnas[key]] = value
+        self._escritas += 1
+    
+    def ultimas(self, n: int) -> np.ndarray:
+        """Matriz (muestras x métricas) de las últimas ``n`` muestras, en orden"""
+        n = min(n, len(self))
+        filas = np.arange(self._escritas - n, self._escritas) % self.capacidad
+        return self._muestras[filas]
+
 class OptimizadorRecursos:
     """Sistema de optimización automática de recursos para SAAM"""
     
     def __init__(self, config: Dict):
         self.config = config
-        self.metricas_historico = []
+        self.metricas_historico = HistoricoMetricas(config.get('max_historial_metricas', 24 * 7))
         self.ajustes_aplicados = []
+        # Firma de la última muestra analizada, para saltar ciclos sin datos nuevos
+        self._firma_ultima_muestra = None
         
     async def iniciar_optimizacion_continua(self):
         """Inicia el proceso continuo de optimización de recursos"""
@@ -26,8 +76,17 @@ class OptimizadorRecursos:
         # 1. Recolección de métricas
         metricas = await self._recolectar_metricas()
         
+        # Sin muestras nuevas el análisis daría el mismo resultado
+        firma = self._firmar_muestra(metricas[-1]) if metricas else None
+        if firma is not None and firma == self._firma_ultima_muestra:
+            logging.debug("Métricas sin cambios desde el último ciclo; se omite el análisis")
+            return
+        self._firma_ultima_muestra = firma
+        if metricas:
+            self.metricas_historico.agregar(metricas[-1])
+        
         # 2. Análisis de tendencias
-        analisis = await self._analizar_tendencias(metricas)
+        analisis = await self._analizar_tendencias()
         
         # 3. Identificación de oportunidades
         oportunidades = self._identificar_oportunidades(analisis)
@@ -37,29 +96,54 @@ class OptimizadorRecursos:
             resultados = await self._aplicar_ajustes(oportunidades)
             await self._registrar_resultados(resultados)
     
-    async def _analizar_tendencias(self, metricas: List[Dict]) -> Dict:
-        """Analiza tendencias de uso de recursos"""
-        from collections import defaultdict
-        import numpy as np
+    @staticmethod
+    def _firmar_muestra(muestra: Dict) -> bytes:
+        """Serialización canónica de una muestra de métricas"""
+        return orjson.dumps(
+            muestra,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+            default=str
+        )
+    
+    async def _analizar_tendencias(self) -> Dict:
+        """
+        Analiza tendencias de uso de recursos.
+        
+        Toma del histórico las últimas 24 muestras como matriz (muestras x
+        métricas) y obtiene a la vez las pendientes de mínimos cuadrados de
+        todas las columnas con la fórmula cerrada. Cada métrica usa solo las
+        muestras en las que aparece.
+        """
+        valores = self.metricas_historico.ultimas(24)  # Últimas 24 horas
+        if valores.size == 0:
+            return {}
+        
+        # Posición de cada muestra dentro de la serie de su métrica
+        presentes = ~np.isnan(valores)
+        n = presentes.sum(axis=0)
+        x = np.cumsum(presentes, axis=0) - 1.0
+        y = np.where(presentes, valores, 0.0)
         
-        tendencias = defaultdict(list)
+        validas = n >= 2
+        n_div = np.maximum(n, 1)
+        dx = np.where(presentes, x - x.sum(axis=0, where=presentes) / n_div, 0.0)
+        dy = np.where(presentes, y - y.sum(axis=0) / n_div, 0.0)
+        denominador = (dx * dx).sum(axis=0)
+        pendientes = (dx * dy).sum(axis=0) / np.where(validas, denominador, 1.0)
         
-        # Agrupar métricas por tipo y calcular tendencias
-        for metrica in metricas[-24:]:  # Últimas 24 horas
-            for key, value in metrica.items():
-                if isinstance(value, (int, float)):
-                    tendencias[key].append(value)
+        # Último valor presente de cada métrica
+        ultima_fila = len(valores) - 1 - np.argmax(presentes[::-1], axis=0)
+        actuales = valores[ultima_fila, np.arange(valores.shape[1])]
         
-        # Calcular tendencias
         analisis = {}
-        for key, values in tendencias.items():
-            if len(values) >= 2:
-                x = range(len(values))
-                slope, intercept = np.polyfit(x, values, 1)
+        for key, col in self.metricas_historico.columnas.items():
+            if validas[col]:
+                slope = float(pendientes[col])
+                valor_actual = float(actuales[col])
                 analisis[key] = {
                     'tendencia': slope,
-                    'valor_actual': values[-1],
-                    'prediccion_24h': slope * 24 + values[-1]
+                    'valor_actual': valor_actual,
+                    'prediccion_24h': slope * 24 + valor_actual
                 }
         
-        return analisis
\ No newline at end of file
+        return analisis
@@ -0,0 +1,149 @@
+from typing import Dict, List, Any, Optional
+import threading
+import time
+import numpy as np
+from loguru import logger
+
+try:
+    import hnswlib
+    HNSWLIB_DISPONIBLE = True
+except ImportError:
+    HNSWLIB_DISPONIBLE = False
+    logger.debug("hnswlib no disponible, la caché semántica de planes usará búsqueda exacta en NumPy")
+
+class CacheSemanticaPlanes:
+    """
+    Caché semántica de planes similares indexada por el embedding del objetivo.
+    
+    Un objetivo cuyo vecino más cercano supera el umbral de similitud coseno
+    reutiliza los planes ya consultados para ese vecino, aunque el texto no
+    coincida literalmente. Con hnswlib la búsqueda es un ANN (HNSW); sin él,
+    un producto matricial sobre los vectores normalizados.
+    
+    La capacidad es fija: cada entrada ocupa una posición de un anillo y las
+    más antiguas se sobrescriben, porque HNSW no admite borrados reales pero
+    sí actualizar el vector de una etiqueta existente.
+    
+    Cada entrada caduca a los ``ttl`` segundos: un acierto sobre una entrada
+    caducada cuenta como fallo y la consulta vuelve a la base de conocimiento.
+    Las llamadas llegan desde hilos del ejecutor, así que el acceso al índice
+    se serializa con un lock.
+    """
+    
+    def __init__(self, capacidad: int = 1000, umbral_similitud: float = 0.92, ttl: float = 3600):
+        self.capacidad = capacidad
+        self.umbral_similitud = umbral_similitud
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._indice = None
+        self._vectores: Optional[np.ndarray] = None
+        self._planes: List[Optional[List[Dict]]] = [None] * capacidad
+        self._instantes = np.zeros(capacidad, dtype=np.float64)
+        self._siguiente = 0
+        self._ocupadas = 0
+    
+    def __len__(self) -> int:
+        return self._ocupadas
+    
+    @staticmethod
+    def _normalizar(embedding: Any) -> np.ndarray:
+        """Vector float32 de norma unidad"""
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norma = np.linalg.norm(vector)
+        return vector / norma if norma > 0 else vector
+    
+    def _vigente(self, posicion: int, similitud: float, ahora: float) -> Optional[List[Dict]]:
+        """Planes de la posición si superan el umbral y no han caducado"""
+        if similitud < self.umbral_similitud or ahora - self._instantes[posicion] > self.ttl:
+            return None
+        return self._planes[posicion]
+    
+    def _inicializar(self, dimension: int):
+        """Crea el índice al conocer la dimensión del primer embedding"""
+        if HNSWLIB_DISPONIBLE:
+            self._indice = hnswlib.Index(space='cosine', dim=dimension)
+            self._indice.init_index(max_elements=self.capacidad, ef_construction=200, M=16)
+            self._indice.set_ef(50)
+        else:
+            self._vectores = np.zeros((self.capacidad, dimension), dtype=np.float32)
+    
+    def buscar(self, embedding: Any) -> Optional[List[Dict]]:
+        """
+        Busca los planes del objetivo más parecido ya cacheado.
+        
+        Args:
+            embedding: Embedding del objetivo normalizado
+        
+        Returns:
+            Optional[List[Dict]]: Planes cacheados, o None si no hay ninguno
+                por encima del umbral de similitud
+        """
+        vector = self._normalizar(embedding)
+        with self._lock:
+            if not self._ocupadas:
+                return None
+            if self._indice is not None:
+                etiquetas, distancias = self._indice.knn_query(vector, k=1)
+                posicion = int(etiquetas[0][0])
+                similitud = 1.0 - float(distancias[0][0])
+            else:
+                similitudes = self._vectores[:self._ocupadas] @ vector
+                posicion = int(np.argmax(similitudes))
+                similitud = float(similitudes[posicion])
+            return self._vigente(posicion, similitud, time.monotonic())
+    
+    def buscar_lote(self, embeddings: Any) -> List[Optional[List[Dict]]]:
+        """
+        Versión vectorizada de ``buscar``: una sola consulta para varios objetivos.
+        
+        Args:
+            embeddings: Matriz (n, dimensión) con un embedding por objetivo
+        
+        Returns:
+            List[Optional[List[Dict]]]: Planes cacheados o None por objetivo
+        """
+        matriz = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+        matriz = matriz / np.where(normas > 0, normas, 1.0)
+        with self._lock:
+            if not self._ocupadas:
+                return [None] * matriz.shape[0]
+            if self._indice is not None:
+                etiquetas, distancias = self._indice.knn_query(matriz, k=1)
+                posiciones = etiquetas[:, 0]
+                similitudes = 1.0 - distancias[:, 0]
+            else:
+                productos = matriz @ self._vectores[:self._ocupadas].T
+                posiciones = np.argmax(productos, axis=1)
+                similitudes = productos[np.arange(matriz.shape[0]), posiciones]
+            
+            ahora = time.monotonic()
+            return [
+                self._vigente(int(posicion), float(similitud), ahora)
+                for posicion, similitud in zip(posiciones, similitudes)
+            ]
+    
+    def guardar(self, embedding: Any, planes: List[Dict]):
+        """
+        Cachea los planes consultados para un objetivo.
+        
+        Args:
+            embedding: Embedding del objetivo normalizado
+            planes: Planes similares devueltos por la base de conocimiento
+        """
+        vector = self._normalizar(embedding)
+        with self._lock:
+            if self._indice is None and self._vectores is None:
+                self._inicializar(vector.shape[0])
+            
+            posicion = self._siguiente
+            if self._indice is not None:
+                # Reutilizar la etiqueta actualiza el vector de esa posición
+                self._indice.add_items(vector[np.newaxis, :], [posicion])
+            else:
+                self._vectores[posicion] = vector
+            self._planes[posicion] = planes
+            self._instantes[posicion] = time.monotonic()
+            
+            self._siguiente = (posicion + 1) % self.capacidad
+            self._ocupadas = min(self._ocupadas + 1, self.capacidad)
@@ -1,20 +1,46 @@
 import os
+import sys
+import copy
+import functools
+import threading
 import yaml
 from typing import Dict, Any, Optional
 from pathlib import Path
 from dotenv import load_dotenv
 import logging
 
+try:
+    # Parser de libyaml en C, bastante más rápido que el de Python puro
+    from yaml import CSafeLoader as _CargadorYAML
+except ImportError:
+    from yaml import SafeLoader as _CargadorYAML
+
+@functools.lru_cache(maxsize=32)
+def _cargar_yaml(ruta: str, mtime_ns: int) -> Any:
+    """Parsea un YAML; la caché se invalida cuando cambia su mtime"""
+    return yaml.load(Path(ruta).read_bytes(), Loader=_CargadorYAML)
+
+def _leer_yaml(ruta: Path) -> Dict[str, Any]:
+    """Devuelve una copia del YAML parseado, que el llamante puede modificar"""
+    return copy.deepcopy(_cargar_yaml(str(ruta), ruta.stat().st_mtime_ns)) or {}
+
 class ConfiguracionSAAM:
     """Clase singleton para la gestión centralizada de configuración del sistema SAAM"""
     
     _instancia = None
+    _lock = threading.Lock()
     
     def __new__(cls):
-        if cls._instancia is None:
-            cls._instancia = super(ConfiguracionSAAM, cls).__new__(cls)
-            cls._instancia._inicializar()
-        return cls._instancia
+        # Camino rápido sin lock; el doble chequeo evita inicializar dos veces
+        instancia = cls._instancia
+        if instancia is None:
+            with cls._lock:
+                instancia = cls._instancia
+                if instancia is None:
+                    instancia = super(ConfiguracionSAAM, cls).__new__(cls)
+                    instancia._inicializar()
+                    cls._instancia = instancia
+        return instancia
     
     def _inicializar(self):
         """Inicializa la configuración cargando variables de entorno y archivos YAML"""
@@ -26,6 +52,7 @@ class ConfiguracionSAAM:
         
         # Cargar configuración desde archivos YAML
         self.config = self._cargar_configuracion_archivos()
+        self._plano = self._aplanar(self.config)
         
         # Configurar logging
         self._configurar_logging()
@@ -38,15 +65,13 @@ class ConfiguracionSAAM:
         # Cargar configuración base
         base_config_path = config_path / 'base.yaml'
         if base_config_path.exists():
-            with open(base_config_path, 'r') as f:
-                config_base = yaml.safe_load(f) or {}
+            config_base = _leer_yaml(base_config_path)
         
         # Cargar configuración específica del entorno
         env_config_path = config_path / f'{self.entorno}.yaml'
         if env_config_path.exists():
-            with open(env_config_path, 'r') as f:
-                env_config = yaml.safe_load(f) or {}
-                config_base.update(env_config)
+            env_config = _leer_yaml(env_config_path)
+            config_base.update(env_config)
         
         # Sobrescribir con variables de entorno (prioridad máxima)
         self._sobrescribir_con_variables_entorno(config_base)
@@ -69,6 +94,29 @@ class ConfiguracionSAAM:
                 current[key] = {}
             current = current[key]
         current[keys[-1]] = value
+        
+        # Cambios posteriores a la carga: reconstruir el índice de claves
+        if config_dict is getattr(self, 'config', None):
+            self._plano = self._aplanar(self.config)
+    
+    @staticmethod
+    def _aplanar(config: Dict[str, Any], prefijo: str = '') -> Dict[str, Any]:
+        """
+        Indexa la configuración por su ruta con puntos.
+        
+        Incluye también los nodos intermedios, de modo que ``obtener('a.b')``
+        devuelve el subdiccionario igual que el recorrido anidado.
+        """
+        plano = {}
+        for key, value in config.items():
+            # Solo son alcanzables con notación de puntos las claves de texto sin '.'
+            if not isinstance(key, str) or '.' in key:
+                continue
+            ruta = sys.intern(prefijo + key)
+            plano[ruta] = value
+            if isinstance(value, dict):
+                plano.update(ConfiguracionSAAM._aplanar(value, ruta + '.'))
+        return plano
     
     def _configurar_logging(self):
         """Configura el sistema de logging basado en la configuración"""
@@ -80,14 +128,7 @@ class ConfiguracionSAAM:
     
     def obtener(self, clave: str, default: Any = None) -> Any:
         """Obtiene un valor de configuración usando notación de puntos"""
-        keys = clave.split('.')
-        value = self.config
-        try:
-            for key in keys:
-                value = value[key]
-            return value
-        except (KeyError, TypeError):
-            return default
+        return self._plano.get(clave, default)
 
 # Instancia global de configuración
 config = ConfiguracionSAAM()
\ No newline at end of file
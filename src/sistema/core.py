@@ -1,7 +1,7 @@
 from typing import Dict, List, Any, Optional
 import asyncio
-from datetime import datetime
 from loguru import logger
+from met.metadatos.marca_tiempo import ahora_iso
 
 class NucleoSAAM:
     """
@@ -17,6 +17,13 @@ class NucleoSAAM:
         self.config = configuracion
         self.sesiones_activas: Dict[str, Dict] = {}
         
+        # Referencias fuertes a las tareas de aprendizaje en segundo plano
+        # (el loop solo guarda referencias débiles) y límite de concurrencia
+        self._tareas_aprendizaje: set = set()
+        self._limite_aprendizaje = asyncio.Semaphore(
+            configuracion.get('max_aprendizaje_concurrente', 4)
+        )
+        
         logger.info("Núcleo SAAM inicializado con todos los módulos integrados")
     
     async def procesar_objetivo(self, objetivo: str, contexto_usuario: Dict = None, 
@@ -49,14 +56,16 @@ class NucleoSAAM:
             
             # FASE 4: APRENDIZAJE (MAO + SM3 - Asíncrono)
             logger.info(f"[Session {session_id}] Iniciando aprendizaje asíncrono")
-            asyncio.create_task(self._fase_aprendizaje(episodio_id))
+            tarea_aprendizaje = asyncio.create_task(self._fase_aprendizaje(episodio_id))
+            self._tareas_aprendizaje.add(tarea_aprendizaje)
+            tarea_aprendizaje.add_done_callback(self._tareas_aprendizaje.discard)
             
             return {
                 'session_id': session_id,
                 'estado': 'completado',
                 'resultados': resultados,
                 'episodio_id': episodio_id,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': ahora_iso()
             }
             
         except Exception as e:
@@ -84,27 +93,75 @@ class NucleoSAAM:
         return plan
     
     async def _fase_ejecucion(self, plan: Dict, session_id: str) -> Dict[str, Any]:
-        """Ejecuta la fase de ejecución del ciclo PERA"""
-        resultados_tareas = []
+        """
+        Ejecuta la fase de ejecución del ciclo PERA.
         
-        for tarea in plan.get('tareas', []):
-            # Ejecutar tarea individual
-            resultado = await self.met.ejecutar_tarea(tarea, {
-                'session_id': session_id,
-                'contexto_plan': plan
-            })
+        Las tareas se lanzan por oleadas: cada oleada ejecuta de forma
+        concurrente todas las tareas cuyas 'dependencias' ya han terminado.
+        Un plan secuencial produce oleadas de una sola tarea. Los resultados
+        se devuelven en el orden del plan.
+        
+        Cada tarea recibe su propia copia del contexto de ejecución, de modo
+        que una herramienta que lo modifique no afecta a las tareas hermanas.
+        Si una tarea de la oleada lanza una excepción, las demás se cancelan
+        y se esperan antes de propagarla.
+        """
+        tareas = plan.get('tareas', [])
+        contexto_ejecucion = {
+            'session_id': session_id,
+            'contexto_plan': plan
+        }
+        ids_plan = {tarea['id'] for tarea in tareas}
+        resultados_tareas: List[Optional[Dict]] = [None] * len(tareas)
+        completadas = set()
+        pendientes = list(range(len(tareas)))
+        
+        async def ejecutar(indice: int) -> Dict[str, Any]:
+            tarea = tareas[indice]
+            # Ejecutar tarea individual con su propia copia del contexto
+            resultado = await self.met.ejecutar_tarea(tarea, dict(contexto_ejecucion))
             
             # Guardar resultado en memoria de trabajo
-            resultados_tareas.append(resultado)
+            resultados_tareas[indice] = resultado
             await self.sm3.guardar_contexto(
                 session_id, 
                 f"resultado_{tarea['id']}", 
                 resultado
             )
+            return resultado
+        
+        while pendientes:
+            # Las dependencias ajenas al plan no bloquean
+            listas = [
+                i for i in pendientes
+                if all(
+                    dep in completadas or dep not in ids_plan
+                    for dep in tareas[i].get('dependencias') or ()
+                )
+            ]
+            if not listas:
+                raise Exception(f"Dependencias cíclicas en el plan: {[tareas[i]['id'] for i in pendientes]}")
+            
+            oleada = [asyncio.ensure_future(ejecutar(i)) for i in listas]
+            try:
+                await asyncio.gather(*oleada)
+            except BaseException:
+                # gather no cancela las hermanas: se cancelan y se recogen
+                # para no dejar tareas huérfanas ni excepciones sin recuperar
+                for tarea_oleada in oleada:
+                    tarea_oleada.cancel()
+                await asyncio.gather(*oleada, return_exceptions=True)
+                raise
+            
+            # Manejar errores críticos antes de lanzar la siguiente oleada
+            for i in listas:
+                tarea = tareas[i]
+                if not resultados_tareas[i].get('exito', False) and tarea.get('critica', False):
+                    raise Exception(f"Tarea crítica fallida: {tarea['id']}")
+                completadas.add(tarea['id'])
             
-            # Manejar errores críticos
-            if not resultado.get('exito', False) and tarea.get('critica', False):
-                raise Exception(f"Tarea crítica fallida: {tarea['id']}")
+            listas_set = set(listas)
+            pendientes = [i for i in pendientes if i not in listas_set]
         
         return resultados_tareas
     
@@ -122,7 +179,7 @@ class NucleoSAAM:
             'contexto_ejecucion': contexto_completo,
             'metricas': self._calcular_metricas_episodio(resultados),
             'session_id': session_id,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': ahora_iso()
         }
         
         # Guardar en memoria episódica
@@ -136,17 +193,23 @@ class NucleoSAAM:
     async def _fase_aprendizaje(self, episodio_id: str):
         """Ejecuta la fase de aprendizaje del ciclo PERA (asíncrono)"""
         try:
-            # Obtener episodio completo
-            episodio = await self.sm3.obtener_episodio(episodio_id)
-            
-            # Analizar para aprendizaje
-            insights = await self.mao.analizar_episodio(episodio)
-            
-            # Aplicar optimizaciones si las hay
-            if insights.get('optimizaciones'):
-                await self.mao.aplicar_optimizaciones(insights['optimizaciones'])
+            async with self._limite_aprendizaje:
+                # Obtener episodio completo
+                episodio = await self.sm3.obtener_episodio(episodio_id)
+                
+                # Analizar para aprendizaje
+                insights = await self.mao.analizar_episodio(episodio)
+                
+                # Aplicar optimizaciones si las hay
+                if insights.get('optimizaciones'):
+                    await self.mao.aplicar_optimizaciones(insights['optimizaciones'])
             
             logger.info(f"Análisis de aprendizaje completado para episodio {episodio_id}")
             
         except Exception as e:
-            logger.error(f"Error en fase de aprendizaje para episodio {episodio_id}: {e}")
\ No newline at end of file
+            logger.error(f"Error en fase de aprendizaje para episodio {episodio_id}: {e}")
+    
+    async def esperar_aprendizaje(self):
+        """Espera a que terminen las tareas de aprendizaje en curso"""
+        if self._tareas_aprendizaje:
+            await asyncio.gather(*self._tareas_aprendizaje, return_exceptions=True)
\ No newline at end of file
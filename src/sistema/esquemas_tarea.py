@@ -0,0 +1,45 @@
+from typing import Annotated, Dict, Any, Optional, Literal, Union
+from pydantic import BaseModel, ConfigDict, Discriminator, Tag, TypeAdapter
+
+class TareaEjecutable(BaseModel):
+    """Esquema mínimo de una tarea que el MET puede ejecutar"""
+    
+    # Las tareas llevan más campos (id, descripcion, dependencias...) que
+    # aquí no se validan
+    model_config = ConfigDict(extra='allow')
+    
+    tipo: str
+    herramienta: str
+    parametros: Dict[str, Any]
+    # None (o ausente): el MET usa timeout_default y max_reintentos de su configuración
+    timeout: Optional[float] = None
+    max_reintentos: Optional[int] = None
+
+class ParametrosBusquedaWeb(BaseModel):
+    """Parámetros obligatorios de una búsqueda web"""
+    
+    model_config = ConfigDict(extra='allow')
+    
+    query: Any
+
+class TareaBusquedaWeb(TareaEjecutable):
+    """Tarea de búsqueda web: requiere 'query' en los parámetros"""
+    
+    tipo: Literal['busqueda_web']
+    parametros: ParametrosBusquedaWeb
+
+def _discriminar_tarea(valor: Any) -> str:
+    """Elige el esquema por el tipo de tarea"""
+    tipo = valor.get('tipo') if isinstance(valor, dict) else getattr(valor, 'tipo', None)
+    return 'busqueda_web' if tipo == 'busqueda_web' else 'generica'
+
+# Validador compilado una vez en el núcleo de pydantic y reutilizado por tarea
+ADAPTADOR_TAREA: TypeAdapter = TypeAdapter(
+    Annotated[
+        Union[
+            Annotated[TareaBusquedaWeb, Tag('busqueda_web')],
+            Annotated[TareaEjecutable, Tag('generica')],
+        ],
+        Discriminator(_discriminar_tarea),
+    ]
+)
@@ -0,0 +1,43 @@
+from typing import Dict, Any, Hashable
+import threading
+from types import MappingProxyType
+
+_instancias: Dict[tuple, tuple] = {}
+_lock = threading.Lock()
+
+def congelar(valor: Any) -> Hashable:
+    """Convierte recursivamente una configuración en una clave hashable"""
+    if isinstance(valor, (dict, MappingProxyType)):
+        return tuple(sorted((clave, congelar(v)) for clave, v in valor.items()))
+    if isinstance(valor, (list, tuple)):
+        return tuple(congelar(v) for v in valor)
+    if isinstance(valor, set):
+        return frozenset(congelar(v) for v in valor)
+    return valor
+
+def instancia_compartida(clase, configuracion: Dict[str, Any], *dependencias):
+    """
+    Devuelve una única instancia de un colaborador sin estado por sesión.
+    
+    Las fábricas crean un MCP o MAO por sesión; los colaboradores que solo
+    dependen de la configuración (y de clientes compartidos como el LLM) se
+    construyen una vez por combinación de clase, dependencias y configuración.
+    La configuración se entrega como vista de solo lectura para que ninguna
+    sesión la altere para las demás.
+    
+    Args:
+        clase: Clase del colaborador
+        configuracion: Configuración del colaborador (último argumento del constructor)
+        *dependencias: Argumentos posicionales previos del constructor
+    
+    Returns:
+        Instancia compartida de ``clase``
+    """
+    clave = (clase, tuple(map(id, dependencias)), congelar(configuracion))
+    with _lock:
+        entrada = _instancias.get(clave)
+        if entrada is None:
+            instancia = clase(*dependencias, MappingProxyType(configuracion))
+            # Las dependencias se conservan para que sus id no se reutilicen
+            entrada = _instancias[clave] = (instancia, dependencias)
+    return entrada[0]
@@ -4,6 +4,7 @@ from ..aprendizaje.analisis_rendimiento import AnalizadorRendimiento
 from ..aprendizaje.deteccion_patrones import DetectorPatrones
 from ..aprendizaje.gestor_optimizaciones import GestorOptimizaciones
 from ..aprendizaje.monitor_impacto import MonitorImpactoOptimizaciones
+from .instancias_compartidas import instancia_compartida
 from loguru import logger
 
 class MAOFactory:
@@ -13,12 +14,14 @@ class MAOFactory:
     def crear_mao(sistema_memoria, configuracion: Dict[str, Any]) -> ModuloAprendizajeOptimizacion:
         """Crea una instancia completa del MAO con todas sus dependencias"""
         try:
-            # Configurar componentes de análisis
-            analizador_rendimiento = AnalizadorRendimiento(
+            # Configurar componentes de análisis (sin estado, compartidos entre instancias)
+            analizador_rendimiento = instancia_compartida(
+                AnalizadorRendimiento,
                 configuracion.get('analisis', {}).get('rendimiento_herramientas', {})
             )
             
-            detector_patrones = DetectorPatrones(
+            detector_patrones = instancia_compartida(
+                DetectorPatrones,
                 configuracion.get('analisis', {}).get('deteccion_patrones', {})
             )
             
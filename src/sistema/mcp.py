@@ -1,9 +1,23 @@
-from typing import Dict, List, Any, Optional, Tuple
-import json
+from typing import Dict, List, Any, Optional, Tuple, NamedTuple
+import asyncio
+import hashlib
 import re
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from enum import Enum
 from loguru import logger
+from .cache_planes import CacheSemanticaPlanes
+
+try:
+    from diskcache import Cache
+    DISKCACHE_DISPONIBLE = True
+except ImportError:
+    DISKCACHE_DISPONIBLE = False
+    logger.debug("diskcache no disponible, la caché de planes no persistirá entre reinicios")
 
 class EstadoPlanificacion(Enum):
     """Estados posibles durante el proceso de planificación"""
@@ -16,18 +30,72 @@ class EstadoPlanificacion(Enum):
     COMPLETADO = "completado"
     ERROR = "error"
 
+# Palabras clave por intención, en orden de prioridad. La búsqueda de
+# subcadenas con ``in`` es más rápida que una alternancia de regex con
+# lookaheads, que recorre la cadena una vez por intención
+_INTENCIONES: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ('buscar', ('encontrar', 'buscar', 'localizar', 'obtener información')),
+    ('crear', ('crear', 'generar', 'escribir', 'producir')),
+    ('analizar', ('analizar', 'evaluar', 'estudiar', 'examinar')),
+    ('resumir', ('resumir', 'resumen', 'sintetizar'))
+)
+_RE_ESPACIOS = re.compile(r'\s+')
+
+class _Precarga(NamedTuple):
+    """Precarga especulativa en curso y su señal de cancelación cooperativa"""
+    futuro: Future
+    cancelada: threading.Event
+    
+    def cancelar(self):
+        # Future.cancel() no detiene un hilo ya en marcha: la señal hace que
+        # la precarga deje de preparar herramientas en la siguiente iteración
+        self.cancelada.set()
+        self.futuro.cancel()
+
 class ModuloComprensionPlanificacion:
     """Módulo principal de Comprensión y Planificación de SAAM"""
     
-    def __init__(self, cliente_llm, sistema_memoria, configuracion: Dict[str, Any]):
+    def __init__(self, cliente_llm, sistema_memoria, configuracion: Dict[str, Any],
+                 modelo_embedding=None, precargador_herramientas=None):
         self.llm = cliente_llm
         self.memoria = sistema_memoria
         self.config = configuracion
         self.estado_actual = EstadoPlanificacion.INICIO
         self.max_intentos_replanificacion = configuracion.get('max_intentos_replanificacion', 3)
         
-        # Cache de planes recientes para optimización de rendimiento
-        self.cache_planes = {}
+        # Cache de planes recientes para optimización de rendimiento: semántica
+        # si hay modelo de embedding, por objetivo exacto en caso contrario
+        config_cache = configuracion.get('cache', {})
+        self.modelo_embedding = modelo_embedding
+        self.cache_semantica = None
+        if modelo_embedding is not None:
+            self.cache_semantica = CacheSemanticaPlanes(
+                capacidad=config_cache.get('tamaño_maximo', 1000),
+                umbral_similitud=config_cache.get('umbral_similitud', 0.92),
+                ttl=config_cache.get('tiempo_vida', 3600)
+            )
+        # LRU con TTL: acotada en tamaño y alineada con la expiración de sesión
+        self.tamaño_cache_planes = config_cache.get('tamaño_maximo', 1000)
+        self.ttl_cache_planes = config_cache.get('tiempo_vida', 3600)
+        self.cache_planes: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock_cache = threading.Lock()
+        
+        # Segundo nivel en disco: sobrevive a reinicios y se comparte entre procesos
+        self.cache_disco = None
+        self.ttl_cache_disco = config_cache.get('tiempo_vida_disco', 86400)
+        directorio_disco = config_cache.get('directorio_disco')
+        if directorio_disco and DISKCACHE_DISPONIBLE:
+            self.cache_disco = Cache(directorio_disco,
+                                     size_limit=config_cache.get('tamaño_disco', 2 * 1024 ** 3))
+        
+        # Predicción de herramientas por intención para precargarlas mientras
+        # el LLM genera; se aprende de los planes ya completados. Cada
+        # intención conserva como máximo max_secuencias_por_intencion secuencias
+        self.precargador_herramientas = precargador_herramientas
+        self.max_secuencias_por_intencion = configuracion.get('max_secuencias_por_intencion', 32)
+        self._herramientas_por_intencion: Dict[str, Counter] = defaultdict(Counter)
+        self._pool_precarga: Optional[ThreadPoolExecutor] = None
+        self.estadisticas_especulacion = {'aciertos': 0, 'fallos': 0}
         logger.info("Módulo de Comprensión y Planificación inicializado")
     
     def generar_plan(self, objetivo_usuario: str, contexto: Dict[str, Any] = None, 
@@ -43,6 +111,7 @@ class ModuloComprensionPlanificacion:
         Returns:
             Dict: Plan estructurado con tareas y metadatos
         """
+        precarga = None
         try:
             self.estado_actual = EstadoPlanificacion.INICIO
             logger.info(f"Iniciando planificación para: {objetivo_usuario[:100]}...")
@@ -50,6 +119,10 @@ class ModuloComprensionPlanificacion:
             # 1. Preprocesamiento y normalización del objetivo
             objetivo_normalizado = self._preprocesar_objetivo(objetivo_usuario)
             
+            # Precarga de las herramientas previstas mientras se planifica
+            intenciones = [self._detectar_intencion(objetivo_normalizado)]
+            predicciones, precarga = self._lanzar_precarga(intenciones)
+            
             # 2. Consultar base de conocimiento para planes similares
             self.estado_actual = EstadoPlanificacion.CONSULTA_KB
             planes_similares = self._consultar_planes_similares(objetivo_normalizado)
@@ -79,6 +152,7 @@ class ModuloComprensionPlanificacion:
             
             self.estado_actual = EstadoPlanificacion.OPTIMIZACION
             plan_optimizado = self._optimizar_plan(plan_estructurado)
+            acierto = self._evaluar_prediccion(intenciones, predicciones, [plan_optimizado], precarga)[0]
             
             # 5. Registrar en memoria de trabajo
             if session_id:
@@ -91,71 +165,332 @@ class ModuloComprensionPlanificacion:
             self.estado_actual = EstadoPlanificacion.COMPLETADO
             logger.success(f"Plan generado exitosamente ({origen_plan})")
             
-            return {
-                "plan": plan_optimizado,
-                "metadatos": {
-                    "origen": origen_plan,
-                    "estado": self.estado_actual.value,
-                    "timestamp": datetime.now().isoformat(),
-                    "objetivo_original": objetivo_usuario,
-                    "objetivo_normalizado": objetivo_normalizado
-                }
+            metadatos = {
+                "origen": origen_plan,
+                "estado": self.estado_actual.value,
+                "timestamp": datetime.now().isoformat(),
+                "objetivo_original": objetivo_usuario,
+                "objetivo_normalizado": objetivo_normalizado
             }
+            if acierto is not None:
+                metadatos["prediccion_acertada"] = acierto
+            return {"plan": plan_optimizado, "metadatos": metadatos}
             
         except Exception as e:
+            if precarga is not None:
+                precarga.cancelar()
             self.estado_actual = EstadoPlanificacion.ERROR
             logger.error(f"Error en generación de plan: {e}")
             raise
     
+    async def generar_planes_batch(self, objetivos: List[str],
+                                   contexto: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """
+        Genera planes para varios objetivos a la vez.
+        
+        Consulta la caché semántica con una sola búsqueda para todos los
+        objetivos y agrupa las llamadas al LLM (adaptaciones, generaciones y
+        replanificaciones) en lotes concurrentes, de modo que N objetivos
+        cuestan aproximadamente una ronda de latencia del LLM en lugar de N.
+        
+        Args:
+            objetivos: Objetivos en lenguaje natural
+            contexto: Información contextual común a todos los objetivos
+        
+        Returns:
+            List[Dict]: Resultado por objetivo, en el mismo orden, con la misma
+                forma que ``generar_plan``; los fallidos llevan ``plan`` None
+                y el error en los metadatos
+        """
+        logger.info(f"Iniciando planificación por lotes de {len(objetivos)} objetivos")
+        normalizados = [self._preprocesar_objetivo(objetivo) for objetivo in objetivos]
+        # Embeddings y consulta a ChromaDB son bloqueantes: fuera del bucle de eventos
+        similares = await asyncio.to_thread(self._consultar_planes_similares_lote, normalizados)
+        
+        intenciones = [self._detectar_intencion(objetivo) for objetivo in normalizados]
+        predicciones, precarga = self._lanzar_precarga(intenciones)
+        
+        indices_adaptar = [i for i, planes in enumerate(similares) if planes]
+        indices_generar = [i for i, planes in enumerate(similares) if not planes]
+        adaptados, generados = await asyncio.gather(
+            self.adaptador_planes.adaptar_planes_lote(
+                [(similares[i][0], normalizados[i]) for i in indices_adaptar], contexto
+            ),
+            self.generador_planes.generar_planes_lote(
+                [normalizados[i] for i in indices_generar], contexto
+            )
+        )
+        
+        planes: List[Any] = [None] * len(objetivos)
+        origenes = ["adaptado"] * len(objetivos)
+        for i, plan in zip(indices_adaptar, adaptados):
+            planes[i] = plan
+        for i, plan in zip(indices_generar, generados):
+            planes[i] = plan
+            origenes[i] = "nuevo"
+        
+        # Una única ronda de replanificación para los planes no válidos
+        indices_planes = [
+            None if isinstance(plan, Exception) else self.validador_planes.indexar_plan(plan)
+            for plan in planes
+        ]
+        validos = [i for i, plan in enumerate(planes) if not isinstance(plan, Exception)]
+        veredictos = await self.validador_planes.validar_planes_lote(
+            [planes[i] for i in validos], [indices_planes[i] for i in validos]
+        )
+        indices_replanificar = sorted(
+            {i for i, plan in enumerate(planes) if isinstance(plan, Exception)}
+            | {i for i, (valido, _) in zip(validos, veredictos) if not valido}
+        )
+        if indices_replanificar:
+            logger.warning(f"{len(indices_replanificar)} planes no válidos, replanificando")
+            replanificados = await self.generador_planes.generar_planes_lote(
+                [normalizados[i] for i in indices_replanificar], contexto
+            )
+            for i, plan in zip(indices_replanificar, replanificados):
+                planes[i] = plan
+                origenes[i] = "nuevo"
+                indices_planes[i] = None
+        
+        aciertos = self._evaluar_prediccion(intenciones, predicciones, planes, precarga)
+        
+        resultados = []
+        for i, plan in enumerate(planes):
+            metadatos = {
+                "origen": origenes[i],
+                "timestamp": datetime.now().isoformat(),
+                "objetivo_original": objetivos[i],
+                "objetivo_normalizado": normalizados[i]
+            }
+            if isinstance(plan, Exception):
+                metadatos.update(estado=EstadoPlanificacion.ERROR.value, error=str(plan))
+                resultados.append({"plan": None, "metadatos": metadatos})
+                continue
+            
+            metadatos["estado"] = EstadoPlanificacion.COMPLETADO.value
+            if aciertos[i] is not None:
+                metadatos["prediccion_acertada"] = aciertos[i]
+            resultados.append({
+                "plan": self.validador_planes.optimizar_plan(plan, indices_planes[i]),
+                "metadatos": metadatos
+            })
+        
+        logger.success(f"Planificación por lotes completada ({len(resultados)} objetivos)")
+        return resultados
+    
     def _preprocesar_objetivo(self, objetivo: str) -> str:
         """Normaliza y preprocesa el objetivo del usuario"""
-        objetivo_limpio = re.sub(r'\s+', ' ', objetivo.strip()).lower()
+        objetivo_limpio = _RE_ESPACIOS.sub(' ', objetivo.strip()).lower()
         return self._enriquecer_con_intencion(objetivo_limpio)
     
     def _enriquecer_con_intencion(self, objetivo: str) -> str:
         """Enriquece el objetivo con información de intención detectada"""
-        intenciones = {
-            'buscar': ['encontrar', 'buscar', 'localizar', 'obtener información'],
-            'crear': ['crear', 'generar', 'escribir', 'producir'],
-            'analizar': ['analizar', 'evaluar', 'estudiar', 'examinar'],
-            'resumir': ['resumir', 'resumen', 'sintetizar']
-        }
-        
-        for intencion, palabras in intenciones.items():
-            if any(palabra in objetivo for palabra in palabras):
-                return f"{intencion} {objetivo}"
+        intencion = self._detectar_intencion(objetivo)
+        if intencion:
+            return f"{intencion} {objetivo}"
         
         return objetivo
     
-    def _consultar_planes_similares(self, objetivo: str, limite: int = 3) -> List[Dict]:
+    @staticmethod
+    def _detectar_intencion(objetivo: str) -> Optional[str]:
+        """Intención de mayor prioridad presente en el objetivo, si la hay"""
+        for intencion, palabras in _INTENCIONES:
+            if any(palabra in objetivo for palabra in palabras):
+                return intencion
+        return None
+    
+    def _lanzar_precarga(self, intenciones: List[Optional[str]]
+                         ) -> Tuple[List[Optional[Tuple[str, ...]]], Optional[_Precarga]]:
+        """
+        Predice las herramientas de cada plan por su intención y lanza su
+        precarga en segundo plano mientras el LLM genera los planes.
+        
+        Args:
+            intenciones: Intención detectada por objetivo
+        
+        Returns:
+            Tuple: Secuencia de herramientas predicha por objetivo (o None) y
+                la precarga, si se ha lanzado
+        """
+        predicciones = []
+        for intencion in intenciones:
+            frecuentes = self._herramientas_por_intencion.get(intencion)
+            predicciones.append(frecuentes.most_common(1)[0][0] if frecuentes else None)
+        
+        herramientas = {h for prediccion in predicciones if prediccion for h in prediccion}
+        if self.precargador_herramientas is None or not herramientas:
+            return predicciones, None
+        
+        # Un único hilo propio: sirve igual a generar_plan (síncrono) y a
+        # generar_planes_batch, y las precargas no compiten por el ejecutor
+        # por defecto del bucle
+        if self._pool_precarga is None:
+            self._pool_precarga = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mcp-precarga")
+            weakref.finalize(self, self._pool_precarga.shutdown, wait=False, cancel_futures=True)
+        cancelada = threading.Event()
+        futuro = self._pool_precarga.submit(self._precargar, sorted(herramientas), cancelada)
+        futuro.add_done_callback(self._registrar_fin_precarga)
+        return predicciones, _Precarga(futuro, cancelada)
+    
+    def _precargar(self, herramientas: List[str], cancelada: threading.Event):
+        """Prepara las herramientas una a una hasta terminar o hasta que se cancele"""
+        for herramienta in herramientas:
+            if cancelada.is_set():
+                return
+            self.precargador_herramientas(herramienta)
+    
+    @staticmethod
+    def _registrar_fin_precarga(futuro: Future):
+        """Registra el fallo de una precarga especulativa sin propagarlo"""
+        if not futuro.cancelled() and futuro.exception() is not None:
+            logger.debug(f"Precarga especulativa fallida: {futuro.exception()}")
+    
+    def _evaluar_prediccion(self, intenciones: List[Optional[str]],
+                            predicciones: List[Optional[Tuple[str, ...]]],
+                            planes: List[Any], precarga: Optional[_Precarga]) -> List[Optional[bool]]:
+        """
+        Compara la predicción con la primera herramienta de cada plan real,
+        actualiza las estadísticas y aprende la secuencia de herramientas.
+        
+        Returns:
+            List[Optional[bool]]: Acierto por objetivo, None si no hubo predicción
+        """
+        aciertos: List[Optional[bool]] = []
+        for intencion, prediccion, plan in zip(intenciones, predicciones, planes):
+            if isinstance(plan, Exception) or not plan.get('tareas'):
+                aciertos.append(None)
+                continue
+            
+            secuencia = tuple(t.get('herramienta') or '' for t in plan['tareas'])
+            if intencion:
+                self._aprender_secuencia(intencion, secuencia)
+            if prediccion is None:
+                aciertos.append(None)
+                continue
+            
+            acierto = prediccion[0] == secuencia[0]
+            self.estadisticas_especulacion['aciertos' if acierto else 'fallos'] += 1
+            aciertos.append(acierto)
+        
+        if precarga is not None and not precarga.futuro.done() and not any(aciertos):
+            # Ninguna predicción acertó: la precarga pendiente se descarta
+            precarga.cancelar()
+        return aciertos
+    
+    def _aprender_secuencia(self, intencion: str, secuencia: Tuple[str, ...]):
+        """Cuenta la secuencia de la intención descartando la menos frecuente al superar el límite"""
+        frecuentes = self._herramientas_por_intencion[intencion]
+        frecuentes[secuencia] += 1
+        if len(frecuentes) > self.max_secuencias_por_intencion:
+            menos_frecuente = min((s for s in frecuentes if s != secuencia), key=frecuentes.__getitem__)
+            del frecuentes[menos_frecuente]
+    
+    def _consultar_planes_similares(self, objetivo: str, limite: int = 3,
+                                    embedding: Any = None) -> List[Dict]:
         """Consulta la base de conocimiento para planes similares"""
         try:
-            cache_key = f"plan_query_{hash(objetivo) % 1000}"
-            if cache_key in self.cache_planes:
-                return self.cache_planes[cache_key]
-            
-            resultados = self.memoria.buscar_habilidades(
-                objetivo, 
-                filtros={"tipo": "plan"},
-                limite=limite
-            )
+            if self.cache_semantica is not None:
+                if embedding is None:
+                    embedding = self.modelo_embedding.encode(objetivo)
+                    planes = self.cache_semantica.buscar(embedding)
+                    if planes is not None:
+                        return planes
+            else:
+                planes = self._obtener_planes_cacheados(objetivo)
+                if planes is not None:
+                    return planes
             
-            planes = []
-            for resultado in resultados:
-                try:
-                    plan_data = resultado['habilidad']
-                    if self._es_plan_valido(plan_data):
-                        planes.append(plan_data)
-                except (KeyError, TypeError):
-                    continue
+            planes = self._leer_cache_disco(objetivo)
+            if planes is None:
+                resultados = self.memoria.buscar_habilidades(
+                    objetivo, 
+                    filtros={"tipo": "plan"},
+                    limite=limite
+                )
+                
+                planes = []
+                for resultado in resultados:
+                    try:
+                        plan_data = resultado['habilidad']
+                        if self._es_plan_valido(plan_data):
+                            planes.append(plan_data)
+                    except (KeyError, TypeError):
+                        continue
+                self._escribir_cache_disco(objetivo, planes)
             
-            self.cache_planes[cache_key] = planes
+            # Sin planes no se cachea: uno añadido después quedaría oculto
+            if not planes:
+                return planes
+            if embedding is not None:
+                self.cache_semantica.guardar(embedding, planes)
+            else:
+                self._guardar_planes_cacheados(objetivo, planes)
             return planes
             
         except Exception as e:
             logger.warning(f"Error en consulta de planes similares: {e}")
             return []
     
+    @staticmethod
+    def _clave_cache_disco(objetivo: str) -> bytes:
+        """Clave estable entre procesos: blake2b del objetivo normalizado"""
+        return hashlib.blake2b(objetivo.encode('utf-8'), digest_size=16).digest()
+    
+    def _leer_cache_disco(self, objetivo: str) -> Optional[List[Dict]]:
+        """Planes persistidos para el objetivo, o None si no hay caché en disco o no están"""
+        if self.cache_disco is None:
+            return None
+        return self.cache_disco.get(self._clave_cache_disco(objetivo))
+    
+    def _escribir_cache_disco(self, objetivo: str, planes: List[Dict]):
+        """
+        Persiste los planes del objetivo con la expiración configurada.
+        
+        Los resultados vacíos no se persisten: un plan añadido después a la
+        base de conocimiento quedaría oculto durante todo el TTL de disco.
+        """
+        if self.cache_disco is not None and planes:
+            self.cache_disco.set(self._clave_cache_disco(objetivo), planes, expire=self.ttl_cache_disco)
+    
+    def _consultar_planes_similares_lote(self, objetivos: List[str], limite: int = 3) -> List[List[Dict]]:
+        """Consulta planes similares para varios objetivos con una sola búsqueda en caché"""
+        if self.cache_semantica is None:
+            return [self._consultar_planes_similares(objetivo, limite) for objetivo in objetivos]
+        
+        try:
+            embeddings = self.modelo_embedding.encode(objetivos)
+            cacheados = self.cache_semantica.buscar_lote(embeddings)
+        except Exception as e:
+            logger.warning(f"Error en consulta de planes similares: {e}")
+            return [[] for _ in objetivos]
+        
+        # Los fallos de caché reutilizan el embedding ya calculado
+        return [
+            planes if planes is not None
+            else self._consultar_planes_similares(objetivo, limite, embedding)
+            for objetivo, embedding, planes in zip(objetivos, embeddings, cacheados)
+        ]
+    
+    def _obtener_planes_cacheados(self, objetivo: str) -> Optional[List[Dict]]:
+        """Devuelve los planes cacheados para el objetivo si no han expirado"""
+        with self._lock_cache:
+            entrada = self.cache_planes.get(objetivo)
+            if entrada is None:
+                return None
+            if time.monotonic() - entrada[0] > self.ttl_cache_planes:
+                del self.cache_planes[objetivo]
+                return None
+            self.cache_planes.move_to_end(objetivo)
+            return entrada[1]
+    
+    def _guardar_planes_cacheados(self, objetivo: str, planes: List[Dict]):
+        """Cachea los planes del objetivo expulsando los menos usados recientemente"""
+        with self._lock_cache:
+            self.cache_planes[objetivo] = (time.monotonic(), planes)
+            self.cache_planes.move_to_end(objetivo)
+            while len(self.cache_planes) > self.tamaño_cache_planes:
+                self.cache_planes.popitem(last=False)
+    
     def _es_plan_valido(self, plan: Dict) -> bool:
         """Valida la estructura básica de un plan"""
         required_keys = {'tareas', 'objetivo', 'tipo'}
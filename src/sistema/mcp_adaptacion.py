@@ -1,32 +1,43 @@
-from typing import Dict, List, Any
-import json
+from typing import Dict, List, Any, Optional, Tuple
 import re
+import orjson
 from datetime import datetime
+from types import MappingProxyType
 from loguru import logger
+from .mcp_generacion import (
+    clave_cache_prompt, dividir_plantilla, extraer_json_flujo,
+    extraer_json_respuesta, generar_lote_llm, internar_tarea
+)
+
+# Estructura de salida esperada, serializada una sola vez
+_ESTRUCTURA_JSON = orjson.dumps({
+    "objetivo": "string",
+    "tareas": [
+        {
+            "id": "string",
+            "descripcion": "string",
+            "tipo": "string",
+            "herramienta": "string",
+            "parametros": {},
+            "dependencias": ["string"],
+            "estimacion_duracion": 60
+        }
+    ],
+    "metadata": {
+        "origen": "adaptado",
+        "plan_base": "string",
+        "adaptaciones": ["string"]
+    }
+}, option=orjson.OPT_INDENT_2).decode()
 
 class AdaptadorPlanes:
     """Clase especializada en adaptar planes existentes a nuevos objetivos"""
     
-    def __init__(self, cliente_llm, configuracion: Dict[str, Any]):
-        self.llm = cliente_llm
-        self.config = configuracion
-        self.prompt_templates = self._cargar_templates()
-    
-    def _cargar_templates(self) -> Dict[str, str]:
-        """Carga las plantillas de prompts para adaptación de planes"""
-        return {
-            "adaptacion_plan": """
+    # Plantillas constantes, compartidas por todas las instancias
+    _TEMPLATES = MappingProxyType({
+        "adaptacion_plan": """
 Eres un experto en adaptar planes existentes a nuevos objetivos. 
-Tu tarea es modificar el plan existente para adecuarlo al nuevo objetivo.
-
-PLAN ORIGINAL:
-{plan_existente}
-
-NUEVO OBJETIVO:
-{nuevo_objetivo}
-
-CONTEXTO:
-{contexto}
+Tu tarea es modificar el plan existente indicado al final para adecuarlo al nuevo objetivo.
 
 INSTRUCCIONES:
 1. Mantén la estructura y mejores prácticas del plan original
@@ -37,64 +48,127 @@ INSTRUCCIONES:
 Formato de salida JSON (misma estructura que el plan original):
 {estructura_json}
 
+PLAN ORIGINAL:
+{plan_existente}
+
+NUEVO OBJETIVO:
+{nuevo_objetivo}
+
+CONTEXTO:
+{contexto}
+
 Responde ÚNICAMENTE con el JSON válido del plan adaptado.
 """
-        }
+    })
+    
+    _PREFIJO, _SUFIJO = dividir_plantilla(
+        _TEMPLATES["adaptacion_plan"], "PLAN ORIGINAL:", estructura_json=_ESTRUCTURA_JSON
+    )
+    _CLAVE_CACHE_PROMPT = clave_cache_prompt("mcp_adaptacion", _PREFIJO)
+    
+    def __init__(self, cliente_llm, configuracion: Dict[str, Any]):
+        self.llm = cliente_llm
+        self.config = configuracion
+        self.prompt_templates = self._cargar_templates()
+        self.parametros_llm = self._parametros_llm()
+    
+    def _cargar_templates(self) -> Dict[str, str]:
+        """Carga las plantillas de prompts para adaptación de planes"""
+        return self._TEMPLATES
+    
+    def _parametros_llm(self) -> Dict[str, Any]:
+        """Parámetros de generación, con la clave de caché de prompt si está activada"""
+        parametros = {'temperatura': 0.1, 'max_tokens': 2500}
+        if self.config.get('llm', {}).get('cache_prompt', False):
+            parametros['extra_body'] = {'prompt_cache_key': self._CLAVE_CACHE_PROMPT}
+        return parametros
     
     def adaptar_plan_existente(self, plan_existente: Dict, nuevo_objetivo: str, 
                               contexto: Dict = None) -> Dict[str, Any]:
         """Adapta un plan existente a un nuevo objetivo"""
         try:
-            prompt = self.prompt_templates["adaptacion_plan"].format(
-                plan_existente=json.dumps(plan_existente, ensure_ascii=False, indent=2),
-                nuevo_objetivo=nuevo_objetivo,
-                contexto=json.dumps(contexto or {}, ensure_ascii=False),
-                estructura_json=json.dumps({
-                    "objetivo": "string",
-                    "tareas": [
-                        {
-                            "id": "string",
-                            "descripcion": "string",
-                            "tipo": "string",
-                            "herramienta": "string",
-                            "parametros": {},
-                            "dependencias": ["string"],
-                            "estimacion_duracion": 60
-                        }
-                    ],
-                    "metadata": {
-                        "origen": "adaptado",
-                        "plan_base": "string",
-                        "adaptaciones": ["string"]
-                    }
-                }, indent=2)
-            )
-            
-            respuesta = self.llm.generar(
-                prompt,
-                temperatura=0.1,
-                max_tokens=2500
-            )
-            
-            plan_adaptado_json = self._extraer_json_respuesta(respuesta)
-            plan_validado = self._validar_plan_adaptado(plan_adaptado_json, plan_existente)
+            prompt = self._construir_prompt(plan_existente, nuevo_objetivo, contexto)
+            generar_stream = getattr(self.llm, 'generar_stream', None)
+            if generar_stream is not None:
+                # Se deja de leer en cuanto se cierra el JSON del plan
+                plan_json = extraer_json_flujo(
+                    generar_stream(prompt, **self.parametros_llm)
+                )
+                return self._completar_plan(plan_json, plan_existente)
             
-            if 'metadata' not in plan_validado:
-                plan_validado['metadata'] = {}
+            respuesta = self.llm.generar(prompt, **self.parametros_llm)
             
-            plan_validado['metadata'].update({
-                'origen': 'adaptado',
-                'plan_base': plan_existente.get('metadata', {}).get('origen', 'desconocido'),
-                'timestamp_adaptacion': datetime.now().isoformat(),
-                'modelo_adaptacion': self.llm.model_name
-            })
-            
-            return plan_validado
+            return self._procesar_respuesta(respuesta, plan_existente)
             
         except Exception as e:
             logger.error(f"Error adaptando plan existente: {e}")
             raise
     
+    async def adaptar_planes_lote(self, adaptaciones: List[Tuple[Dict, str]],
+                                  contexto: Optional[Dict] = None) -> List[Any]:
+        """
+        Adapta varios planes con peticiones LLM concurrentes.
+        
+        Args:
+            adaptaciones: Pares (plan existente, nuevo objetivo)
+            contexto: Contexto común a todas las adaptaciones
+        
+        Returns:
+            List[Any]: Plan adaptado o excepción por par, en el mismo orden
+        """
+        respuestas = await generar_lote_llm(
+            self.llm,
+            [self._construir_prompt(plan, objetivo, contexto) for plan, objetivo in adaptaciones],
+            self.config.get('llm', {}).get('max_concurrencia', 4),
+            **self.parametros_llm
+        )
+        
+        planes = []
+        for (plan_existente, _), respuesta in zip(adaptaciones, respuestas):
+            try:
+                if isinstance(respuesta, Exception):
+                    raise respuesta
+                planes.append(self._procesar_respuesta(respuesta, plan_existente))
+            except Exception as e:
+                logger.error(f"Error adaptando plan existente: {e}")
+                planes.append(e)
+        return planes
+    
+    def _construir_prompt(self, plan_existente: Dict, nuevo_objetivo: str,
+                          contexto: Optional[Dict]) -> str:
+        """Rellena la plantilla de adaptación para un plan y objetivo"""
+        return self._PREFIJO + self._SUFIJO.format(
+            plan_existente=orjson.dumps(
+                plan_existente, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+            ).decode(),
+            nuevo_objetivo=nuevo_objetivo,
+            contexto=orjson.dumps(contexto or {}, option=orjson.OPT_NON_STR_KEYS).decode()
+        )
+    
+    def _procesar_respuesta(self, respuesta: str, plan_existente: Dict) -> Dict[str, Any]:
+        """Convierte la respuesta del LLM en el plan adaptado con metadatos"""
+        return self._completar_plan(self._extraer_json_respuesta(respuesta), plan_existente)
+    
+    def _completar_plan(self, plan_adaptado_json: Dict, plan_existente: Dict) -> Dict[str, Any]:
+        """Valida el plan adaptado decodificado y añade sus metadatos"""
+        plan_validado = self._validar_plan_adaptado(plan_adaptado_json, plan_existente)
+        
+        if 'metadata' not in plan_validado:
+            plan_validado['metadata'] = {}
+        
+        plan_validado['metadata'].update({
+            'origen': 'adaptado',
+            'plan_base': plan_existente.get('metadata', {}).get('origen', 'desconocido'),
+            'timestamp_adaptacion': datetime.now().isoformat(),
+            'modelo_adaptacion': self.llm.model_name
+        })
+        
+        return plan_validado
+    
+    def _extraer_json_respuesta(self, respuesta: str) -> Dict:
+        """Extrae el JSON de la respuesta del LLM"""
+        return extraer_json_respuesta(respuesta)
+    
     def _validar_plan_adaptado(self, plan_adaptado: Dict, plan_original: Dict) -> Dict:
         """Valida que el plan adaptado mantenga la estructura del original"""
         if 'tareas' not in plan_adaptado:
@@ -106,4 +180,8 @@ Responde ÚNICAMENTE con el JSON válido del plan adaptado.
         if not estructura_original.issubset(estructura_adaptada):
             logger.warning("Plan adaptado no mantiene toda la estructura original")
         
+        for tarea in plan_adaptado['tareas']:
+            if isinstance(tarea, dict):
+                internar_tarea(tarea)
+        
         return plan_adaptado
\ No newline at end of file
@@ -3,23 +3,33 @@ from .mcp import ModuloComprensionPlanificacion
 from .mcp_generacion import GeneradorPlanes
 from .mcp_adaptacion import AdaptadorPlanes
 from .mcp_validacion import ValidadorOptimizadorPlanes
+from .instancias_compartidas import instancia_compartida
 from loguru import logger
 
 class MCPFactory:
     """Factory para la creación y configuración del Módulo de Comprensión y Planificación"""
     
     @staticmethod
-    def crear_mcp(cliente_llm, sistema_memoria, configuracion: Dict[str, Any]) -> ModuloComprensionPlanificacion:
+    def crear_mcp(cliente_llm, sistema_memoria, configuracion: Dict[str, Any],
+                  modelo_embedding=None, precargador_herramientas=None) -> ModuloComprensionPlanificacion:
         """Crea una instancia completa del MCP con todas sus dependencias"""
         try:
-            generador = GeneradorPlanes(cliente_llm, configuracion.get('mcp', {}))
-            adaptador = AdaptadorPlanes(cliente_llm, configuracion.get('mcp', {}))
-            validador = ValidadorOptimizadorPlanes(configuracion.get('mcp', {}))
+            # Sin modelo explícito se reutiliza el de la base de conocimiento,
+            # que habilita la caché semántica de planes
+            if modelo_embedding is None:
+                modelo_embedding = getattr(sistema_memoria, 'modelo_embedding', None)
+            
+            # Colaboradores sin estado de sesión, compartidos entre instancias
+            generador = instancia_compartida(GeneradorPlanes, configuracion.get('mcp', {}), cliente_llm)
+            adaptador = instancia_compartida(AdaptadorPlanes, configuracion.get('mcp', {}), cliente_llm)
+            validador = instancia_compartida(ValidadorOptimizadorPlanes, configuracion.get('mcp', {}))
             
             mcp = ModuloComprensionPlanificacion(
                 cliente_llm=cliente_llm,
                 sistema_memoria=sistema_memoria,
-                configuracion=configuracion.get('mcp', {})
+                configuracion=configuracion.get('mcp', {}),
+                modelo_embedding=modelo_embedding,
+                precargador_herramientas=precargador_herramientas
             )
             
             mcp.generador_planes = generador
@@ -1,25 +1,165 @@
-from typing import Dict, List, Any
-import json
+from typing import Dict, Iterable, List, Any, Optional, Tuple
+import asyncio
+import hashlib
 import re
+import sys
+import orjson
 from datetime import datetime
+from types import MappingProxyType
 from loguru import logger
 
-class GeneradorPlanes:
-    """Clase especializada en la generación de nuevos planes desde cero"""
+# Bloque ```json ... ``` o, en su defecto, el primer objeto JSON de la respuesta
+_RE_JSON_BLOQUE = re.compile(r'```json\s*(\{.*?\})\s*```', re.DOTALL)
+_RE_JSON_SUELTO = re.compile(r'(\{.*\})', re.DOTALL)
+
+def extraer_json_respuesta(respuesta: str) -> Dict:
+    """Extrae el JSON de la respuesta del LLM"""
+    match = _RE_JSON_BLOQUE.search(respuesta) or _RE_JSON_SUELTO.search(respuesta)
+    if not match:
+        raise ValueError("No se encontró JSON válido en la respuesta")
     
-    def __init__(self, cliente_llm, configuracion: Dict[str, Any]):
-        self.llm = cliente_llm
-        self.config = configuracion
-        self.prompt_templates = self._cargar_templates()
+    return orjson.loads(match.group(1))
+
+# Campos de tarea con valores muy repetidos entre planes
+_CAMPOS_INTERNADOS = ('id', 'tipo', 'herramienta')
+
+def internar_tarea(tarea: Dict) -> Dict:
+    """
+    Interna los valores de texto repetidos de una tarea decodificada.
     
-    def _cargar_templates(self) -> Dict[str, str]:
-        """Carga las plantillas de prompts para generación de planes"""
-        return {
-            "planificacion_base": """
-Eres un planificador experto de tareas. Tu objetivo es descomponer el siguiente objetivo en una secuencia lógica de tareas ejecutables.
+    Tipos, herramientas e ids (también en las dependencias) se repiten en
+    todos los planes; internados, los conjuntos y diccionarios del índice de
+    validación y las búsquedas de herramientas comparan por identidad y cada
+    plan deja de tener su propia copia de esas cadenas. orjson ya comparte las
+    claves, así que solo hace falta con los valores.
+    
+    Args:
+        tarea: Tarea del plan, modificada en el sitio
+    
+    Returns:
+        Dict: La misma tarea
+    """
+    for campo in _CAMPOS_INTERNADOS:
+        valor = tarea.get(campo)
+        if type(valor) is str:
+            tarea[campo] = sys.intern(valor)
+    dependencias = tarea.get('dependencias')
+    if type(dependencias) is list:
+        tarea['dependencias'] = [
+            sys.intern(dep) if type(dep) is str else dep for dep in dependencias
+        ]
+    return tarea
 
-OBJETIVO: {objetivo}
-CONTEXTO: {contexto}
+def dividir_plantilla(plantilla: str, marcador: str, **fijos) -> Tuple[str, str]:
+    """
+    Separa una plantilla en su prefijo estático y el sufijo con los datos de
+    la petición, que empieza en ``marcador``.
+    
+    Las plantillas colocan instrucciones y formato antes de los datos para que
+    los proveedores con caché de prefijo reutilicen esa parte entre llamadas.
+    
+    Args:
+        plantilla: Plantilla completa con campos de ``str.format``
+        marcador: Texto donde empieza la parte variable
+        **fijos: Valores de los campos que aparecen en el prefijo
+    
+    Returns:
+        Tuple[str, str]: Prefijo ya formateado y sufijo aún por formatear
+    """
+    corte = plantilla.index(marcador)
+    return plantilla[:corte].format(**fijos), plantilla[corte:]
+
+def clave_cache_prompt(nombre: str, prefijo: str) -> str:
+    """Clave de caché de prompt del proveedor; cambia si cambia el prefijo"""
+    return f"{nombre}_{hashlib.blake2b(prefijo.encode('utf-8'), digest_size=6).hexdigest()}"
+
+def extraer_json_flujo(fragmentos: Iterable[str]) -> Dict:
+    """
+    Extrae el primer objeto JSON de una respuesta del LLM recibida por partes.
+    
+    Sigue la profundidad de llaves (ignorando las que aparecen dentro de
+    cadenas) y deja de consumir el flujo en cuanto se cierra el objeto de
+    nivel superior, de modo que el texto que el modelo genere después no se
+    espera. Si el flujo admite ``close``, se cierra para cancelar el resto.
+    
+    Args:
+        fragmentos: Iterable de fragmentos de texto de la respuesta
+    
+    Returns:
+        Dict: Objeto JSON decodificado
+    """
+    partes: List[str] = []
+    profundidad = 0
+    en_cadena = escapado = False
+    try:
+        for fragmento in fragmentos:
+            inicio = 0
+            if profundidad == 0:
+                inicio = fragmento.find('{')
+                if inicio < 0:
+                    continue
+            for i in range(inicio, len(fragmento)):
+                caracter = fragmento[i]
+                if en_cadena:
+                    if escapado:
+                        escapado = False
+                    elif caracter == '\\':
+                        escapado = True
+                    elif caracter == '"':
+                        en_cadena = False
+                elif caracter == '"':
+                    en_cadena = True
+                elif caracter == '{':
+                    profundidad += 1
+                elif caracter == '}':
+                    profundidad -= 1
+                    if profundidad == 0:
+                        partes.append(fragmento[inicio:i + 1])
+                        return orjson.loads(''.join(partes))
+            partes.append(fragmento[inicio:])
+    finally:
+        cerrar = getattr(fragmentos, 'close', None)
+        if cerrar is not None:
+            cerrar()
+    
+    raise ValueError("No se encontró JSON válido en la respuesta")
+
+async def generar_lote_llm(cliente_llm, prompts: List[str], limite_concurrencia: int = 4,
+                           **parametros) -> List[Any]:
+    """
+    Envía varios prompts al LLM de forma concurrente.
+    
+    Usa ``agenerar`` si el cliente lo ofrece; si no, ejecuta ``generar`` en
+    hilos. Un semáforo limita las peticiones simultáneas al proveedor.
+    
+    Args:
+        cliente_llm: Cliente LLM con ``generar`` (y opcionalmente ``agenerar``)
+        prompts: Prompts a enviar
+        limite_concurrencia: Máximo de peticiones en vuelo
+        **parametros: Parámetros de generación (temperatura, max_tokens...)
+    
+    Returns:
+        List[Any]: Respuesta o excepción por prompt, en el mismo orden
+    """
+    semaforo = asyncio.Semaphore(limite_concurrencia)
+    agenerar = getattr(cliente_llm, 'agenerar', None)
+    
+    async def _generar(prompt: str) -> str:
+        async with semaforo:
+            if agenerar is not None:
+                return await agenerar(prompt, **parametros)
+            return await asyncio.to_thread(cliente_llm.generar, prompt, **parametros)
+    
+    return await asyncio.gather(*(_generar(prompt) for prompt in prompts),
+                                return_exceptions=True)
+
+class GeneradorPlanes:
+    """Clase especializada en la generación de nuevos planes desde cero"""
+    
+    # Plantillas constantes, compartidas por todas las instancias
+    _TEMPLATES = MappingProxyType({
+        "planificacion_base": """
+Eres un planificador experto de tareas. Tu objetivo es descomponer el objetivo indicado al final en una secuencia lógica de tareas ejecutables.
 
 INSTRUCCIONES:
 1. Analiza el objetivo y descomponlo en tareas específicas y accionables
@@ -50,56 +190,110 @@ Formato de salida JSON:
   "restricciones": ["string"]
 }}
 
+OBJETIVO: {objetivo}
+CONTEXTO: {contexto}
+
 Responde ÚNICAMENTE con el JSON válido.
 """
-        }
+    })
+    
+    _PREFIJO, _SUFIJO = dividir_plantilla(_TEMPLATES["planificacion_base"], "OBJETIVO:")
+    _CLAVE_CACHE_PROMPT = clave_cache_prompt("mcp_planificacion", _PREFIJO)
+    
+    def __init__(self, cliente_llm, configuracion: Dict[str, Any]):
+        self.llm = cliente_llm
+        self.config = configuracion
+        self.prompt_templates = self._cargar_templates()
+        self.parametros_llm = self._parametros_llm()
+    
+    def _cargar_templates(self) -> Dict[str, str]:
+        """Carga las plantillas de prompts para generación de planes"""
+        return self._TEMPLATES
+    
+    def _parametros_llm(self) -> Dict[str, Any]:
+        """Parámetros de generación, con la clave de caché de prompt si está activada"""
+        parametros = {'temperatura': 0.1, 'max_tokens': 2000}
+        if self.config.get('llm', {}).get('cache_prompt', False):
+            parametros['extra_body'] = {'prompt_cache_key': self._CLAVE_CACHE_PROMPT}
+        return parametros
     
     def generar_nuevo_plan(self, objetivo: str, contexto: Dict = None) -> Dict[str, Any]:
         """Genera un nuevo plan desde cero usando el LLM"""
         try:
-            prompt = self.prompt_templates["planificacion_base"].format(
-                objetivo=objetivo,
-                contexto=json.dumps(contexto or {}, ensure_ascii=False)
-            )
-            
-            respuesta = self.llm.generar(
-                prompt,
-                temperatura=0.1,
-                max_tokens=2000
-            )
+            prompt = self._construir_prompt(objetivo, contexto)
+            generar_stream = getattr(self.llm, 'generar_stream', None)
+            if generar_stream is not None:
+                # Se deja de leer en cuanto se cierra el JSON del plan
+                plan_json = extraer_json_flujo(
+                    generar_stream(prompt, **self.parametros_llm)
+                )
+                return self._completar_plan(plan_json)
             
-            plan_json = self._extraer_json_respuesta(respuesta)
-            plan_validado = self._validar_estructura_plan(plan_json)
+            respuesta = self.llm.generar(prompt, **self.parametros_llm)
             
-            plan_validado['metadata'] = {
-                'origen': 'generado_nuevo',
-                'modelo_utilizado': self.llm.model_name,
-                'timestamp_generacion': datetime.now().isoformat(),
-                'version': '1.0'
-            }
-            
-            return plan_validado
+            return self._procesar_respuesta(respuesta)
             
         except Exception as e:
             logger.error(f"Error generando nuevo plan: {e}")
             raise
     
-    def _extraer_json_respuesta(self, respuesta: str) -> Dict:
-        """Extrae el JSON de la respuesta del LLM"""
-        json_pattern = r'```json\s*(\{.*?\})\s*```'
-        match = re.search(json_pattern, respuesta, re.DOTALL)
+    async def generar_planes_lote(self, objetivos: List[str],
+                                  contexto: Optional[Dict] = None) -> List[Any]:
+        """
+        Genera planes para varios objetivos con peticiones LLM concurrentes.
+        
+        Args:
+            objetivos: Objetivos normalizados
+            contexto: Contexto común a todos los objetivos
         
-        if match:
-            json_str = match.group(1)
-        else:
-            json_pattern = r'(\{.*\})'
-            match = re.search(json_pattern, respuesta, re.DOTALL)
-            if match:
-                json_str = match.group(1)
-            else:
-                raise ValueError("No se encontró JSON válido en la respuesta")
+        Returns:
+            List[Any]: Plan o excepción por objetivo, en el mismo orden
+        """
+        respuestas = await generar_lote_llm(
+            self.llm,
+            [self._construir_prompt(objetivo, contexto) for objetivo in objetivos],
+            self.config.get('llm', {}).get('max_concurrencia', 4),
+            **self.parametros_llm
+        )
         
-        return json.loads(json_str)
+        planes = []
+        for respuesta in respuestas:
+            try:
+                if isinstance(respuesta, Exception):
+                    raise respuesta
+                planes.append(self._procesar_respuesta(respuesta))
+            except Exception as e:
+                logger.error(f"Error generando nuevo plan: {e}")
+                planes.append(e)
+        return planes
+    
+    def _construir_prompt(self, objetivo: str, contexto: Optional[Dict]) -> str:
+        """Rellena la plantilla de planificación para un objetivo"""
+        return self._PREFIJO + self._SUFIJO.format(
+            objetivo=objetivo,
+            contexto=orjson.dumps(contexto or {}, option=orjson.OPT_NON_STR_KEYS).decode()
+        )
+    
+    def _procesar_respuesta(self, respuesta: str) -> Dict[str, Any]:
+        """Convierte la respuesta del LLM en un plan validado con metadatos"""
+        return self._completar_plan(self._extraer_json_respuesta(respuesta))
+    
+    def _completar_plan(self, plan_json: Dict) -> Dict[str, Any]:
+        """Valida la estructura del plan decodificado y añade sus metadatos"""
+        plan_validado = self._validar_estructura_plan(plan_json)
+        
+        plan_validado['metadata'] = {
+            'origen': 'generado_nuevo',
+            'modelo_utilizado': self.llm.model_name,
+            'timestamp_generacion': datetime.now().isoformat(),
+            'version': '1.0'
+        }
+        
+        return plan_validado
+    
+    def _extraer_json_respuesta(self, respuesta: str) -> Dict:
+        """Extrae el JSON de la respuesta del LLM"""
+        return extraer_json_respuesta(respuesta)
     
     def _validar_estructura_plan(self, plan: Dict) -> Dict:
         """Valida y completa la estructura del plan"""
@@ -113,5 +307,6 @@ Responde ÚNICAMENTE con el JSON válido.
             tarea.setdefault('dependencias', [])
             tarea.setdefault('parametros', {})
             tarea.setdefault('estimacion_duracion', 60)
+            internar_tarea(tarea)
         
         return plan
\ No newline at end of file
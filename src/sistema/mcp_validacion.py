@@ -1,13 +1,78 @@
-from typing import Dict, List, Any, Tuple
-import networkx as nx
+from typing import Dict, List, Any, Optional, Sequence, Set, Tuple
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+import numpy as np
 from loguru import logger
 
+try:
+    from numba import njit
+    NUMBA_DISPONIBLE = True
+except ImportError:
+    NUMBA_DISPONIBLE = False
+    logger.debug("numba no disponible, la detección de ciclos usará la versión en Python")
+
+# Por debajo de este número de tareas la conversión a CSR no compensa
+_MIN_TAREAS_NUMBA = 32
+
+if NUMBA_DISPONIBLE:
+    # nogil: varios planes grandes se validan en paralelo desde hilos
+    @njit(cache=True, nogil=True)
+    def _kahn_csr(grado_entrada, desplazamientos, destinos):
+        """
+        Ordenación de Kahn sobre un grafo en CSR.
+        
+        Deja en ``grado_entrada`` el grado pendiente de cada nodo y devuelve
+        el número de nodos procesados.
+        """
+        n = grado_entrada.shape[0]
+        cola = np.empty(n, dtype=np.int32)
+        fin = 0
+        for i in range(n):
+            if grado_entrada[i] == 0:
+                cola[fin] = i
+                fin += 1
+        inicio = 0
+        while inicio < fin:
+            actual = cola[inicio]
+            inicio += 1
+            for k in range(desplazamientos[actual], desplazamientos[actual + 1]):
+                sucesor = destinos[k]
+                grado_entrada[sucesor] -= 1
+                if grado_entrada[sucesor] == 0:
+                    cola[fin] = sucesor
+                    fin += 1
+        return fin
+
+@dataclass(slots=True)
+class IndicePlan:
+    """
+    Estructura de un plan construida en una sola pasada sobre sus tareas.
+    
+    Las reglas de validación y la optimización de secuencia la consultan en
+    lugar de recorrer ``plan['tareas']`` cada una por su cuenta.
+    """
+    num_tareas: int
+    grado_entrada: Dict[str, int]
+    sucesores: Dict[str, List[str]]
+    herramientas: Set[str]
+    num_dependencias: List[int]
+
 class ValidadorOptimizadorPlanes:
     """Clase para validar y optimizar planes generados"""
     
     def __init__(self, configuracion: Dict[str, Any]):
         self.config = configuracion
         self.reglas_validacion = self._cargar_reglas_validacion()
+        # Nombres y funciones resueltos una vez para el bucle de validación
+        self._nombres_reglas = tuple(regla['nombre'] for regla in self.reglas_validacion)
+        self._funciones_reglas = tuple(regla['funcion'] for regla in self.reglas_validacion)
+        # Veredictos por forma del plan (LRU acotada)
+        self._cache_validacion: OrderedDict = OrderedDict()
+        self._lock_cache = threading.Lock()
+        self.tamaño_cache_validacion = configuracion.get('tamaño_cache_validacion', 512)
     
     def _cargar_reglas_validacion(self) -> List[Dict]:
         """Carga las reglas de validación para planes"""
@@ -29,78 +94,222 @@ class ValidadorOptimizadorPlanes:
             }
         ]
     
-    def validar_plan(self, plan: Dict) -> Tuple[bool, List[str]]:
-        """Valida un plan contra todas las reglas"""
-        errores = []
-        
-        for regla in self.reglas_validacion:
-            try:
-                valido, mensaje = regla["funcion"](plan)
-                if not valido:
-                    errores.append(f"{regla['nombre']}: {mensaje}")
-            except Exception as e:
-                errores.append(f"Error ejecutando regla {regla['nombre']}: {str(e)}")
+    @staticmethod
+    def indexar_plan(plan: Dict) -> IndicePlan:
+        """
+        Recorre una vez las tareas del plan y construye su IndicePlan.
+        
+        Args:
+            plan: Plan con lista de tareas
+        
+        Returns:
+            IndicePlan: Grafo de dependencias, herramientas y número de
+                dependencias por posición de tarea
+        """
+        tareas = plan.get('tareas', [])
+        ids = {tarea.get('id') for tarea in tareas if tarea.get('id')}
+        grado_entrada = dict.fromkeys(ids, 0)
+        sucesores: Dict[str, List[str]] = {tarea_id: [] for tarea_id in ids}
+        herramientas = set()
+        num_dependencias = []
+        
+        for tarea in tareas:
+            dependencias = tarea.get('dependencias', [])
+            num_dependencias.append(len(dependencias))
+            
+            herramienta = tarea.get('herramienta')
+            if herramienta:
+                herramientas.add(herramienta)
+            
+            tarea_id = tarea.get('id')
+            if tarea_id:
+                # Las dependencias ajenas al plan no pueden cerrar un ciclo
+                for dep in dependencias:
+                    if dep in ids:
+                        sucesores[dep].append(tarea_id)
+                        grado_entrada[tarea_id] += 1
+        
+        return IndicePlan(len(tareas), grado_entrada, sucesores, herramientas, num_dependencias)
+    
+    def validar_plan(self, plan: Dict, indice: Optional[IndicePlan] = None) -> Tuple[bool, List[str]]:
+        """
+        Valida un plan contra todas las reglas.
+        
+        Las reglas solo dependen de la forma del plan (ids, dependencias y
+        herramientas de sus tareas), así que el veredicto se cachea por una
+        huella de esa forma y los planes equivalentes no se revalidan.
+        
+        Args:
+            plan: Plan a validar
+            indice: IndicePlan ya construido para el plan (opcional)
+        
+        Returns:
+            Tuple[bool, List[str]]: Validez y errores encontrados
+        """
+        # Las reglas devuelven (válido, mensaje) sin lanzar; una excepción aquí
+        # viene de un plan mal formado (p. ej. dependencias que no son lista)
+        try:
+            huella = self._huella_plan(plan)
+            with self._lock_cache:
+                cacheado = self._cache_validacion.get(huella)
+                if cacheado is not None:
+                    self._cache_validacion.move_to_end(huella)
+            if cacheado is not None:
+                return cacheado[0], list(cacheado[1])
+            
+            if indice is None:
+                indice = self.indexar_plan(plan)
+            resultados = [funcion(indice) for funcion in self._funciones_reglas]
+        except Exception as e:
+            logger.error(f"Error ejecutando reglas de validación: {e}")
+            return False, [f"Error ejecutando reglas de validación: {str(e)}"]
+        
+        errores = [
+            f"{nombre}: {mensaje}"
+            for nombre, (valido, mensaje) in zip(self._nombres_reglas, resultados)
+            if not valido
+        ]
+        
+        with self._lock_cache:
+            self._cache_validacion[huella] = (len(errores) == 0, tuple(errores))
+            if len(self._cache_validacion) > self.tamaño_cache_validacion:
+                self._cache_validacion.popitem(last=False)
         
         return len(errores) == 0, errores
     
-    def _validar_minimo_tareas(self, plan: Dict) -> Tuple[bool, str]:
-        """Valida que el plan tenga al menos una tarea"""
+    async def validar_planes_lote(self, planes: Sequence[Dict],
+                                  indices: Optional[Sequence[Optional[IndicePlan]]] = None
+                                  ) -> List[Tuple[bool, List[str]]]:
+        """
+        Valida varios planes concurrentemente en hilos.
+        
+        Las reglas de un mismo plan son independientes pero muy baratas salvo
+        la detección de ciclos; el paralelismo útil está entre planes. Con
+        numba, el kernel de ciclos libera el GIL y los planes grandes se
+        comprueban en paralelo real.
+        
+        Args:
+            planes: Planes a validar
+            indices: IndicePlan ya construido por plan (opcional, None por plan)
+        
+        Returns:
+            List[Tuple[bool, List[str]]]: Resultado de validar_plan por plan
+        """
+        indices = indices or [None] * len(planes)
+        return await asyncio.gather(*(
+            asyncio.to_thread(self.validar_plan, plan, indice)
+            for plan, indice in zip(planes, indices)
+        ))
+    
+    @staticmethod
+    def _huella_plan(plan: Dict) -> bytes:
+        """Huella blake2b de la forma del plan: (id, dependencias, herramienta) por tarea"""
+        h = hashlib.blake2b(digest_size=16)
         tareas = plan.get('tareas', [])
-        if len(tareas) == 0:
+        h.update(str(len(tareas)).encode())
+        for tarea in sorted(tareas, key=lambda t: str(t.get('id') or '')):
+            h.update(b'\x00')
+            h.update(str(tarea.get('id') or '').encode())
+            h.update(b'\x01')
+            h.update('\x02'.join(sorted(map(str, tarea.get('dependencias') or ()))).encode())
+            h.update(b'\x01')
+            h.update(str(tarea.get('herramienta') or '').encode())
+        return h.digest()
+    
+    def _validar_minimo_tareas(self, indice: IndicePlan) -> Tuple[bool, str]:
+        """Valida que el plan tenga al menos una tarea"""
+        if indice.num_tareas == 0:
             return False, "El plan no contiene tareas"
         return True, ""
     
-    def _validar_dependencias_ciclicas(self, plan: Dict) -> Tuple[bool, str]:
-        """Valida que no haya ciclos en las dependencias entre tareas"""
-        grafo = nx.DiGraph()
+    def _validar_dependencias_ciclicas(self, indice: IndicePlan) -> Tuple[bool, str]:
+        """
+        Valida que no haya ciclos en las dependencias entre tareas.
         
-        for tarea in plan.get('tareas', []):
-            tarea_id = tarea.get('id')
-            if tarea_id:
-                grafo.add_node(tarea_id)
-                for dep in tarea.get('dependencias', []):
-                    grafo.add_edge(dep, tarea_id)
+        Ordenación topológica de Kahn sobre diccionarios: si al vaciar la cola
+        quedan tareas con grado de entrada pendiente, forman parte de un ciclo
+        o dependen de uno. Con numba y planes grandes se ejecuta compilada
+        sobre el grafo en CSR con ids enteros.
+        """
+        if NUMBA_DISPONIBLE and len(indice.grado_entrada) >= _MIN_TAREAS_NUMBA:
+            return self._validar_dependencias_ciclicas_csr(indice)
         
-        try:
-            ciclos = list(nx.simple_cycles(grafo))
-            if ciclos:
-                return False, f"Se detectaron ciclos en las dependencias: {ciclos}"
-            return True, ""
-        except nx.NetworkXNoCycle:
-            return True, ""
+        grado_entrada = dict(indice.grado_entrada)
+        sucesores = indice.sucesores
+        
+        cola = deque(tarea_id for tarea_id, grado in grado_entrada.items() if grado == 0)
+        procesadas = 0
+        while cola:
+            actual = cola.popleft()
+            procesadas += 1
+            for sucesor in sucesores[actual]:
+                grado_entrada[sucesor] -= 1
+                if grado_entrada[sucesor] == 0:
+                    cola.append(sucesor)
+        
+        if procesadas < len(grado_entrada):
+            bloqueadas = sorted(tarea_id for tarea_id, grado in grado_entrada.items() if grado > 0)
+            return False, f"Se detectaron ciclos en las dependencias entre las tareas: {bloqueadas}"
+        return True, ""
+    
+    @staticmethod
+    def _validar_dependencias_ciclicas_csr(indice: IndicePlan) -> Tuple[bool, str]:
+        """Versión compilada de la detección de ciclos sobre el grafo en CSR"""
+        ids = list(indice.grado_entrada)
+        posicion = {tarea_id: i for i, tarea_id in enumerate(ids)}
+        grado_entrada = np.fromiter(indice.grado_entrada.values(), dtype=np.int32, count=len(ids))
+        desplazamientos = np.zeros(len(ids) + 1, dtype=np.int32)
+        desplazamientos[1:] = np.cumsum([len(indice.sucesores[tarea_id]) for tarea_id in ids])
+        destinos = np.fromiter(
+            (posicion[sucesor] for tarea_id in ids for sucesor in indice.sucesores[tarea_id]),
+            dtype=np.int32, count=int(desplazamientos[-1])
+        )
+        
+        procesadas = _kahn_csr(grado_entrada, desplazamientos, destinos)
+        if procesadas < len(ids):
+            bloqueadas = sorted(ids[i] for i in np.flatnonzero(grado_entrada > 0))
+            return False, f"Se detectaron ciclos en las dependencias entre las tareas: {bloqueadas}"
+        return True, ""
     
-    def _validar_recursos_disponibles(self, plan: Dict) -> Tuple[bool, str]:
+    def _validar_recursos_disponibles(self, indice: IndicePlan) -> Tuple[bool, str]:
         """Valida que las herramientas especificadas estén disponibles"""
         herramientas_disponibles = {'busqueda_web', 'generacion_texto', 'api_rest'}
-        herramientas_plan = set()
         
-        for tarea in plan.get('tareas', []):
-            herramienta = tarea.get('herramienta')
-            if herramienta:
-                herramientas_plan.add(herramienta)
-        
-        herramientas_no_disponibles = herramientas_plan - herramientas_disponibles
+        herramientas_no_disponibles = indice.herramientas - herramientas_disponibles
         if herramientas_no_disponibles:
             return False, f"Herramientas no disponibles: {herramientas_no_disponibles}"
         
         return True, ""
     
-    def optimizar_plan(self, plan: Dict) -> Dict:
-        """Aplica optimizaciones al plan"""
-        plan_optimizado = plan.copy()
+    def optimizar_plan(self, plan: Dict, indice: Optional[IndicePlan] = None) -> Dict:
+        """
+        Aplica optimizaciones al plan.
+        
+        El plan recibido no se modifica: cada paso devuelve un diccionario
+        nuevo que solo reasigna las claves que cambia y comparte el resto.
+        
+        Args:
+            plan: Plan a optimizar
+            indice: IndicePlan ya construido para el plan (opcional)
         
-        plan_optimizado = self._optimizar_secuencia(plan_optimizado)
+        Returns:
+            Dict: Plan optimizado
+        """
+        if indice is None:
+            indice = self.indexar_plan(plan)
+        
+        plan_optimizado = self._optimizar_secuencia(plan, indice)
         plan_optimizado = self._optimizar_recursos(plan_optimizado)
         plan_optimizado = self._optimizar_parametros(plan_optimizado)
         
         return plan_optimizado
     
-    def _optimizar_secuencia(self, plan: Dict) -> Dict:
+    def _optimizar_secuencia(self, plan: Dict, indice: IndicePlan) -> Dict:
         """Optimiza la secuencia de ejecución de tareas"""
         tareas = plan['tareas']
-        tareas_ordenadas = sorted(tareas, key=lambda x: len(x.get('dependencias', [])))
-        plan['tareas'] = tareas_ordenadas
-        return plan
+        # Orden estable por número de dependencias, con claves ya calculadas
+        orden = sorted(range(len(tareas)), key=indice.num_dependencias.__getitem__)
+        return {**plan, 'tareas': [tareas[i] for i in orden]}
     
     def _optimizar_recursos(self, plan: Dict) -> Dict:
         """Optimiza la asignación de recursos/herramientas"""
@@ -1,10 +1,44 @@
-from typing import Dict, List, Any, Optional, Callable
+from typing import Dict, Iterator, List, Any, Optional, Callable, Tuple, NamedTuple, Awaitable
 import asyncio
+import contextvars
+import copy
+import functools
+import hashlib
+import itertools
+import os
+import random
+import sys
+import threading
 import time
+import weakref
+from collections import OrderedDict, deque
 from datetime import datetime
 from enum import Enum
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+import orjson
+from pydantic import ValidationError
 from loguru import logger
+from .esquemas_tarea import ADAPTADOR_TAREA
+
+# Número de reintento de la tarea en curso (0 en el primer intento). Las
+# herramientas lo leen con REINTENTO_ACTUAL.get(); cada tarea de asyncio y
+# cada llamada despachada al pool de hilos ve su propio valor
+REINTENTO_ACTUAL: contextvars.ContextVar[int] = contextvars.ContextVar('met_reintento_actual', default=0)
+
+if sys.version_info >= (3, 11):
+    async def _esperar_con_limite(aguardable, timeout: Optional[float]) -> Any:
+        """Espera con límite de tiempo sobre la tarea actual, sin crear otra"""
+        async with asyncio.timeout(timeout):
+            return await aguardable
+else:
+    async def _esperar_con_limite(aguardable, timeout: Optional[float]) -> Any:
+        """Espera con límite de tiempo (wait_for antes de Python 3.11)"""
+        return await asyncio.wait_for(aguardable, timeout=timeout)
+
+class _Especializacion(NamedTuple):
+    """Ejecutor de un par (tipo, herramienta) con sus decisiones ya resueltas"""
+    ejecutar: Callable[[Dict, Dict], Awaitable[Dict[str, Any]]]
+    cacheable: bool
 
 class EstadoEjecucion(Enum):
     """Estados posibles durante el ciclo de ejecución de una tarea"""
@@ -15,6 +49,28 @@ class EstadoEjecucion(Enum):
     REINTENTANDO = "reintentando"
     TIMEOUT = "timeout"
 
+def _procesar_resultado_busqueda(resultado: Any) -> Dict[str, Any]:
+    """Normaliza el resultado de una búsqueda web a lista de resultados"""
+    if isinstance(resultado, dict):
+        resultado = resultado.get('resultados', [resultado])
+    resultados = list(resultado) if isinstance(resultado, (list, tuple)) else [resultado]
+    return {'resultado': resultados, 'num_resultados': len(resultados)}
+
+def _procesar_resultado_texto(resultado: Any) -> Dict[str, Any]:
+    """Normaliza el resultado de una generación de texto"""
+    texto = resultado if isinstance(resultado, str) else str(resultado)
+    return {'resultado': texto, 'longitud': len(texto)}
+
+def _procesar_resultado_generico(resultado: Any) -> Dict[str, Any]:
+    """Envuelve el resultado sin transformarlo"""
+    return {'resultado': resultado}
+
+# Procesador de resultados por tipo de tarea
+_PROCESADORES_RESULTADO: Dict[str, Callable[[Any], Dict[str, Any]]] = {
+    'busqueda_web': _procesar_resultado_busqueda,
+    'generacion_texto': _procesar_resultado_texto,
+}
+
 class ModuloEjecucionTareas:
     """Módulo principal de Ejecución de Tareas de SAAM - Brazo ejecutor del sistema"""
     
@@ -24,24 +80,65 @@ class ModuloEjecucionTareas:
         self.config = configuracion
         self.estado_global = EstadoEjecucion.PENDIENTE
         
-        # Configuración de pools de ejecución para operaciones bloqueantes
-        self.thread_pool = ThreadPoolExecutor(
-            max_workers=configuracion.get('max_workers', 10)
-        )
-        self.process_pool = ProcessPoolExecutor(
-            max_workers=configuracion.get('max_process_workers', 4)
-        )
+        # Pool de hilos para herramientas síncronas, creado en el primer uso
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._lock_thread_pool = threading.Lock()
+        
+        # Caché LRU con TTL de resultados de tareas deterministas
+        self.tamaño_cache_resultados = configuracion.get('tamaño_cache_resultados', 1024)
+        self.ttl_cache_resultados = configuracion.get('ttl_cache_resultados', 300)
+        self.tipos_cacheables = frozenset(configuracion.get('tipos_cacheables', ()))
+        self._cache_resultados: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        # Ejecuciones cacheables en curso: las llamadas idénticas concurrentes
+        # esperan el mismo futuro en lugar de repetir la ejecución
+        self._en_vuelo: Dict[tuple, asyncio.Future] = {}
+        
+        # Tabla de procesadores por tipo; ampliable con registrar_procesador_resultado
+        self.procesadores_resultado = dict(_PROCESADORES_RESULTADO)
+        
+        # Naturaleza (corrutina o no) de cada herramienta, resuelta una vez
+        self._herramientas_asincronas: Dict[Callable, bool] = {}
+        # Ejecutores especializados por (tipo, herramienta)
+        self._especializaciones: Dict[Tuple[str, Callable], _Especializacion] = {}
+        
+        # Ids de tarea únicos dentro del proceso
+        self._contador_ids = itertools.count(1)
         
         # Registro de estado de tareas en ejecución
         self.tareas_activas: Dict[str, Dict] = {}
-        self.metricas_ejecucion = {
+        # Las tareas terminadas pasan a un historial acotado
+        self.historial_tareas: deque = deque(maxlen=configuracion.get('tamaño_historial', 10000))
+        # Contadores agregados; cada actualización es una sección crítica
+        # explícita en lugar de depender de la atomicidad que da el GIL.
+        # Los tiempos se acumulan en nanosegundos enteros de reloj monótono
+        self._metricas = {
             'tareas_completadas': 0,
             'tareas_fallidas': 0,
-            'tiempo_total_ejecucion': 0.0
+            'tareas_reutilizadas': 0,
+            'tiempo_total_ejecucion_ns': 0
         }
+        self._lock_metricas = threading.Lock()
+        
+        # Monitor de rendimiento (lo inyecta METFactory). Los registros se
+        # encolan y una tarea de fondo los entrega por lotes, fuera del
+        # camino de ejecución de cada tarea
+        self.monitor_rendimiento = None
+        self._cola_metricas: asyncio.Queue = asyncio.Queue(
+            maxsize=configuracion.get('tamaño_cola_metricas', 10000)
+        )
+        self.tamaño_lote_metricas = configuracion.get('tamaño_lote_metricas', 256)
+        self._tarea_volcado: Optional[asyncio.Task] = None
         
         logger.info("Módulo de Ejecución de Tareas inicializado correctamente")
     
+    @property
+    def metricas_ejecucion(self) -> Dict[str, Any]:
+        """Instantánea coherente de los contadores de ejecución (tiempo en segundos)"""
+        with self._lock_metricas:
+            metricas = dict(self._metricas)
+        metricas['tiempo_total_ejecucion'] = metricas.pop('tiempo_total_ejecucion_ns') / 1e9
+        return metricas
+    
     async def ejecutar_tarea(self, tarea: Dict[str, Any], contexto: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         Ejecuta una tarea específica con los parámetros y contexto proporcionados.
@@ -53,54 +150,178 @@ class ModuloEjecucionTareas:
         Returns:
             Dict: Resultado de la ejecución con metadatos enriquecidos
         """
-        tarea_id = tarea.get('id', self._generar_id_tarea())
-        logger.info(f"Iniciando ejecución de tarea {tarea_id}")
+        tarea_id = tarea.get('id') or self._generar_id_tarea()
+        # Argumentos en vez de f-strings: loguru descarta por nivel antes de
+        # inspeccionar el frame y solo formatea si algún sink acepta el mensaje
+        logger.info("Iniciando ejecución de tarea {}", tarea_id)
         
         # Registrar inicio de ejecución en sistema de monitorización
         self._registrar_inicio_tarea(tarea_id, tarea)
         
+        intento = 0
+        while True:
+            try:
+                # 1. Validación y preparación de la tarea
+                tarea_validada = self._validar_tarea(tarea)
+                herramienta = self._seleccionar_herramienta(tarea_validada)
+                especializacion = self._especializaciones.get((tarea_validada['tipo'], herramienta))
+                if especializacion is None:
+                    especializacion = self._especializar(tarea_validada['tipo'], herramienta)
+                
+                # Resultado memorizado de una ejecución idéntica anterior
+                clave_cache = self._clave_cache_resultado(especializacion, tarea_validada)
+                if clave_cache is not None:
+                    resultado_cacheado = self._obtener_resultado_cacheado(clave_cache)
+                    if resultado_cacheado is not None:
+                        self._registrar_exito_tarea(tarea_id, resultado_cacheado, reutilizado=True)
+                        logger.debug("Tarea {} resuelta desde caché", tarea_id)
+                        return resultado_cacheado
+                
+                # 2. Ejecución controlada con timeout y 3. normalización del resultado
+                reutilizado = False
+                if clave_cache is None:
+                    resultado_procesado = await self._ejecutar_intento(
+                        especializacion, tarea_validada, contexto, intento
+                    )
+                else:
+                    resultado_procesado, reutilizado = await self._ejecutar_compartido(
+                        clave_cache, especializacion, tarea_validada, contexto, intento
+                    )
+                self._registrar_exito_tarea(tarea_id, resultado_procesado, reutilizado)
+                
+                logger.success("Tarea {} completada exitosamente", tarea_id)
+                return resultado_procesado
+                
+            except Exception as e:
+                # 4. Reintento con backoff o retorno controlado del error
+                espera = self._espera_reintento(e, tarea, intento)
+                if espera is None:
+                    resultado_error = {
+                        'exito': False,
+                        'error': str(e),
+                        'tipo_error': type(e).__name__,
+                        'reintentos': intento
+                    }
+                    self._registrar_fallo_tarea(tarea_id, resultado_error)
+                    
+                    logger.error("Tarea {} falló: {}", tarea_id, e)
+                    return resultado_error
+                
+                intento += 1
+                logger.warning("Reintentando tarea {} ({}/{})", tarea_id, intento, self._max_reintentos(tarea))
+                await asyncio.sleep(espera)
+    
+    async def _ejecutar_intento(self, especializacion: _Especializacion, tarea: Dict,
+                                contexto: Dict, intento: int) -> Dict[str, Any]:
+        """Ejecuta un intento publicando su número en REINTENTO_ACTUAL"""
+        token_reintento = REINTENTO_ACTUAL.set(intento)
         try:
-            # 1. Validación y preparación de la tarea
-            tarea_validada = self._validar_tarea(tarea)
-            herramienta = self._seleccionar_herramienta(tarea_validada)
-            
-            # 2. Ejecución controlada con timeout
-            resultado = await self._ejecutar_con_timeout(
-                herramienta, tarea_validada, contexto
-            )
-            
-            # 3. Procesamiento y normalización del resultado
-            resultado_procesado = self._procesar_resultado(resultado, tarea_validada)
-            self._registrar_exito_tarea(tarea_id, resultado_procesado)
-            
-            logger.success(f"Tarea {tarea_id} completada exitosamente")
-            return resultado_procesado
-            
+            return await especializacion.ejecutar(tarea, contexto)
+        finally:
+            REINTENTO_ACTUAL.reset(token_reintento)
+    
+    async def _ejecutar_compartido(self, clave: tuple, especializacion: _Especializacion, tarea: Dict,
+                                   contexto: Dict, intento: int) -> Tuple[Dict[str, Any], bool]:
+        """
+        Ejecuta una tarea cacheable una sola vez aunque llegue repetida en paralelo.
+        
+        La primera llamada con una clave ejecuta la herramienta y guarda el
+        resultado en la caché; las que llegan mientras tanto esperan su futuro
+        y reciben una copia del resultado, o su error, que pasa por su propia
+        política de reintentos.
+        
+        Args:
+            clave: Clave de caché de la tarea
+            especializacion: Ejecutor de la tarea
+            tarea: Tarea validada
+            contexto: Contexto de ejecución
+            intento: Número de intento del llamante
+        
+        Returns:
+            Tuple[Dict, bool]: Resultado normalizado de la tarea y si se
+                reutilizó el de otra llamada en lugar de ejecutar la herramienta
+        """
+        en_vuelo = self._en_vuelo.get(clave)
+        if en_vuelo is not None:
+            # shield: cancelar a quien espera no cancela la ejecución compartida
+            return copy.deepcopy(await asyncio.shield(en_vuelo)), True
+        
+        futuro = self._en_vuelo[clave] = asyncio.get_running_loop().create_future()
+        try:
+            resultado = await self._ejecutar_intento(especializacion, tarea, contexto, intento)
+            futuro.set_result(self._guardar_resultado_cacheado(clave, resultado))
+            return resultado, False
         except Exception as e:
-            # 4. Manejo robusto de errores con estrategia de reintentos
-            resultado_error = await self._manejar_error(e, tarea, contexto)
-            self._registrar_fallo_tarea(tarea_id, resultado_error)
-            
-            logger.error(f"Tarea {tarea_id} falló: {str(e)}")
-            return resultado_error
+            futuro.set_exception(e)
+            raise
+        except asyncio.CancelledError:
+            futuro.set_exception(RuntimeError("Ejecución compartida cancelada"))
+            raise
+        finally:
+            # Sin nadie esperando, el error no debe avisarse como no recuperado
+            if futuro.done() and not futuro.cancelled():
+                futuro.exception()
+            self._en_vuelo.pop(clave, None)
     
     def _generar_id_tarea(self) -> str:
         """Genera un ID único para identificación de la tarea"""
-        import uuid
-        return f"tarea_{uuid.uuid4().hex[:8]}"
+        return f"tarea_{next(self._contador_ids):08x}"
     
     def _validar_tarea(self, tarea: Dict) -> Dict:
-        """Valida la estructura integral y parámetros de una tarea"""
-        required_keys = {'tipo', 'herramienta', 'parametros'}
-        if not all(key in tarea for key in required_keys):
-            raise ValueError(f"Tarea inválida: faltan campos requeridos {required_keys}")
+        """
+        Valida la estructura integral y parámetros de una tarea con el
+        esquema compilado (campos obligatorios y requisitos por tipo).
         
-        # Validación específica según el tipo de tarea
-        if tarea['tipo'] == 'busqueda_web' and 'query' not in tarea['parametros']:
-            raise ValueError("Búsqueda web requiere parámetro 'query'")
+        Returns:
+            Dict: La misma tarea, sin transformar
+        """
+        try:
+            ADAPTADOR_TAREA.validate_python(tarea)
+        except ValidationError as e:
+            raise ValueError(f"Tarea inválida: {e}") from None
         
         return tarea
     
+    def _clave_cache_resultado(self, especializacion: _Especializacion, tarea: Dict) -> Optional[tuple]:
+        """
+        Calcula la clave de caché de una tarea cuyo resultado es reutilizable.
+        
+        Una tarea es cacheable si lo declara (``cacheable``), si su tipo está en
+        ``tipos_cacheables`` o si su herramienta está marcada como determinista.
+        El tipo forma parte de la clave porque lo cacheado es el resultado ya
+        normalizado por el procesador de ese tipo.
+        
+        Returns:
+            Optional[tuple]: (tipo, herramienta, digest de los parámetros) o None
+        """
+        if not (especializacion.cacheable or tarea.get('cacheable', False)):
+            return None
+        try:
+            parametros = orjson.dumps(tarea['parametros'], option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            return None  # Parámetros no serializables (callables, flujos): no se cachea
+        return tarea['tipo'], tarea['herramienta'], hashlib.blake2b(parametros, digest_size=16).digest()
+    
+    def _obtener_resultado_cacheado(self, clave: tuple) -> Optional[Dict[str, Any]]:
+        """Devuelve una copia del resultado cacheado si existe y no ha caducado"""
+        entrada = self._cache_resultados.get(clave)
+        if entrada is None:
+            return None
+        if time.monotonic() - entrada[0] > self.ttl_cache_resultados:
+            del self._cache_resultados[clave]
+            return None
+        self._cache_resultados.move_to_end(clave)
+        return copy.deepcopy(entrada[1])
+    
+    def _guardar_resultado_cacheado(self, clave: tuple, resultado: Dict[str, Any]) -> Dict[str, Any]:
+        """Guarda una copia del resultado expulsando el menos usado recientemente y la devuelve"""
+        copia = copy.deepcopy(resultado)
+        self._cache_resultados[clave] = (time.monotonic(), copia)
+        self._cache_resultados.move_to_end(clave)
+        while len(self._cache_resultados) > self.tamaño_cache_resultados:
+            self._cache_resultados.popitem(last=False)
+        return copia
+    
     def _seleccionar_herramienta(self, tarea: Dict) -> Callable:
         """Selecciona la herramienta óptima para el tipo de tarea"""
         herramienta_nombre = tarea['herramienta']
@@ -111,94 +332,282 @@ class ModuloEjecucionTareas:
         
         return herramienta
     
-    async def _ejecutar_con_timeout(self, herramienta: Callable, tarea: Dict, contexto: Dict) -> Any:
-        """Ejecuta la herramienta con control estricto de timeout"""
-        timeout = tarea.get('timeout', self.config.get('timeout_default', 30))
+    def precargar_herramienta(self, nombre: str) -> None:
+        """
+        Prepara una herramienta prevista por el MCP antes de que llegue su tarea.
+        
+        Resuelve si es corrutina, arranca el pool de hilos si la herramienta es
+        síncrona y llama a su ``precargar()`` si lo expone (conexiones, modelos).
+        No cuenta como uso de la herramienta. Se invoca desde el hilo de
+        precarga del MCP.
+        
+        Args:
+            nombre: Nombre de la herramienta registrada
+        """
+        registro = self.herramientas.herramientas_registradas.get(nombre)
+        if registro is None:
+            return
+        herramienta = registro['funcion']
+        if not self._es_asincrona(herramienta):
+            self.thread_pool  # crea el pool si aún no existe
+        precargar = getattr(getattr(herramienta, '__self__', herramienta), 'precargar', None)
+        if callable(precargar):
+            precargar()
+    
+    @property
+    def thread_pool(self) -> ThreadPoolExecutor:
+        """
+        Pool de hilos de las herramientas síncronas.
+        
+        Se crea al despachar la primera herramienta síncrona, de modo que un
+        MET que solo ejecuta corrutinas no arranca hilos. Las herramientas
+        son de E/S, así que por defecto se dimensiona a varios hilos por
+        núcleo con un tope.
+        """
+        if self._thread_pool is None:
+            with self._lock_thread_pool:
+                if self._thread_pool is None:
+                    pool = ThreadPoolExecutor(
+                        max_workers=self.config.get('max_workers') or min(
+                            self.config.get('max_workers_tope', 64), (os.cpu_count() or 4) * 5
+                        )
+                    )
+                    # Sin referencia a self: el pool se cierra al recolectar el MET
+                    weakref.finalize(self, pool.shutdown, wait=False, cancel_futures=True)
+                    self._thread_pool = pool
+        return self._thread_pool
+    
+    def iniciar(self) -> None:
+        """
+        Arranca la entrega en segundo plano de métricas al monitor.
         
+        Debe llamarse con un bucle de eventos en ejecución; si no se llama,
+        la entrega arranca con la primera métrica registrada.
+        """
+        if self._tarea_volcado is None or self._tarea_volcado.done():
+            self._tarea_volcado = asyncio.get_running_loop().create_task(self._volcar_metricas())
+    
+    async def _volcar_metricas(self) -> None:
+        """Entrega las métricas encoladas al monitor en lotes de ``tamaño_lote_metricas``"""
+        while True:
+            # Bloquea hasta la primera métrica y arrastra sin esperar las
+            # que ya estén encoladas, hasta completar el lote
+            primera = await self._cola_metricas.get()
+            self._entregar_metricas(self._extraer_lote_metricas([primera]))
+    
+    def _extraer_lote_metricas(self, lote: Optional[List[Tuple[str, Dict[str, Any]]]] = None
+                               ) -> List[Tuple[str, Dict[str, Any]]]:
+        """Saca de la cola, sin esperar, hasta completar un lote de métricas"""
+        lote = lote if lote is not None else []
         try:
-            if asyncio.iscoroutinefunction(herramienta):
-                # Función asíncrona - ejecución directa
-                resultado = await asyncio.wait_for(
-                    herramienta(**tarea['parametros'], contexto=contexto),
-                    timeout=timeout
-                )
-            else:
-                # Función síncrona - ejecución en thread pool
-                loop = asyncio.get_event_loop()
-                resultado = await loop.run_in_executor(
-                    self.thread_pool,
-                    lambda: herramienta(**tarea['parametros'], contexto=contexto)
-                )
-            
-            return resultado
-            
-        except asyncio.TimeoutError:
-            raise TimeoutError(f"Timeout después de {timeout} segundos")
+            while len(lote) < self.tamaño_lote_metricas:
+                lote.append(self._cola_metricas.get_nowait())
+        except asyncio.QueueEmpty:
+            pass
+        return lote
+    
+    def _entregar_metricas(self, lote: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Entrega un lote al monitor sin dejar que un fallo detenga el volcado"""
+        try:
+            self.monitor_rendimiento.registrar_lote(lote)
         except Exception as e:
-            raise e
-    
-    def _procesar_resultado(self, resultado: Any, tarea: Dict) -> Dict[str, Any]:
-        """Procesa y normaliza el resultado según el tipo de tarea"""
-        if tarea['tipo'] == 'busqueda_web':
-            return self._procesar_resultado_busqueda(resultado)
-        elif tarea['tipo'] == 'generacion_texto':
-            return self._procesar_resultado_texto(resultado)
-        else:
-            return {'resultado': resultado}
+            logger.error("Error entregando {} métricas al monitor de rendimiento: {}", len(lote), e)
     
-    async def _manejar_error(self, error: Exception, tarea: Dict, contexto: Dict) -> Dict[str, Any]:
-        """Maneja errores durante la ejecución con estrategia de reintentos inteligentes"""
-        max_reintentos = tarea.get('max_reintentos', self.config.get('max_reintentos', 3))
-        reintento_actual = contexto.get('reintento_actual', 0)
+    def _encolar_metrica(self, herramienta: str, exito: bool, duracion_ns: int, error: Any = None) -> None:
+        """Encola la métrica de una tarea terminada; se descarta si la cola está llena"""
+        if self.monitor_rendimiento is None:
+            return
         
-        if reintento_actual < max_reintentos:
-            logger.warning(f"Reintentando tarea ({reintento_actual + 1}/{max_reintentos})")
-            
-            # Backoff exponencial con jitter para evitar congestión
-            await asyncio.sleep(2 ** reintento_actual + random.uniform(0, 1))
-            
-            contexto['reintento_actual'] = reintento_actual + 1
-            return await self.ejecutar_tarea(tarea, contexto)
+        try:
+            self._cola_metricas.put_nowait((herramienta, {
+                'exito': exito,
+                'duracion': duracion_ns / 1e9,
+                'error': error
+            }))
+        except asyncio.QueueFull:
+            logger.warning("Cola de métricas llena, descartada la métrica de {}", herramienta)
+            return
+        
+        self.iniciar()
+    
+    async def cerrar(self):
+        """Detiene el volcado de métricas entregando las pendientes y libera el pool de hilos"""
+        if self._tarea_volcado is not None:
+            self._tarea_volcado.cancel()
+            self._tarea_volcado = None
+        # Entregar lo que quedara encolado
+        while self.monitor_rendimiento is not None and (lote := self._extraer_lote_metricas()):
+            self._entregar_metricas(lote)
+        
+        with self._lock_thread_pool:
+            pool, self._thread_pool = self._thread_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        logger.info("Módulo de Ejecución de Tareas cerrado")
+    
+    def _es_asincrona(self, herramienta: Callable) -> bool:
+        """Indica si la herramienta es una corrutina, memorizado por herramienta"""
+        asincrona = self._herramientas_asincronas.get(herramienta)
+        if asincrona is None:
+            asincrona = self._herramientas_asincronas[herramienta] = asyncio.iscoroutinefunction(herramienta)
+        return asincrona
+    
+    def _en_thread_pool(self, herramienta: Callable, parametros: Dict, contexto: Dict) -> asyncio.Future:
+        """
+        Despacha una herramienta síncrona al pool de hilos del MET.
+        
+        El pool es exclusivo de las herramientas: no se instala como ejecutor
+        por defecto del bucle, cuyo ``asyncio.to_thread`` siguen usando las
+        llamadas al LLM y a la base de datos.
+        """
+        loop = asyncio.get_running_loop()
+        # Como asyncio.to_thread, el hilo ejecuta en una copia del contexto actual
+        return loop.run_in_executor(
+            self.thread_pool,
+            functools.partial(contextvars.copy_context().run, herramienta, contexto=contexto, **parametros)
+        )
+    
+    def _especializar(self, tipo: str, herramienta: Callable) -> _Especializacion:
+        """
+        Construye y memoriza el ejecutor de un par (tipo, herramienta).
+        
+        Todo lo que solo depende del tipo y de la herramienta (si es corrutina,
+        el procesador del resultado, el timeout por defecto y si el resultado
+        es cacheable) se resuelve aquí una vez y queda ligado al cierre. La
+        clave incluye el objeto herramienta, así que volver a registrar una
+        herramienta con el mismo nombre produce una especialización nueva.
+        
+        Args:
+            tipo: Tipo de la tarea
+            herramienta: Herramienta seleccionada para la tarea
+        
+        Returns:
+            _Especializacion: Ejecutor (tarea, contexto) -> resultado normalizado
+        """
+        procesar = self.procesadores_resultado.get(tipo, _procesar_resultado_generico)
+        timeout_defecto = self.config.get('timeout_default', 30)
+        propietario = getattr(herramienta, '__self__', herramienta)
+        cacheable = tipo in self.tipos_cacheables or bool(getattr(propietario, 'determinista', False))
+        
+        if self._es_asincrona(herramienta):
+            def lanzar(parametros: Dict, contexto: Dict) -> Awaitable:
+                return herramienta(**parametros, contexto=contexto)
         else:
-            # Reintentos agotados - retorno controlado del error
-            return {
-                'exito': False,
-                'error': str(error),
-                'tipo_error': type(error).__name__,
-                'reintentos': reintento_actual
-            }
+            def lanzar(parametros: Dict, contexto: Dict) -> Awaitable:
+                # El límite libera al llamante; el hilo termina por su cuenta
+                return self._en_thread_pool(herramienta, parametros, contexto)
+        
+        async def ejecutar(tarea: Dict, contexto: Dict) -> Dict[str, Any]:
+            """Ejecuta la herramienta con control estricto de timeout y normaliza el resultado"""
+            # timeout: None en la tarea significa "usar el de la configuración"
+            timeout = tarea.get('timeout')
+            if timeout is None:
+                timeout = timeout_defecto
+            try:
+                resultado = await _esperar_con_limite(lanzar(tarea['parametros'], contexto), timeout)
+            except asyncio.TimeoutError:
+                # En 3.11+ asyncio.TimeoutError es el TimeoutError integrado
+                raise TimeoutError(f"Timeout después de {timeout} segundos")
+            return procesar(resultado)
+        
+        especializacion = self._especializaciones[(tipo, herramienta)] = _Especializacion(ejecutar, cacheable)
+        return especializacion
+    
+    def registrar_procesador_resultado(self, tipo: str, procesador: Callable[[Any], Dict[str, Any]]):
+        """
+        Registra la normalización del resultado de un tipo de tarea.
+        
+        Args:
+            tipo: Tipo de tarea
+            procesador: Función que recibe el resultado bruto y devuelve el dict normalizado
+        """
+        self.procesadores_resultado[tipo] = procesador
+        # Los ejecutores de ese tipo llevan ligado el procesador anterior
+        for clave in [clave for clave in self._especializaciones if clave[0] == tipo]:
+            del self._especializaciones[clave]
+    
+    def _max_reintentos(self, tarea: Dict) -> int:
+        """Reintentos permitidos para la tarea; None en la tarea usa el de la configuración"""
+        max_reintentos = tarea.get('max_reintentos')
+        if max_reintentos is None:
+            return self.config.get('max_reintentos', 3)
+        return max_reintentos
+    
+    def _espera_reintento(self, error: Exception, tarea: Dict, intento: int) -> Optional[float]:
+        """
+        Decide si se reintenta tras un error y cuánto esperar.
+        
+        Los ValueError son errores de validación o de la tarea y no se
+        reintentan. La espera usa backoff exponencial con jitter completo,
+        uniforme en [0, min(tope, base * 2^intento)], para que los reintentos
+        de muchas tareas no se agrupen sobre el servicio que falla.
+        
+        Returns:
+            Optional[float]: Segundos de espera, o None si no se reintenta
+        """
+        if isinstance(error, ValueError) or intento >= self._max_reintentos(tarea):
+            return None
+        
+        base = self.config.get('backoff_base', 1.0)
+        tope = self.config.get('backoff_cap', 30.0)
+        return random.uniform(0, min(tope, base * (1 << intento)))
     
     def _registrar_inicio_tarea(self, tarea_id: str, tarea: Dict) -> None:
         """Registra el inicio de una tarea en el sistema de monitorización"""
         self.tareas_activas[tarea_id] = {
             'estado': EstadoEjecucion.EN_EJECUCION.value,
-            'inicio': time.time(),
+            'inicio_ns': time.monotonic_ns(),
             'tarea': tarea
         }
     
-    def _registrar_exito_tarea(self, tarea_id: str, resultado: Dict) -> None:
-        """Registra la finalización exitosa de una tarea"""
-        if tarea_id in self.tareas_activas:
-            duracion = time.time() - self.tareas_activas[tarea_id]['inicio']
+    def _registrar_exito_tarea(self, tarea_id: str, resultado: Dict, reutilizado: bool = False) -> None:
+        """
+        Registra la finalización exitosa de una tarea y la archiva.
+        
+        Las tareas resueltas sin ejecutar la herramienta (caché o ejecución
+        compartida) se cuentan aparte y no entran en los tiempos de ejecución
+        ni en el monitor de herramientas.
+        """
+        registro = self.tareas_activas.pop(tarea_id, None)
+        if registro is not None:
+            duracion_ns = time.monotonic_ns() - registro['inicio_ns']
             
-            self.tareas_activas[tarea_id].update({
+            registro.update({
                 'estado': EstadoEjecucion.COMPLETADA.value,
-                'duracion': duracion,
-                'resultado': resultado
+                'duracion_ns': duracion_ns,
+                'resultado': resultado,
+                'reutilizado': reutilizado
             })
+            self.historial_tareas.append(registro)
             
-            self.metricas_ejecucion['tareas_completadas'] += 1
-            self.metricas_ejecucion['tiempo_total_ejecucion'] += duracion
+            with self._lock_metricas:
+                self._metricas['tareas_completadas'] += 1
+                if reutilizado:
+                    self._metricas['tareas_reutilizadas'] += 1
+                    return
+                self._metricas['tiempo_total_ejecucion_ns'] += duracion_ns
+            
+            self._encolar_metrica(registro['tarea'].get('herramienta'), True, duracion_ns)
     
     def _registrar_fallo_tarea(self, tarea_id: str, resultado: Dict) -> None:
-        """Registra el fallo de una tarea con información de diagnóstico"""
-        if tarea_id in self.tareas_activas:
-            duracion = time.time() - self.tareas_activas[tarea_id]['inicio']
+        """Registra el fallo de una tarea con información de diagnóstico y la archiva"""
+        registro = self.tareas_activas.pop(tarea_id, None)
+        if registro is not None:
+            duracion_ns = time.monotonic_ns() - registro['inicio_ns']
             
-            self.tareas_activas[tarea_id].update({
+            registro.update({
                 'estado': EstadoEjecucion.FALLIDA.value,
-                'duracion': duracion,
+                'duracion_ns': duracion_ns,
                 'error': resultado.get('error')
             })
+            self.historial_tareas.append(registro)
+            
+            with self._lock_metricas:
+                self._metricas['tareas_fallidas'] += 1
             
-            self.metricas_ejecucion['tareas_fallidas'] += 1
\ No newline at end of file
+            self._encolar_metrica(registro['tarea'].get('herramienta'), False, duracion_ns, resultado.get('error'))
+    
+    def iterar_registros_tareas(self) -> Iterator[Dict]:
+        """Recorre las tareas en ejecución y después el historial de terminadas"""
+        yield from self.tareas_activas.values()
+        yield from self.historial_tareas
@@ -1,7 +1,7 @@
 from typing import Dict, Any
 from .met import ModuloEjecucionTareas
 from ..herramientas.gestor_herramientas import GestorHerramientas
-from ..herramientas.monitor_rendimiento import MonitorRendimiento
+from ..herramientas.monitor_rendimiento import MonitorRendimientoHerramientas
 from loguru import logger
 
 class METFactory:
@@ -17,7 +17,7 @@ class METFactory:
             )
             
             # Configurar monitor de rendimiento
-            monitor = MonitorRendimiento(
+            monitor = MonitorRendimientoHerramientas(
                 configuracion.get('monitorizacion', {})
             )
             
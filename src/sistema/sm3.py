@@ -1,8 +1,10 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Mapping, Tuple
 from datetime import datetime, timedelta
+import threading
+import time
 from memoria.trabajo import MemoriaTrabajo
 from memoria.conocimiento import BaseConocimiento
-from memoria.episodica import MemoriaEpisodica
+from memoria.episodica.memoria_episodica import MemoriaEpisodica
 from loguru import logger
 
 class SistemaMemoriaTripleCapa:
@@ -16,14 +18,22 @@ class SistemaMemoriaTripleCapa:
             timeout=config.get('memoria', {}).get('trabajo', {}).get('timeout', 3600)
         )
         
-        self.base_conocimiento = BaseConocimiento(
-            ruta_bd=config.get('memoria', {}).get('conocimiento', {}).get('ruta', './data/conocimiento')
-        )
+        config_conocimiento = config.get('memoria', {}).get('conocimiento', {})
+        self.base_conocimiento = BaseConocimiento({
+            **config_conocimiento,
+            'ruta_bd': config_conocimiento.get('ruta', './data/conocimiento')
+        })
         
         self.memoria_episodica = MemoriaEpisodica(
             cadena_conexion=config.get('memoria', {}).get('episodica', {}).get('ruta', 'sqlite:///./data/episodica.db')
         )
         
+        # Los recuentos de episodios se sirven desde caché durante unos
+        # segundos: las estadísticas no necesitan frescura por petición
+        self.ttl_estadisticas = config.get('memoria', {}).get('episodica', {}).get('ttl_estadisticas', 30)
+        self._recuento_episodios: Optional[Tuple[float, Tuple[int, int]]] = None
+        self._lock_recuento = threading.Lock()
+        
         logger.info("Sistema de Memoria Triple Capa inicializado")
     
     # --- Métodos de Memoria de Trabajo ---
@@ -35,7 +45,7 @@ class SistemaMemoriaTripleCapa:
         """Obtiene información de la memoria de trabajo"""
         return self.memoria_trabajo.obtener(clave, default)
     
-    def obtener_todo_contexto(self) -> Dict[str, Any]:
+    def obtener_todo_contexto(self) -> Mapping[str, Any]:
         """Obtiene todo el contexto actual"""
         return self.memoria_trabajo.obtener_todo_contexto()
     
@@ -57,6 +67,11 @@ class SistemaMemoriaTripleCapa:
         """Actualiza las estadísticas de uso de una habilidad"""
         self.base_conocimiento.actualizar_estadisticas_habilidad(habilidad_id, exito)
     
+    @property
+    def modelo_embedding(self):
+        """Modelo de embedding de la base de conocimiento"""
+        return self.base_conocimiento.modelo_embedding
+    
     # --- Métodos de Memoria Episódica ---
     def guardar_episodio(self, episodio: Dict[str, Any]) -> str:
         """Guarda un episodio completo en la memoria episódica"""
@@ -73,20 +88,29 @@ class SistemaMemoriaTripleCapa:
         return self.memoria_episodica.obtener_episodios_por_tipo_tarea(tipo_tarea, limite)
     
     # --- Métodos de Utilidad ---
+    def _contar_episodios(self) -> Tuple[int, int]:
+        """Total y exitosos de la memoria episódica, cacheados ``ttl_estadisticas`` segundos"""
+        with self._lock_recuento:
+            entrada = self._recuento_episodios
+            if entrada is not None and time.monotonic() - entrada[0] < self.ttl_estadisticas:
+                return entrada[1]
+            
+            recuento = self.memoria_episodica.contar_episodios()
+            self._recuento_episodios = (time.monotonic(), recuento)
+            return recuento
+    
     def obtener_estadisticas_globales(self) -> Dict[str, Any]:
         """Obtiene estadísticas globales del sistema de memoria"""
         try:
-            # Estadísticas de memoria episódica
-            episodios = self.obtener_episodios(limite=1000)
-            total_episodios = len(episodios)
-            exitosos = sum(1 for e in episodios if e.get('estado') == 'exito')
+            # Estadísticas de memoria episódica agregadas en la base de datos
+            total_episodios, exitosos = self._contar_episodios()
             tasa_exito = (exitosos / total_episodios * 100) if total_episodios > 0 else 0
             
             return {
                 'total_episodios': total_episodios,
                 'episodios_exitosos': exitosos,
                 'tasa_exito_global': f"{tasa_exito:.1f}%",
-                'tamano_memoria_trabajo': len(self.memoria_trabajo.obtener_todo_contexto())
+                'tamano_memoria_trabajo': len(self.memoria_trabajo)
             }
             
         except Exception as e:
@@ -1,19 +1,52 @@
 import pytest
+import pytest_asyncio
 import asyncio
 import aiohttp
-import json
+import orjson
 from typing import Dict, Any
 
+BASE_URL = "http://localhost:8000"
+
+# Todas las pruebas comparten el bucle de la sesión, y con él la sesión HTTP
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+def _serializar_json(objeto: Any) -> str:
+    """Serializa los cuerpos json= de aiohttp con orjson"""
+    return orjson.dumps(objeto).decode()
+
+async def leer_json(response: aiohttp.ClientResponse) -> Any:
+    """Parsea la respuesta con orjson directamente sobre los bytes"""
+    return orjson.loads(await response.read())
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def sesion_http():
+    """Sesión HTTP única con conexiones keep-alive reutilizadas entre pruebas"""
+    conector = aiohttp.TCPConnector(limit=100, keepalive_timeout=30)
+    async with aiohttp.ClientSession(
+        base_url=BASE_URL, connector=conector, json_serialize=_serializar_json
+    ) as sesion:
+        yield sesion
+
 class TestSistemaCompleto:
     """Suite de pruebas de integración para el sistema SAAM completo"""
     
     @pytest.fixture(autouse=True)
-    async def setup_sistema(self):
+    def setup_sistema(self, sesion_http):
         """Fixture para inicializar el sistema de pruebas"""
-        self.base_url = "http://localhost:8000"
-        self.session = aiohttp.ClientSession()
-        yield
-        await self.session.close()
+        self.session = sesion_http
+    
+    async def _esperar_estado_mao(self, timeout: float = 5.0, intervalo: float = 0.25) -> Dict[str, Any]:
+        """Sondea /mao/estado hasta que publique un análisis o venza el timeout"""
+        async def sondear():
+            while True:
+                async with self.session.get("/mao/estado") as response:
+                    if response.status == 200:
+                        estado = await leer_json(response)
+                        if 'ultimo_analisis' in estado:
+                            return estado
+                await asyncio.sleep(intervalo)
+        
+        return await asyncio.wait_for(sondear(), timeout)
     
     async def test_flujo_completo_exitoso(self):
         """Prueba un flujo completo de objetivo exitoso"""
@@ -21,11 +54,11 @@ class TestSistemaCompleto:
         objetivo = "Buscar información sobre inteligencia artificial y crear un resumen"
         
         async with self.session.post(
-            f"{self.base_url}/mcp/planificar",
+            "/mcp/planificar",
             json={"objetivo": objetivo, "contexto": {}}
         ) as response:
             assert response.status == 200
-            planificacion = await response.json()
+            planificacion = await leer_json(response)
             assert 'plan' in planificacion
             assert 'id_plan' in planificacion
         
@@ -33,41 +66,35 @@ class TestSistemaCompleto:
         plan_id = planificacion['id_plan']
         
         async with self.session.get(
-            f"{self.base_url}/sm3/plan/{plan_id}"
+            f"/sm3/plan/{plan_id}"
         ) as response:
             assert response.status == 200
-            plan_almacenado = await response.json()
+            plan_almacenado = await leer_json(response)
             assert plan_almacenado['id'] == plan_id
         
         # 3. Ejecutar el plan through MET
         async with self.session.post(
-            f"{self.base_url}/met/ejecutar-plan",
+            "/met/ejecutar-plan",
             json={"plan_id": plan_id}
         ) as response:
             assert response.status == 202
-            ejecucion = await response.json()
+            ejecucion = await leer_json(response)
             assert 'id_ejecucion' in ejecucion
         
         # 4. Verificar que la ejecución se registró en memoria episódica
         ejecucion_id = ejecucion['id_ejecucion']
         
         async with self.session.get(
-            f"{self.base_url}/sm3/episodio/{ejecucion_id}"
+            f"/sm3/episodio/{ejecucion_id}"
         ) as response:
             assert response.status == 200
-            episodio = await response.json()
+            episodio = await leer_json(response)
             assert episodio['id'] == ejecucion_id
             assert episodio['estado'] in ['exito', 'procesando']
         
         # 5. Verificar que el MAO procesó el episodio
-        await asyncio.sleep(5)  # Dar tiempo al MAO
-        
-        async with self.session.get(
-            f"{self.base_url}/mao/estado"
-        ) as response:
-            assert response.status == 200
-            estado_mao = await response.json()
-            assert 'ultimo_analisis' in estado_mao
+        estado_mao = await self._esperar_estado_mao()
+        assert 'ultimo_analisis' in estado_mao
     
     async def test_sistema_saludable(self):
         """Prueba que todos los módulos responden correctamente"""
@@ -75,8 +102,8 @@ class TestSistemaCompleto:
         
         for modulo in modulos:
             async with self.session.get(
-                f"{self.base_url}/{modulo}/health"
+                f"/{modulo}/health"
             ) as response:
                 assert response.status == 200
-                health = await response.json()
+                health = await leer_json(response)
                 assert health['status'] == 'healthy'
\ No newline at end of file